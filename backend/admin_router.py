@@ -140,3 +140,44 @@ def delete_user(user_id: str, admin: dict = Depends(get_admin_user)):
     print(f"[ADMIN] User {email} deleted by {admin['email']}")
     
     return {"success": True, "message": f"User {email} deleted"}
+
+
+@router.get("/users/{user_id}/token-usage")
+def get_user_token_usage(user_id: str, admin: dict = Depends(get_admin_user)):
+    """Get a user's OpenAI token usage today against their quota (admin only)."""
+    from services import user_quota
+    
+    user = fm.get_user_by_id(user_id)
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return {"email": user["email"], **user_quota.get_owner_usage(user["email"])}
+
+
+@router.get("/system-stats")
+def get_system_stats(admin: dict = Depends(get_admin_user)):
+    """Get in-process cache and store statistics (admin only)."""
+    from services.article_store import get_store_stats
+    from services.feed_poller import get_poller
+    from services.llm_cache import get_cache_stats
+    from services.openai_service import get_coalescing_stats
+    from services.llm_hedging import get_hedging_stats
+    from services.model_router import get_routing_stats
+    from services.openai_scheduler import get_scheduler_stats
+    from services.openai_gateway import get_usage_stats
+    from services.metrics import get_metrics
+    from services.user_quota import get_quota_stats
+    
+    return {
+        "article_store": get_store_stats(),
+        "feed_poller": get_poller().get_stats(),
+        "llm_cache": get_cache_stats(),
+        "llm_coalescing": get_coalescing_stats(),
+        "llm_hedging": get_hedging_stats(),
+        "openai_scheduler": get_scheduler_stats(),
+        "model_routing": get_routing_stats(),
+        "openai_usage": get_usage_stats(),
+        "metrics": get_metrics(),
+        "user_quotas": get_quota_stats()
+    }
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Build the precomputed feed-discovery index.
+
+Crawls a list of publisher domains, probes each one for its RSS/Atom feed and
+writes a compact domain -> feed URL index. news_fetcher loads this index at
+startup, so known publishers skip live feed discovery after a restart.
+
+Usage:
+    python build_feed_index.py                       # domains seen in resolved links
+    python build_feed_index.py bbc.co.uk apnews.com  # explicit domains
+    python build_feed_index.py --domains-file domains.txt --refresh
+
+Domains indexed without a feed are re-probed on every run.
+"""
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from services import news_fetcher
+
+
+def normalize_domain(domain: str) -> Optional[str]:
+    """Turn 'bbc.co.uk' or 'https://www.bbc.co.uk/news' into a base URL."""
+    domain = domain.strip()
+    if not domain or domain.startswith("#"):
+        return None
+    if "://" not in domain:
+        domain = f"https://{domain}"
+    parsed = urlparse(domain)
+    if not parsed.netloc:
+        return None
+    return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+
+def read_domains_file(path: str) -> List[str]:
+    """Read one domain per line, ignoring blanks and comments."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_existing_index(path: str) -> Dict[str, Optional[str]]:
+    """Load the feeds mapping from an existing index file, if any."""
+    news_fetcher._rss_cache.clear()
+    news_fetcher.load_feed_index(path)
+    existing = dict(news_fetcher._rss_cache)
+    news_fetcher._rss_cache.clear()
+    return existing
+
+
+def build_index(
+    domains: List[str],
+    existing: Dict[str, Optional[str]],
+    refresh: bool = False,
+    workers: int = 8
+) -> Dict[str, Optional[str]]:
+    """
+    Probe every domain that is not already indexed with a feed (or all of
+    them with refresh) and return the merged index.
+
+    Indexed domains without a feed are probed again too: probe_rss_feed
+    also returns None when a site was down or timed out, and news_fetcher
+    would otherwise never look for that domain's feed again.
+    """
+    index = dict(existing)
+    to_probe = [d for d in domains if refresh or not index.get(d)]
+    to_probe += [d for d, feed_url in existing.items() if not feed_url and d not in to_probe]
+
+    print(f"[INDEX] {len(domains)} domains, {len(to_probe)} to probe, {len(index)} already indexed")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(news_fetcher.probe_rss_feed, to_probe)
+        for base_url, feed_url in zip(to_probe, results):
+            index[base_url] = feed_url
+            status = feed_url if feed_url else "no feed"
+            print(f"[INDEX] {base_url} -> {status}")
+
+    return index
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the domain -> RSS feed index used by news_fetcher.")
+    parser.add_argument("domains", nargs="*", help="Publisher domains or URLs to index")
+    parser.add_argument(
+        "--domains-file",
+        default=news_fetcher.SEEN_DOMAINS_PATH,
+        help="File with one domain per line (default: domains seen in resolved links)"
+    )
+    parser.add_argument("--output", default=news_fetcher.FEED_INDEX_PATH, help="Index file to write")
+    parser.add_argument("--refresh", action="store_true", help="Re-probe domains that are already indexed with a feed")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent probes (default: 8)")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("   BUILDING FEED DISCOVERY INDEX")
+    print("=" * 60 + "\n")
+
+    existing = load_existing_index(args.output)
+
+    raw_domains = list(args.domains) + read_domains_file(args.domains_file)
+    if args.refresh:
+        raw_domains += list(existing.keys())
+
+    domains = []
+    for raw in raw_domains:
+        base_url = normalize_domain(raw)
+        if base_url and base_url not in domains:
+            domains.append(base_url)
+
+    if not domains and not existing:
+        print("[INDEX] No domains to index. Pass domains or --domains-file.")
+        return 1
+
+    index = build_index(domains, existing, refresh=args.refresh, workers=args.workers)
+    path = news_fetcher.save_feed_index(index, args.output)
+
+    found = sum(1 for feed_url in index.values() if feed_url)
+    print(f"\n[INDEX] ✅ Wrote {len(index)} domains ({found} with feeds) to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
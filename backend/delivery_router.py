@@ -22,6 +22,7 @@ class DeliveryResponse(BaseModel):
     email_sent_to: Optional[str]
     pdf_included: bool
     audio_included: bool
+    degraded: bool = False  # Summary was the local fallback (OpenAI unavailable, over quota or too slow)
     feedback_received: Optional[str]
     feedback_received_at: Optional[datetime]
 
@@ -52,6 +53,7 @@ def get_delivery_history(
                 email_sent_to=d.get("email_sent_to"),
                 pdf_included=d.get("pdf_included", False),
                 audio_included=d.get("audio_included", False),
+                degraded=d.get("degraded", False),
                 feedback_received=d.get("feedback_received"),
                 feedback_received_at=d.get("feedback_received_at")
             )
@@ -90,6 +92,7 @@ def get_delivery_detail(
         email_sent_to=delivery.get("email_sent_to"),
         pdf_included=delivery.get("pdf_included", False),
         audio_included=delivery.get("audio_included", False),
+        degraded=delivery.get("degraded", False),
         feedback_received=delivery.get("feedback_received"),
         feedback_received_at=delivery.get("feedback_received_at")
     )
@@ -0,0 +1,134 @@
+"""
+Custom feed subscriptions router - Firebase version.
+Lets users add their own publisher feeds, individually or via OPML import.
+"""
+import os
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from pydantic import BaseModel
+from typing import List, Optional
+
+from auth import get_current_user
+import firebase_models as fm
+from services.opml import parse_opml, is_valid_feed_url
+from services.url_safety import is_public_url
+from services.feed_poller import get_poller, fetch_news_by_custom_feeds
+
+router = APIRouter(prefix="/feeds", tags=["Feeds"])
+
+# Maximum custom feeds per user
+MAX_FEEDS_PER_USER = int(os.getenv("MAX_FEEDS_PER_USER", "500"))
+
+
+# --- Request/Response Models ---
+
+class FeedResponse(BaseModel):
+    id: str
+    url: str
+    title: Optional[str]
+
+
+class FeedListResponse(BaseModel):
+    feeds: List[FeedResponse]
+    total: int
+
+
+class AddFeedRequest(BaseModel):
+    url: str
+    title: Optional[str] = None
+
+
+class ImportResponse(BaseModel):
+    imported: int
+    skipped: int
+    total: int
+
+
+# --- Endpoints ---
+
+@router.get("/", response_model=FeedListResponse)
+def list_feeds(current_user: dict = Depends(get_current_user)):
+    """List the current user's custom feeds."""
+    feeds = fm.get_user_feeds(current_user["id"])
+    
+    return FeedListResponse(
+        feeds=[FeedResponse(id=f["id"], url=f["url"], title=f.get("title")) for f in feeds],
+        total=len(feeds)
+    )
+
+
+@router.post("/", response_model=FeedResponse)
+def add_feed(request: AddFeedRequest, current_user: dict = Depends(get_current_user)):
+    """Subscribe the current user to a custom feed."""
+    url = request.url.strip()
+    if not is_valid_feed_url(url):
+        raise HTTPException(status_code=400, detail="Feed URL must be an absolute http(s) URL.")
+    if not is_public_url(url):
+        raise HTTPException(status_code=400, detail="Feed URL must point to a public host.")
+    
+    existing = fm.get_user_feeds(current_user["id"])
+    if any(f["url"] == url for f in existing):
+        feed = next(f for f in existing if f["url"] == url)
+        return FeedResponse(id=feed["id"], url=feed["url"], title=feed.get("title"))
+    
+    if len(existing) >= MAX_FEEDS_PER_USER:
+        raise HTTPException(status_code=400, detail=f"Feed limit reached ({MAX_FEEDS_PER_USER}).")
+    
+    feed = fm.create_user_feed(current_user["id"], url, request.title)
+    get_poller().add_feed(url, feed.get("title"))
+    
+    return FeedResponse(id=feed["id"], url=feed["url"], title=feed.get("title"))
+
+
+@router.post("/opml", response_model=ImportResponse)
+async def import_opml(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    """Import feed subscriptions from an OPML file."""
+    data = await file.read()
+    
+    try:
+        parsed = parse_opml(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    existing_urls = {f["url"] for f in fm.get_user_feeds(current_user["id"])}
+    room = max(0, MAX_FEEDS_PER_USER - len(existing_urls))
+    
+    # Resolve hosts off the event loop; feeds on non-public hosts are skipped
+    candidates = [f for f in parsed if f["url"] not in existing_urls][:room]
+    public = await asyncio.gather(*(asyncio.to_thread(is_public_url, f["url"]) for f in candidates))
+    
+    imported = 0
+    poller = get_poller()
+    for feed, is_public in zip(candidates, public):
+        if not is_public:
+            continue
+        fm.create_user_feed(current_user["id"], feed["url"], feed["title"])
+        poller.add_feed(feed["url"], feed["title"])
+        existing_urls.add(feed["url"])
+        imported += 1
+    
+    print(f"[FEEDS] Imported {imported}/{len(parsed)} OPML feeds for {current_user['email']}")
+    
+    return ImportResponse(imported=imported, skipped=len(parsed) - imported, total=len(parsed))
+
+
+@router.delete("/{feed_id}")
+def delete_feed(feed_id: str, current_user: dict = Depends(get_current_user)):
+    """Unsubscribe the current user from a custom feed."""
+    feed = fm.delete_user_feed(current_user["id"], feed_id)
+    
+    if not feed:
+        raise HTTPException(status_code=404, detail="Feed not found")
+    
+    get_poller().remove_feed(feed["url"])
+    
+    return {"success": True, "message": f"Unsubscribed from {feed.get('title') or feed['url']}"}
+
+
+@router.get("/articles")
+def get_feed_articles(max_per_feed: int = 10, current_user: dict = Depends(get_current_user)):
+    """Get the latest articles from the current user's custom feeds."""
+    feeds = fm.get_user_feeds(current_user["id"])
+    news = fetch_news_by_custom_feeds([f["url"] for f in feeds], max_per_feed=max_per_feed)
+    
+    return {"news": news}
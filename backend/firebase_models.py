@@ -5,7 +5,7 @@ import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, List, Any
 from firebase_db import get_db
-from google.cloud.firestore_v1 import FieldFilter
+from google.cloud.firestore_v1 import FieldFilter, Increment
 
 
 # ============================================================================
@@ -191,9 +191,10 @@ def create_delivery_log(
     word_count_target: int = 500,
     actual_word_count: int = 0,
     pdf_included: bool = True,
-    audio_included: bool = False
+    audio_included: bool = False,
+    degraded: bool = False
 ) -> Dict[str, Any]:
-    """Create an email delivery log entry."""
+    """Create an email delivery log entry. degraded marks a local fallback summary."""
     db = get_db()
     
     # Generate unique feedback token
@@ -210,6 +211,7 @@ def create_delivery_log(
         "email_sent_to": email_sent_to,
         "pdf_included": pdf_included,
         "audio_included": audio_included,
+        "degraded": degraded,
         "feedback_token": feedback_token,
         "feedback_expires_at": datetime.now(timezone.utc) + timedelta(days=7),
         "feedback_received": None,
@@ -284,3 +286,159 @@ def get_user_last_delivery(user_id: str) -> Optional[Dict[str, Any]]:
         return log
     
     return None
+
+
+# ============================================================================
+# LAST DIGEST OPERATIONS (incremental digest updates)
+# ============================================================================
+
+def get_user_digest_state(user_id: str) -> Optional[Dict[str, Any]]:
+    """Get the user's last delivered digest and its article fingerprint."""
+    db = get_db()
+    
+    doc = db.collection("user_digests").document(user_id).get()
+    if doc.exists:
+        return doc.to_dict()
+    return None
+
+
+def save_user_digest_state(user_id: str, state: Dict[str, Any]) -> None:
+    """Store the user's last delivered digest and its article fingerprint."""
+    db = get_db()
+    
+    state["updated_at"] = datetime.now(timezone.utc)
+    db.collection("user_digests").document(user_id).set(state)
+
+
+# ============================================================================
+# TOKEN USAGE OPERATIONS (per-user quotas)
+# ============================================================================
+
+def get_user_token_usage(owner: str, day: str) -> int:
+    """Get the tokens a quota owner (see services.user_quota) used on a day (YYYY-MM-DD)."""
+    db = get_db()
+    
+    doc = db.collection("token_usage").document(f"{day}_{owner}").get()
+    if doc.exists:
+        return doc.to_dict().get("tokens", 0)
+    return 0
+
+
+class TokenUsageWriteError(Exception):
+    """A token usage write failed after some batches were committed."""
+
+    def __init__(self, committed: List[tuple], cause: Exception):
+        super().__init__(str(cause))
+        # (owner, day) keys whose increments are already stored
+        self.committed = committed
+
+
+def add_user_token_usage(usage: Dict[tuple, int]) -> None:
+    """
+    Add token counts ({(owner, day): tokens}) to the stored daily usage in
+    batches. Raises TokenUsageWriteError with the keys already written if a
+    batch fails, so they are not incremented again on retry.
+    """
+    db = get_db()
+    
+    items = list(usage.items())
+    committed = []
+    # Firestore batches hold at most 500 writes
+    for start in range(0, len(items), 500):
+        chunk = items[start:start + 500]
+        batch = db.batch()
+        for (owner, day), tokens in chunk:
+            doc_ref = db.collection("token_usage").document(f"{day}_{owner}")
+            batch.set(doc_ref, {
+                "owner": owner,
+                "day": day,
+                "tokens": Increment(tokens),
+                "updated_at": datetime.now(timezone.utc),
+            }, merge=True)
+        try:
+            batch.commit()
+        except Exception as e:
+            raise TokenUsageWriteError(committed, e) from e
+        committed.extend(key for key, _ in chunk)
+
+
+# ============================================================================
+# USER FEED SUBSCRIPTION OPERATIONS
+# ============================================================================
+
+def create_user_feed(user_id: str, url: str, title: Optional[str] = None) -> Dict[str, Any]:
+    """Subscribe a user to a custom feed (no-op if already subscribed)."""
+    db = get_db()
+    
+    existing = db.collection("user_feeds").where(
+        filter=FieldFilter("user_id", "==", user_id)
+    ).where(
+        filter=FieldFilter("url", "==", url)
+    ).limit(1).get()
+    
+    for doc in existing:
+        feed = doc.to_dict()
+        feed["id"] = doc.id
+        return feed
+    
+    feed_data = {
+        "user_id": user_id,
+        "url": url,
+        "title": title or url,
+        "created_at": datetime.now(timezone.utc),
+    }
+    
+    doc_ref = db.collection("user_feeds").document()
+    doc_ref.set(feed_data)
+    
+    feed_data["id"] = doc_ref.id
+    return feed_data
+
+
+def get_user_feeds(user_id: str) -> List[Dict[str, Any]]:
+    """Get a user's custom feed subscriptions."""
+    db = get_db()
+    
+    feeds = []
+    docs = db.collection("user_feeds").where(
+        filter=FieldFilter("user_id", "==", user_id)
+    ).stream()
+    
+    for doc in docs:
+        feed = doc.to_dict()
+        feed["id"] = doc.id
+        feeds.append(feed)
+    
+    return feeds
+
+
+def get_all_user_feeds() -> List[Dict[str, Any]]:
+    """Get every custom feed subscription (used to seed the feed poller)."""
+    db = get_db()
+    
+    feeds = []
+    for doc in db.collection("user_feeds").stream():
+        feed = doc.to_dict()
+        feed["id"] = doc.id
+        feeds.append(feed)
+    
+    return feeds
+
+
+def delete_user_feed(user_id: str, feed_id: str) -> Optional[Dict[str, Any]]:
+    """Delete a user's feed subscription. Returns the deleted feed, or None."""
+    db = get_db()
+    
+    doc_ref = db.collection("user_feeds").document(feed_id)
+    doc = doc_ref.get()
+    
+    if not doc.exists:
+        return None
+    
+    feed = doc.to_dict()
+    if feed.get("user_id") != user_id:
+        return None
+    
+    doc_ref.delete()
+    feed["id"] = feed_id
+    return feed
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, BackgroundTasks, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.news_fetcher import fetch_news
-from services.simplifier import simplify_text
+from typing import Dict, List, Optional
+from services.simplifier import simplify_text_async
 from io import BytesIO
+import json
+import time
 
 # Import auth router
 from auth_router import router as auth_router
@@ -21,6 +23,9 @@ from feedback_router import router as feedback_router
 # Import delivery router
 from delivery_router import router as delivery_router
 
+# Import custom feeds router
+from feeds_router import router as feeds_router
+
 # Import Firebase
 from firebase_db import get_db, test_connection
 
@@ -38,12 +43,54 @@ async def startup_firebase():
     except Exception as e:
         print(f"[FIREBASE] Error during startup: {e}")
 
+@app.on_event("startup")
+async def startup_article_store():
+    """Warm the article store from its last snapshot and keep snapshotting."""
+    from services.article_store import start_snapshots
+    start_snapshots()
+
+
+@app.on_event("shutdown")
+async def shutdown_article_store():
+    """Write a final article store snapshot."""
+    from services.article_store import stop_snapshots
+    stop_snapshots()
+
+
+@app.on_event("startup")
+async def startup_feed_poller():
+    """Start polling users' custom feed subscriptions."""
+    from services.feed_poller import start_feed_poller
+    start_feed_poller()
+
+
+@app.on_event("shutdown")
+async def shutdown_feed_poller():
+    """Stop the custom feed poller."""
+    from services.feed_poller import stop_feed_poller
+    stop_feed_poller()
+
+
+@app.on_event("startup")
+async def startup_user_quota():
+    """Start writing per-user token usage to Firestore."""
+    from services.user_quota import start_flusher
+    start_flusher()
+
+
+@app.on_event("shutdown")
+async def shutdown_user_quota():
+    """Write pending per-user token usage."""
+    from services.user_quota import stop_flusher
+    stop_flusher()
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(settings_router)
 app.include_router(admin_router)
 app.include_router(feedback_router)
 app.include_router(delivery_router)
+app.include_router(feeds_router)
 
 # Configure CORS
 origins = [
@@ -59,32 +106,105 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def quota_owner(request: Request, authorization: str = Header(None)) -> str:
+    """
+    Whose token quota a request uses (see services.user_quota): the signed-in
+    user's email, else the client address. Loads the owner's usage for today.
+    """
+    from auth import decode_token
+    from services.user_quota import load
+    
+    payload = None
+    if authorization and authorization.startswith("Bearer "):
+        payload = decode_token(authorization.replace("Bearer ", ""))
+    if payload and payload.get("sub"):
+        owner = payload["sub"]
+    else:
+        owner = f"ip:{request.client.host if request.client else 'unknown'}"
+    load(owner)
+    return owner
+
+
 class SimplifyRequest(BaseModel):
-    text: str
+    text: str = ""
+    article_id: Optional[str] = None  # Serve the article's precomputed brief when known
+    tier: str = "llm"  # "llm", or "fast" for local extractive simplification
+
+
+class SimplifyBatchRequest(BaseModel):
+    items: List[SimplifyRequest]  # Each a text and/or article_id; results are keyed by index
+    stream: bool = False  # Stream results as server-sent events as they complete
+
+
+# Most items accepted by /simplify/batch
+SIMPLIFY_BATCH_MAX_ITEMS = 100
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to News Simplifier API"}
 
 @app.get("/news")
-def get_news(categories: str = None):
+def get_news(background_tasks: BackgroundTasks, categories: str = None, prefetch: bool = True):
     """
     Get news articles, optionally filtered by categories.
     
+    Returns RSS-level data (title, link, summary) with stable article IDs as
+    soon as the feeds are fetched. Full content is filled in lazily - in the
+    background when prefetch is set, or on demand via /articles/{id}/content.
+    
     Args:
         categories: Comma-separated list of category keys (e.g., "technology,business")
+        prefetch: Enrich the returned articles with full content in the background
     """
-    from services.news_fetcher import fetch_news_by_categories, RSS_FEEDS_BY_CATEGORY
+    from services.news_fetcher import fetch_news_by_categories
+    from services.article_store import put_articles, enrich_articles
     
     if categories:
         category_list = [c.strip() for c in categories.split(",")]
-        news = fetch_news_by_categories(category_list)
     else:
-        news = fetch_news()
+        category_list = ["top_stories", "world", "technology", "business"]
+    
+    news = fetch_news_by_categories(category_list, enrich=False)
+    put_articles(news)
+    
+    if prefetch:
+        from services.article_summaries import prewarm_article_summaries
+        article_ids = [article["id"] for article in news]
+        background_tasks.add_task(enrich_articles, article_ids)
+        # Runs after enrichment (background tasks run in order)
+        background_tasks.add_task(prewarm_article_summaries, article_ids)
     
     return {"news": news}
 
 
+@app.get("/articles/{article_id}")
+def get_article(article_id: str):
+    """Get a previously listed article by its ID."""
+    from services.article_store import get_article as store_get_article
+    
+    article = store_get_article(article_id)
+    if article is None:
+        raise HTTPException(status_code=404, detail="Article not found. Fetch /news first.")
+    
+    return article
+
+
+@app.get("/articles/{article_id}/content")
+def get_article_content(article_id: str):
+    """Get the full content of an article, scraping it now if needed."""
+    from services.article_store import enrich_article
+    
+    article = enrich_article(article_id)
+    if article is None:
+        raise HTTPException(status_code=404, detail="Article not found. Fetch /news first.")
+    
+    return {
+        "id": article_id,
+        "content": article.get("content"),
+        "rss_source": article.get("rss_source")
+    }
+
+
 @app.get("/categories")
 def get_categories():
     """Get available news categories."""
@@ -118,10 +238,12 @@ def get_news_by_sources(sources: str = None):
         sources: Comma-separated list of source keys (e.g., "reuters,techcrunch")
     """
     from services.news_fetcher import fetch_news_by_sources
+    from services.article_store import put_articles
     
     if sources:
         source_list = [s.strip() for s in sources.split(",")]
         news = fetch_news_by_sources(source_list)
+        put_articles(news)
     else:
         news = []
     
@@ -150,12 +272,147 @@ def get_feedly_articles(count: int = 20):
     return {"news": articles}
 
 @app.post("/simplify")
-def simplify_news(request: SimplifyRequest):
-    if not request.text:
+async def simplify_news(request: SimplifyRequest, owner: str = Depends(quota_owner)):
+    """
+    Simplify an article. With an article_id, the article's per-article brief
+    is served (computed once and shared by every request for that article).
+    Users over their token quota get the fast tier.
+    """
+    from services.article_store import get_article as store_get_article
+    from services.article_summaries import get_article_brief_async, article_text
+    from services.simplifier import local_simplify
+    from services.user_quota import quota_user, exhausted
+    
+    article = store_get_article(request.article_id) if request.article_id else None
+    
+    if request.tier == "fast" or exhausted(owner):
+        text = request.text or (article_text(article) if article else "")
+        if not text:
+            raise HTTPException(status_code=400, detail="No text provided")
+        return {"simplified": (article or {}).get("brief") or local_simplify(text), "tier": "local"}
+    
+    with quota_user(owner):
+        if article is not None:
+            brief = await get_article_brief_async(article)
+            if brief:
+                return {"simplified": brief, "article_id": request.article_id}
+        
+        if not request.text:
+            raise HTTPException(status_code=400, detail="No text provided")
+        
+        simplified = await simplify_text_async(request.text)
+    return {"simplified": simplified}
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/simplify/stream")
+async def simplify_news_stream(request: SimplifyRequest, owner: str = Depends(quota_owner)):
+    """
+    Streaming variant of /simplify (server-sent events).
+    
+    Emits "delta" events ({"text": ...}) as the simplification is generated,
+    then a "done" event with the full text ({"simplified": ...}), or an
+    "error" event if generation fails midway. Users over their token quota
+    get the fast tier.
+    """
+    from services.article_store import get_article as store_get_article
+    from services.article_summaries import stream_article_brief, article_text
+    from services.simplifier import simplify_text_stream, local_simplify
+    from services.user_quota import quota_user, exhausted
+    
+    article = store_get_article(request.article_id) if request.article_id else None
+    text = request.text or (article_text(article) if article else "")
+    if article is None and not text:
         raise HTTPException(status_code=400, detail="No text provided")
     
-    simplified = simplify_text(request.text)
-    return {"simplified": simplified}
+    async def events():
+        parts = []
+        if request.tier == "fast" or exhausted(owner):
+            simplified = (article or {}).get("brief") or local_simplify(text)
+            yield _sse_event("delta", {"text": simplified})
+            yield _sse_event("done", {"simplified": simplified, "tier": "local"})
+            return
+        try:
+            with quota_user(owner):
+                if article is not None:
+                    async for delta in stream_article_brief(article):
+                        parts.append(delta)
+                        yield _sse_event("delta", {"text": delta})
+                if not parts and text:
+                    async for delta in simplify_text_stream(text):
+                        parts.append(delta)
+                        yield _sse_event("delta", {"text": delta})
+        except Exception as e:
+            print(f"[STREAM] Simplify failed: {e}")
+            yield _sse_event("error", {"detail": "Error during simplification"})
+            return
+        
+        done = {"simplified": "".join(parts)}
+        if article is not None:
+            done["article_id"] = request.article_id
+        yield _sse_event("done", done)
+    
+    return _sse_response(events())
+
+
+@app.post("/simplify/batch")
+async def simplify_news_batch(request: SimplifyBatchRequest, owner: str = Depends(quota_owner)):
+    """
+    Simplify many articles at once (e.g. a whole feed page). Stored briefs
+    and cached results are served immediately; the rest run concurrently
+    (see simplifier.simplify_batch), so the batch takes about as long as
+    its slowest call. Users over their token quota get the fast tier.
+    
+    Returns {"results": [...]} in item order, or with stream=true emits a
+    "result" event ({"index": ..., "simplified": ..., "tier": ...,
+    "cached": ...}) per item as it completes, then a "done" event.
+    """
+    from services.article_store import get_article as store_get_article
+    from services.article_summaries import article_text
+    from services.simplifier import simplify_batch
+    from services.user_quota import quota_user, exhausted
+    
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if len(request.items) > SIMPLIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {SIMPLIFY_BATCH_MAX_ITEMS} items per batch")
+    
+    over_quota = exhausted(owner)
+    items = []
+    for item in request.items:
+        article = store_get_article(item.article_id) if item.article_id else None
+        items.append({
+            "text": item.text or (article_text(article) if article else ""),
+            "article": article,
+            "tier": "fast" if over_quota else item.tier
+        })
+    
+    if request.stream:
+        async def events():
+            with quota_user(owner):
+                async for index, result in simplify_batch(items):
+                    yield _sse_event("result", {"index": index, **result})
+            yield _sse_event("done", {"count": len(items)})
+        
+        return _sse_response(events())
+    
+    results = [None] * len(items)
+    with quota_user(owner):
+        async for index, result in simplify_batch(items):
+            results[index] = result
+    return {"results": results}
 
 
 @app.get("/digest")
@@ -209,38 +466,192 @@ def get_digest_audio():
 
 
 class SummarizeRequest(BaseModel):
-    text: str
+    text: str = ""
     article_count: int = 10  # Default to 10 articles
+    article_ids: Optional[List[str]] = None  # Reduce over stored per-article briefs instead of text
+    tier: str = "llm"  # "llm", or "fast" for a local extractive summary
+    structured: bool = False  # Also return the summary as a structured digest (see digest_format)
+    digest: Optional[Dict] = None  # Structured digest to render (/summary/pdf, /summary/audio)
+    deadline: Optional[float] = None  # Seconds allowed for OpenAI before the local fallback (/summarize-combined)
+
+
+def _request_digest(digest: Optional[Dict]) -> Optional[Dict]:
+    """Normalize a client-supplied digest before rendering it; 400 if it is not a digest."""
+    from services.digest_format import normalize_digest
+    
+    if digest is None:
+        return None
+    normalized = normalize_digest(digest)
+    if normalized is None:
+        raise HTTPException(status_code=400, detail="Invalid digest: expected sections with stories")
+    return normalized
+
+
+async def _resolve_combined_request(request: SummarizeRequest):
+    """
+    Build the combined excerpt text and word target for a summarize request,
+    and the articles in excerpt order (empty for raw text).
+    """
+    from services.article_store import get_article as store_get_article
+    from services.article_summaries import get_article_briefs_async
+    from services.digest_service import build_combined_excerpts, excerpt_order
+    from services.topic_clustering import cluster_articles
+    from services.article_ranking import select_articles, story_priorities
+    
+    combined_text = request.text
+    article_count = request.article_count
+    ordered = []
+    
+    # Map-reduce over per-article briefs when the articles are known
+    if request.article_ids:
+        articles = [a for a in (store_get_article(i) for i in request.article_ids) if a is not None]
+        missing = len(request.article_ids) - len(articles)
+        if missing and request.text:
+            # Some articles were evicted from the store: the client's text still covers all of them
+            print(f"[SUMMARIZE] {missing}/{len(request.article_ids)} articles not in store, using request text")
+            articles = []
+        elif missing:
+            print(f"[SUMMARIZE] {missing}/{len(request.article_ids)} articles not in store and no text sent")
+        if articles:
+            # Only the most relevant articles that fit the prompt budget are summarized
+            articles, scores = select_articles(articles)
+            if request.tier == "fast":
+                # Only briefs that already exist; no LLM calls on the fast tier
+                briefs = [a.get("brief") for a in articles]
+            else:
+                briefs = await get_article_briefs_async(articles)
+            # One excerpt per story; the word target still follows the article count
+            stories, story_briefs = cluster_articles(articles, briefs)
+            combined_text = build_combined_excerpts(stories, story_briefs, priorities=story_priorities(stories, scores))
+            article_count = len(articles)
+            ordered = excerpt_order(stories)
+    
+    # Dynamic word limit: 100 words per article, minimum 300, maximum 2000
+    target_words = max(300, min(article_count * 100, 2000))
+    
+    return combined_text, target_words, ordered
 
 
 @app.post("/summarize-combined")
-def summarize_combined(request: SummarizeRequest):
-    """Summarize combined news excerpts using GPT-4o-mini with dynamic word limit."""
-    from services.openai_service import summarize_combined_excerpts_with_word_limit
+async def summarize_combined(request: SummarizeRequest, owner: str = Depends(quota_owner)):
+    """
+    Summarize combined news excerpts with a dynamic word limit. With
+    structured=true the response also carries the digest structure
+    (sections and stories with source links) for the renderers. OpenAI gets
+    `deadline` seconds (default SUMMARY_DEADLINE_SECONDS); past it, or on
+    error, a local extractive summary is returned with degraded=true, as it
+    is for users over their token quota.
+    """
+    from services.openai_service import summarize_combined_with_deadline_async, SUMMARY_DEADLINE_SECONDS
+    from services.local_summarizer import summarize_excerpts
+    from services.digest_format import ensure_digest
+    from services.user_quota import quota_user
+    
+    with quota_user(owner):
+        combined_text, target_words, ordered = await _resolve_combined_request(request)
     
-    if not request.text:
+    if not combined_text:
         raise HTTPException(status_code=400, detail="No text provided")
     
-    # Dynamic word limit: 100 words per article, minimum 300, maximum 2000
-    target_words = max(300, min(request.article_count * 100, 2000))
+    if request.tier == "fast":
+        # Local extractive summary by request; not degraded
+        summary = summarize_excerpts(combined_text, target_words)
+        result = {"summary": summary, "digest": None, "tier": "local", "degraded": False}
+    else:
+        deadline = request.deadline if request.deadline is not None else SUMMARY_DEADLINE_SECONDS
+        with quota_user(owner):
+            result = await summarize_combined_with_deadline_async(
+                combined_text, target_words, deadline, request.structured, ordered
+            )
+    
+    response = {
+        "summary": result["summary"],
+        "target_words": target_words,
+        "tier": result["tier"],
+        "degraded": result["degraded"]
+    }
+    if request.structured:
+        response["digest"] = result["digest"] or ensure_digest(result["summary"])
+    return response
+
+
+@app.post("/summarize-combined/stream")
+async def summarize_combined_stream(request: SummarizeRequest, owner: str = Depends(quota_owner)):
+    """
+    Streaming variant of /summarize-combined (server-sent events).
+    
+    Emits a "status" event while per-article briefs are prepared, "delta"
+    events ({"text": ...}) as the summary is generated, then a "done" event
+    with the full summary ({"summary": ..., "target_words": ..., "tier": ...,
+    "degraded": ...}) for the PDF/audio stages, or an "error" event. The fast
+    tier, and any failure before output starts or an exhausted token quota
+    (degraded), produce a local extractive summary.
+    """
+    from services import openai_gateway, metrics
+    from services.openai_service import summarize_combined_excerpts_with_word_limit_stream
+    from services.local_summarizer import summarize_excerpts
+    from services.user_quota import quota_user, exhausted, rejected_since
     
-    summary = summarize_combined_excerpts_with_word_limit(request.text, target_words)
+    if not request.text and not request.article_ids:
+        raise HTTPException(status_code=400, detail="No text provided")
+    use_llm = request.tier != "fast" and openai_gateway.is_configured()
     
-    if summary is None:
-        raise HTTPException(status_code=500, detail="OpenAI API key not configured or error occurred")
+    async def events():
+        yield _sse_event("status", {"stage": "preparing"})
+        try:
+            with quota_user(owner):
+                combined_text, target_words, _ = await _resolve_combined_request(request)
+            if not combined_text or len(combined_text.strip()) < 50:
+                summary = "No content available to summarize."
+                yield _sse_event("delta", {"text": summary})
+                yield _sse_event("done", {"summary": summary, "target_words": target_words})
+                return
+            
+            yield _sse_event("status", {"stage": "summarizing", "target_words": target_words})
+            parts = []
+            started = time.monotonic()
+            reason = "quota" if use_llm and exhausted(owner) else "error"
+            if use_llm and reason != "quota":
+                try:
+                    with quota_user(owner):
+                        async for delta in summarize_combined_excerpts_with_word_limit_stream(combined_text, target_words):
+                            parts.append(delta)
+                            yield _sse_event("delta", {"text": delta})
+                except Exception as e:
+                    if parts:
+                        raise
+                    print(f"[STREAM] LLM summary failed, using local summary: {e}")
+                    if rejected_since(started, owner):
+                        reason = "quota"
+            
+            tier = "llm" if parts else "local"
+            degraded = use_llm and not parts
+            if degraded:
+                metrics.record_event("summary_degraded", reason=reason, target_words=target_words, stream=True)
+            if not parts:
+                parts.append(summarize_excerpts(combined_text, target_words))
+                yield _sse_event("delta", {"text": parts[0]})
+        except Exception as e:
+            print(f"[STREAM] Summarize failed: {e}")
+            yield _sse_event("error", {"detail": "OpenAI API error occurred"})
+            return
+        
+        yield _sse_event("done", {
+            "summary": "".join(parts), "target_words": target_words, "tier": tier, "degraded": degraded
+        })
     
-    return {"summary": summary, "target_words": target_words}
+    return _sse_response(events())
 
 
 @app.post("/summary/pdf")
 def get_summary_pdf(request: SummarizeRequest):
-    """Generate a PDF from summary text."""
+    """Generate a PDF from a structured digest or summary text."""
     from services.pdf_service import create_pdf
     
-    if not request.text:
+    if not request.text and not request.digest:
         raise HTTPException(status_code=400, detail="No text provided")
     
-    pdf_bytes = create_pdf(request.text, "AI News Summary")
+    pdf_bytes = create_pdf(_request_digest(request.digest) or request.text, "AI News Summary")
     
     return StreamingResponse(
         BytesIO(pdf_bytes),
@@ -250,19 +661,23 @@ def get_summary_pdf(request: SummarizeRequest):
 
 
 @app.post("/summary/audio")
-def get_summary_audio(request: SummarizeRequest, current_user = None):
-    """Generate audio from summary text using OpenAI TTS (Premium only)."""
-    from services.tts_service import text_to_speech_openai
-    from auth import get_current_user, decode_token
-    from fastapi import Header
+async def get_summary_audio(request: SummarizeRequest, owner: str = Depends(quota_owner)):
+    """
+    Generate audio from a structured digest or summary text using OpenAI TTS
+    (Premium only). Users over their token quota get Google TTS.
+    """
+    from services.tts_service import text_to_speech_openai_async
+    from services.user_quota import quota_user
     
-    if not request.text:
+    if not request.text and not request.digest:
         raise HTTPException(status_code=400, detail="No text provided")
+    digest = _request_digest(request.digest)
     
     # Note: For now, audio is available to all authenticated users
     # Premium check will be done on frontend
     
-    audio_bytes = text_to_speech_openai(request.text, voice="nova")
+    with quota_user(owner):
+        audio_bytes = await text_to_speech_openai_async(digest or request.text, voice="nova")
     
     return StreamingResponse(
         BytesIO(audio_bytes),
@@ -276,14 +691,17 @@ class EmailDigestRequest(BaseModel):
     email: str
     include_pdf: bool = True
     include_audio: bool = False
+    digest: Optional[Dict] = None  # Structured digest from /summarize-combined (structured=true)
 
 
 @app.post("/summary/email")
-def email_digest(request: EmailDigestRequest):
+def email_digest(request: EmailDigestRequest, owner: str = Depends(quota_owner)):
     """Email the digest to the user with optional PDF and audio attachments."""
     from services.email_service import send_news_summary_email
     from services.pdf_service import create_pdf
     from services.tts_service import text_to_speech_openai
+    from services.digest_format import ensure_digest
+    from services.user_quota import quota_user
     
     if not request.summary:
         raise HTTPException(status_code=400, detail="No summary provided")
@@ -291,20 +709,23 @@ def email_digest(request: EmailDigestRequest):
     if not request.email:
         raise HTTPException(status_code=400, detail="No email provided")
     
+    # Parse the summary once; every renderer works from the structure
+    digest = _request_digest(request.digest) or ensure_digest(request.summary)
     pdf_bytes = None
     audio_bytes = None
     
     # Generate PDF if requested
     if request.include_pdf:
         try:
-            pdf_bytes = create_pdf(request.summary, "Daily News Digest")
+            pdf_bytes = create_pdf(digest, "Daily News Digest")
         except Exception as e:
             print(f"Error generating PDF: {e}")
     
     # Generate audio if requested
     if request.include_audio:
         try:
-            audio_bytes = text_to_speech_openai(request.summary, voice="nova")
+            with quota_user(owner):
+                audio_bytes = text_to_speech_openai(digest, voice="nova")
         except Exception as e:
             print(f"Error generating audio: {e}")
     
@@ -313,7 +734,8 @@ def email_digest(request: EmailDigestRequest):
         summary=request.summary,
         pdf_bytes=pdf_bytes,
         audio_bytes=audio_bytes,
-        recipients=[request.email]
+        recipients=[request.email],
+        digest=digest
     )
     
     if success:
@@ -357,29 +779,34 @@ def check_premium(authorization: str = Header(None)):
 class SendEmailRequest(BaseModel):
     email: str
     summary: str
+    digest: Optional[Dict] = None  # Structured digest from /summarize-combined (structured=true)
 
 
 @app.post("/send-summary-email")
-def send_summary_email(request: SendEmailRequest):
+def send_summary_email(request: SendEmailRequest, owner: str = Depends(quota_owner)):
     """Send summary with PDF and audio attachments via SendGrid."""
     from services.pdf_service import create_pdf
     from services.tts_service import text_to_speech_openai
     from services.sendgrid_service import send_summary_email as sg_send
+    from services.digest_format import ensure_digest
+    from services.user_quota import quota_user
     
     if not request.email:
         raise HTTPException(status_code=400, detail="Email address required")
     
     if not request.summary:
         raise HTTPException(status_code=400, detail="Summary text required")
+    digest = _request_digest(request.digest) or ensure_digest(request.summary)
     
     try:
-        # Generate PDF
+        # Generate PDF from the parsed digest; every renderer works from the structure
         print(f"[EMAIL] Generating PDF for {request.email}...")
-        pdf_bytes = create_pdf(request.summary, "AI News Summary")
+        pdf_bytes = create_pdf(digest, "AI News Summary")
         
         # Generate audio
         print(f"[EMAIL] Generating audio...")
-        audio_bytes = text_to_speech_openai(request.summary, voice="nova")
+        with quota_user(owner):
+            audio_bytes = text_to_speech_openai(digest, voice="nova")
         
         # Send email
         print(f"[EMAIL] Sending via SendGrid...")
@@ -387,7 +814,8 @@ def send_summary_email(request: SendEmailRequest):
             to_email=request.email,
             summary_text=request.summary,
             pdf_bytes=pdf_bytes,
-            audio_bytes=audio_bytes
+            audio_bytes=audio_bytes,
+            digest=digest
         )
         
         if success:
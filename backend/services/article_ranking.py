@@ -0,0 +1,158 @@
+"""
+Relevance ranking of articles before summarization.
+
+Every article in a batch is scored at once (NumPy) from its recency, how
+many sources cover the same story (see topic_clustering) and the weight of
+its category or source (the user's category_weights setting). Stories are then
+picked best-first until their excerpts fill the prompt budget, so the
+number of briefs to summarize and the size of the digest prompt are bounded
+however many categories and feeds a user selects.
+"""
+import os
+import math
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.digest_format import article_key
+from services.article_summaries import article_text, MIN_CHARS_TO_SUMMARIZE
+from services.openai_service import ARTICLE_BRIEF_WORDS
+from services.prompt_budget import count_tokens, INPUT_TOKEN_BUDGET, TOKENS_PER_WORD
+from services.topic_clustering import cluster_indices, clustering_text
+
+RANKING_ENABLED = os.getenv("DIGEST_RANKING", "true").lower() == "true"
+
+# Recency score halves with every RANKING_HALF_LIFE_HOURS of age
+HALF_LIFE_HOURS = float(os.getenv("RANKING_HALF_LIFE_HOURS", "12"))
+
+# Weight of each signal in the score
+RECENCY_WEIGHT = float(os.getenv("RANKING_RECENCY_WEIGHT", "1.0"))
+COVERAGE_WEIGHT = float(os.getenv("RANKING_COVERAGE_WEIGHT", "1.0"))
+CATEGORY_WEIGHT = float(os.getenv("RANKING_CATEGORY_WEIGHT", "0.5"))
+
+# Category (or source) weights unless the user sets their own
+DEFAULT_CATEGORY_WEIGHTS: Dict[str, float] = {"top_stories": 1.2}
+
+# Tokens an excerpt's header takes besides the title, and each extra source listed
+_HEADER_TOKENS = 12
+_SOURCE_TOKENS = 6
+
+
+def _age_hours(published: str, now: datetime) -> float:
+    """Hours since an RSS/Atom date string, NaN if it cannot be parsed."""
+    if not published:
+        return math.nan
+    try:
+        moment = parsedate_to_datetime(published)
+    except (TypeError, ValueError):
+        try:
+            moment = datetime.fromisoformat(published.replace("Z", "+00:00"))
+        except ValueError:
+            return math.nan
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - moment).total_seconds() / 3600)
+
+
+def _group(article: Dict) -> str:
+    return article.get("category") or article.get("source") or ""
+
+
+def score_articles(
+    articles: List[Dict],
+    clusters: Optional[List[List[int]]] = None,
+    category_weights: Optional[Dict[str, float]] = None,
+    now: Optional[datetime] = None
+) -> np.ndarray:
+    """Relevance score of each article (higher is better)."""
+    n = len(articles)
+    if not n:
+        return np.zeros(0)
+    now = now or datetime.now(timezone.utc)
+    clusters = clusters or [[i] for i in range(n)]
+    weights = {**DEFAULT_CATEGORY_WEIGHTS, **(category_weights or {})}
+
+    # Recency: exponential decay; undated articles count as the median age
+    ages = np.array([_age_hours(a.get("published", ""), now) for a in articles])
+    if np.isnan(ages).all():
+        ages[:] = HALF_LIFE_HOURS
+    else:
+        ages[np.isnan(ages)] = np.nanmedian(ages)
+    recency = np.power(0.5, ages / HALF_LIFE_HOURS)
+
+    # Coverage: distinct sources reporting the article's story, scaled to [0, 1]
+    labels = np.empty(n, dtype=int)
+    for label, members in enumerate(clusters):
+        labels[members] = label
+    _, source_ids = np.unique([a.get("source") or "" for a in articles], return_inverse=True)
+    reported = np.zeros((len(clusters), source_ids.max() + 1), dtype=bool)
+    reported[labels, source_ids] = True
+    coverage = reported.sum(axis=1)[labels] - 1.0
+    coverage /= max(coverage.max(), 1.0)
+
+    category = np.array([weights.get(_group(a), 1.0) for a in articles]) - 1.0
+
+    return RECENCY_WEIGHT * recency + COVERAGE_WEIGHT * coverage + CATEGORY_WEIGHT * category
+
+
+def _excerpt_tokens(article: Dict) -> int:
+    """Estimated tokens of an article's excerpt in the digest prompt (its brief once summarized)."""
+    header = count_tokens(article.get("title", "")) + _HEADER_TOKENS
+    if article.get("brief"):
+        return header + count_tokens(article["brief"])
+    text = article_text(article)
+    if len(text) < MIN_CHARS_TO_SUMMARIZE:
+        return header + count_tokens(text)
+    return header + min(count_tokens(text), math.ceil(ARTICLE_BRIEF_WORDS * TOKENS_PER_WORD))
+
+
+def select_articles(
+    articles: List[Dict],
+    token_budget: Optional[int] = None,
+    category_weights: Optional[Dict[str, float]] = None
+) -> Tuple[List[Dict], Dict[str, float]]:
+    """
+    Select the most relevant articles whose excerpts fit token_budget
+    (default PROMPT_INPUT_TOKEN_BUDGET), keeping the caller's order.
+
+    Articles about the same story are kept or dropped together; a story
+    costs one excerpt. Returns the selected articles and their scores by
+    article key, for build_combined_excerpts priorities (see
+    story_priorities).
+    """
+    if not RANKING_ENABLED or not articles:
+        return articles, {article_key(a): 0.0 for a in articles}
+
+    budget = INPUT_TOKEN_BUDGET if token_budget is None else max(token_budget, 0)
+    clusters = cluster_indices([clustering_text(a, a.get("brief")) for a in articles])
+    scores = score_articles(articles, clusters, category_weights)
+
+    story_scores = np.array([scores[members].max() for members in clusters])
+    selected, used = [], 0
+    for c in np.argsort(-story_scores, kind="stable"):
+        members = clusters[c]
+        best = max(members, key=lambda i: scores[i])
+        cost = _excerpt_tokens(articles[best]) + _SOURCE_TOKENS * (len(members) - 1)
+        if used + cost > budget:
+            continue
+        used += cost
+        selected.extend(members)
+
+    if not selected:
+        # Always keep the best story
+        selected = list(clusters[int(np.argmax(story_scores))])
+
+    selected.sort()
+    print(f"[RANKING] Selected {len(selected)} of {len(articles)} articles "
+          f"(~{used} of {budget} tokens)")
+    return [articles[i] for i in selected], {article_key(articles[i]): float(scores[i]) for i in selected}
+
+
+def story_priorities(stories: List[Dict], scores: Dict[str, float]) -> List[float]:
+    """Priority of each excerpt: the best score among the articles it stands for."""
+    return [
+        max((scores.get(key, 0.0) for key in (story.get("cluster_keys") or [article_key(story)])), default=0.0)
+        for story in stories
+    ]
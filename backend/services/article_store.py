@@ -0,0 +1,376 @@
+"""
+In-process article store with lazy content enrichment.
+
+/news returns RSS-level articles immediately and registers them here under
+their stable IDs. Full content is scraped later - either ahead of time by a
+background enrichment task, or on demand via GET /articles/{id}/content.
+
+Articles are kept as compact records (slotted, interned source/category
+strings, zlib-compressed summary, content and brief) in an LRU bounded by
+ARTICLE_STORE_MAX_BYTES. The store is snapshotted to a local file
+periodically and reloaded on startup, so restarted workers come back warm.
+"""
+import os
+import sys
+import zlib
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from services.news_fetcher import fetch_article_content
+
+# Concurrent scrapes used by background enrichment
+ENRICH_WORKERS = int(os.getenv("ARTICLE_ENRICH_WORKERS", "4"))
+
+# Memory budget for stored articles (approximate bytes)
+MAX_BYTES = int(os.getenv("ARTICLE_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Warm-restart snapshots
+SNAPSHOT_PATH = os.getenv(
+    "ARTICLE_STORE_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "article_store.pickle")
+)
+SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("ARTICLE_STORE_SNAPSHOT_INTERVAL", "300"))
+SNAPSHOT_VERSION = 2
+
+# Fixed per-record overhead (object header, slots, dict entry) used in accounting
+_RECORD_OVERHEAD = 200
+
+
+def _compress(text: Optional[str]) -> Optional[bytes]:
+    if text is None:
+        return None
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def _decompress(data: Optional[bytes]) -> Optional[str]:
+    if data is None:
+        return None
+    return zlib.decompress(data).decode("utf-8")
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+class ArticleRecord:
+    """Compact in-memory representation of one article."""
+
+    __slots__ = (
+        "id", "title", "link", "published", "source", "category", "category_name",
+        "rss_source", "enriched", "summary_z", "content_z", "brief_z", "size"
+    )
+
+    def __init__(self, article: Dict):
+        self.id = article["id"]
+        self.title = article.get("title", "")
+        self.link = article.get("link", "")
+        self.published = article.get("published", "")
+        # Repeated across every article of a feed - keep one copy
+        self.source = _intern(article.get("source"))
+        self.category = _intern(article.get("category"))
+        self.category_name = _intern(article.get("category_name"))
+        self.rss_source = _intern(article.get("rss_source"))
+        self.enriched = bool(article.get("enriched", False))
+        self.summary_z = _compress(article.get("summary"))
+        self.content_z = _compress(article.get("content"))
+        self.brief_z = _compress(article.get("brief"))
+        self.size = self._measure()
+
+    def _measure(self) -> int:
+        """Approximate memory held by this record (interned strings excluded)."""
+        size = _RECORD_OVERHEAD
+        for value in (self.id, self.title, self.link, self.published):
+            size += sys.getsizeof(value)
+        for value in (self.summary_z, self.content_z, self.brief_z):
+            if value is not None:
+                size += sys.getsizeof(value)
+        return size
+
+    def has_content(self) -> bool:
+        return self.content_z is not None
+
+    def to_dict(self) -> Dict:
+        """Expand back into the article dict shape used by the API."""
+        article = {
+            "id": self.id,
+            "title": self.title,
+            "link": self.link,
+            "summary": _decompress(self.summary_z),
+            "published": self.published,
+            "source": self.source,
+            "content": _decompress(self.content_z),
+            "rss_source": self.rss_source,
+        }
+        if self.category:
+            article["category"] = self.category
+            article["category_name"] = self.category_name
+        if self.enriched:
+            article["enriched"] = True
+        if self.brief_z is not None:
+            article["brief"] = _decompress(self.brief_z)
+        return article
+
+
+_records: "OrderedDict[str, ArticleRecord]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0}
+
+# Article ID -> Event for enrichments currently running, so the background
+# task and an on-demand request never scrape the same article twice
+_in_flight: Dict[str, threading.Event] = {}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_snapshot_thread: Optional[threading.Thread] = None
+_snapshot_stop = threading.Event()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Get or create the shared enrichment thread pool."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix="enrich")
+    return _executor
+
+
+def _store_record(record: ArticleRecord) -> None:
+    """Insert or replace a record and evict LRU entries over budget. Caller holds _lock."""
+    previous = _records.pop(record.id, None)
+    if previous is not None:
+        _stats["bytes"] -= previous.size
+
+    _records[record.id] = record
+    _stats["bytes"] += record.size
+
+    while _stats["bytes"] > MAX_BYTES and len(_records) > 1:
+        _, evicted = _records.popitem(last=False)
+        _stats["bytes"] -= evicted.size
+        _stats["evictions"] += 1
+        _stats["evicted_bytes"] += evicted.size
+
+
+def put_articles(articles: List[Dict]) -> None:
+    """Register articles under their IDs, keeping any content already scraped."""
+    with _lock:
+        for article in articles:
+            article_id = article.get("id")
+            if not article_id:
+                continue
+            record = ArticleRecord(article)
+            existing = _records.get(article_id)
+            if existing and existing.has_content() and not record.has_content():
+                record.content_z = existing.content_z
+                record.rss_source = existing.rss_source
+                record.enriched = existing.enriched
+            if existing and existing.brief_z is not None and record.brief_z is None:
+                record.brief_z = existing.brief_z
+            record.size = record._measure()
+            _store_record(record)
+
+
+def get_article(article_id: str) -> Optional[Dict]:
+    """Get an article by ID, or None if it is not in the store."""
+    with _lock:
+        record = _records.get(article_id)
+        if record is None:
+            _stats["misses"] += 1
+            return None
+        _records.move_to_end(article_id)
+        _stats["hits"] += 1
+    return record.to_dict()
+
+
+def is_enriched(article: Dict) -> bool:
+    """Check whether content extraction has already been attempted."""
+    return article.get("content") is not None or article.get("enriched", False)
+
+
+def enrich_article(article_id: str) -> Optional[Dict]:
+    """
+    Scrape full content for an article (if not done yet) and return it.
+    Concurrent calls for the same article wait for the first one.
+    """
+    article = get_article(article_id)
+    if article is None:
+        return None
+    if is_enriched(article):
+        return article
+
+    with _lock:
+        event = _in_flight.get(article_id)
+        owner = event is None
+        if owner:
+            event = threading.Event()
+            _in_flight[article_id] = event
+
+    if not owner:
+        event.wait()
+        return get_article(article_id)
+
+    try:
+        content, rss_source = fetch_article_content(article.get("link", "#"), article.get("title", ""))
+        # Update the current record: it may have changed (e.g. a brief) while scraping
+        with _lock:
+            record = _records.pop(article_id, None)
+            if record is None:
+                record = ArticleRecord(article)
+            else:
+                _stats["bytes"] -= record.size
+            record.content_z = _compress(content)
+            record.rss_source = _intern(rss_source)
+            record.enriched = True
+            record.size = record._measure()
+            _store_record(record)
+        return record.to_dict()
+    except Exception as e:
+        print(f"[ARTICLES] Error enriching {article_id}: {e}")
+        return get_article(article_id)
+    finally:
+        with _lock:
+            _in_flight.pop(article_id, None)
+        event.set()
+
+
+def enrich_articles(article_ids: List[str]) -> None:
+    """Enrich a batch of articles ahead of time (runs in the background)."""
+    pending = []
+    for article_id in article_ids:
+        article = get_article(article_id)
+        if article is not None and not is_enriched(article):
+            pending.append(article_id)
+
+    if not pending:
+        return
+
+    print(f"[ARTICLES] Background enrichment of {len(pending)} articles")
+    list(_get_executor().map(enrich_article, pending))
+
+
+def set_article_brief(article_id: str, brief: str) -> None:
+    """Attach a precomputed per-article summary to a stored article."""
+    with _lock:
+        record = _records.pop(article_id, None)
+        if record is None:
+            return
+        _stats["bytes"] -= record.size
+        record.brief_z = _compress(brief)
+        record.size = record._measure()
+        _store_record(record)
+
+
+def get_store_stats() -> Dict:
+    """Get size and hit/eviction accounting for the store."""
+    with _lock:
+        return {
+            "articles": len(_records),
+            "bytes": _stats["bytes"],
+            "max_bytes": MAX_BYTES,
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "evictions": _stats["evictions"],
+            "evicted_bytes": _stats["evicted_bytes"],
+        }
+
+
+# ============================================================================
+# SNAPSHOTS
+# ============================================================================
+
+def save_snapshot(path: str = None) -> int:
+    """
+    Write the store to a local file (atomically), oldest entries first.
+    Returns the number of articles written.
+    """
+    path = path or SNAPSHOT_PATH
+    with _lock:
+        rows = [
+            tuple(getattr(record, slot) for slot in ArticleRecord.__slots__)
+            for record in _records.values()
+        ]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": SNAPSHOT_VERSION, "slots": ArticleRecord.__slots__, "rows": rows}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def load_snapshot(path: str = None) -> int:
+    """
+    Load articles from a snapshot file, respecting the memory budget.
+    Returns the number of articles loaded (0 if there is no usable snapshot).
+    """
+    path = path or SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return 0
+
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except Exception as e:
+        print(f"[ARTICLES] Could not load snapshot {path}: {e}")
+        return 0
+
+    if snapshot.get("version") != SNAPSHOT_VERSION or tuple(snapshot.get("slots", ())) != ArticleRecord.__slots__:
+        print("[ARTICLES] Ignoring snapshot with incompatible format")
+        return 0
+
+    loaded = 0
+    with _lock:
+        for row in snapshot["rows"]:
+            record = ArticleRecord.__new__(ArticleRecord)
+            for slot, value in zip(ArticleRecord.__slots__, row):
+                setattr(record, slot, value)
+            for slot in ("source", "category", "category_name", "rss_source"):
+                setattr(record, slot, _intern(getattr(record, slot)))
+            if record.id in _records:
+                continue
+            _store_record(record)
+            loaded += 1
+
+    print(f"[ARTICLES] Loaded {loaded} articles from snapshot")
+    return loaded
+
+
+def _snapshot_loop(interval_seconds: int) -> None:
+    while not _snapshot_stop.wait(interval_seconds):
+        try:
+            save_snapshot()
+        except Exception as e:
+            print(f"[ARTICLES] Snapshot failed: {e}")
+
+
+def start_snapshots(interval_seconds: int = None) -> None:
+    """Load the last snapshot and start periodic snapshotting in the background."""
+    global _snapshot_thread
+
+    if _snapshot_thread is not None and _snapshot_thread.is_alive():
+        return
+
+    load_snapshot()
+
+    _snapshot_stop.clear()
+    _snapshot_thread = threading.Thread(
+        target=_snapshot_loop,
+        args=(interval_seconds or SNAPSHOT_INTERVAL_SECONDS,),
+        name="article-snapshots",
+        daemon=True
+    )
+    _snapshot_thread.start()
+
+
+def stop_snapshots() -> None:
+    """Stop periodic snapshotting and write a final snapshot."""
+    global _snapshot_thread
+
+    _snapshot_stop.set()
+    _snapshot_thread = None
+    try:
+        count = save_snapshot()
+        print(f"[ARTICLES] Saved {count} articles to snapshot")
+    except Exception as e:
+        print(f"[ARTICLES] Final snapshot failed: {e}")
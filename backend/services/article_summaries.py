@@ -0,0 +1,134 @@
+"""
+Per-article summary stage.
+
+Each article is summarized once into a short brief, keyed by its stable
+article ID (and, through the LLM response cache, by its content). Briefs are
+stored on the article record, served by /simplify, and used as the map step
+of digests: the digest prompt reduces over short briefs instead of the raw
+text of every article, so an article shared by many users is only
+summarized once.
+"""
+import os
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+from services import openai_gateway as gateway
+from services import article_store
+from services.openai_scheduler import background_priority
+from services import local_summarizer
+from services.openai_service import summarize_article_brief_async, summarize_article_brief_stream, ARTICLE_BRIEF_WORDS
+
+# Texts shorter than this are already brief - use them as-is
+MIN_CHARS_TO_SUMMARIZE = int(os.getenv("ARTICLE_SUMMARY_MIN_CHARS", "600"))
+
+# Concurrent per-article summary calls
+CONCURRENCY = int(os.getenv("ARTICLE_SUMMARY_CONCURRENCY", "8"))
+
+# Summarize articles ahead of time after background enrichment
+PREWARM_ENABLED = os.getenv("ARTICLE_PREWARM_SUMMARIES", "false").lower() == "true"
+
+
+def article_text(article: Dict) -> str:
+    """Best available plain text for an article (scraped content, else RSS summary)."""
+    raw = article.get("content") or article.get("summary") or ""
+    if not raw:
+        return ""
+    return BeautifulSoup(raw, "html.parser").get_text(separator=" ", strip=True)
+
+
+async def get_article_brief_async(article: Dict) -> Optional[str]:
+    """
+    Get the brief for an article, summarizing and storing it on first use.
+    Short texts are returned unchanged; if OpenAI is unavailable a local
+    extract is returned. Returns None if there is no text.
+    """
+    if article.get("brief"):
+        return article["brief"]
+    
+    if article.get("id"):
+        stored = article_store.get_article(article["id"])
+        if stored and stored.get("brief"):
+            return stored["brief"]
+
+    text = article_text(article)
+    if not text:
+        return None
+    if len(text) < MIN_CHARS_TO_SUMMARIZE:
+        return text
+
+    brief = await summarize_article_brief_async(article.get("title", ""), text)
+    if not brief:
+        # Local extract; not stored, so the LLM brief replaces it once available
+        return local_summarizer.summarize_text(text, ARTICLE_BRIEF_WORDS)
+    if article.get("id"):
+        article_store.set_article_brief(article["id"], brief)
+    return brief
+
+
+async def stream_article_brief(article: Dict) -> AsyncIterator[str]:
+    """
+    Streaming variant of get_article_brief_async. An existing brief is
+    yielded in one piece; a newly generated one is stored once complete.
+    Raises on API errors.
+    """
+    if article.get("brief"):
+        yield article["brief"]
+        return
+    
+    if article.get("id"):
+        stored = article_store.get_article(article["id"])
+        if stored and stored.get("brief"):
+            yield stored["brief"]
+            return
+
+    text = article_text(article)
+    if not text:
+        return
+    if len(text) < MIN_CHARS_TO_SUMMARIZE:
+        yield text
+        return
+    if not gateway.is_configured():
+        yield local_summarizer.summarize_text(text, ARTICLE_BRIEF_WORDS)
+        return
+
+    parts = []
+    async for delta in summarize_article_brief_stream(article.get("title", ""), text):
+        parts.append(delta)
+        yield delta
+    if article.get("id"):
+        article_store.set_article_brief(article["id"], "".join(parts))
+
+
+async def get_article_briefs_async(articles: List[Dict]) -> List[Optional[str]]:
+    """Get briefs for many articles concurrently (bounded by CONCURRENCY)."""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def _one(article: Dict) -> Optional[str]:
+        async with semaphore:
+            return await get_article_brief_async(article)
+
+    return await asyncio.gather(*[_one(article) for article in articles])
+
+
+def get_article_briefs(articles: List[Dict]) -> List[Optional[str]]:
+    """Sync wrapper for get_article_briefs_async."""
+    return gateway.run_sync(get_article_briefs_async(articles))
+
+
+@background_priority
+def prewarm_article_summaries(article_ids: List[str]) -> None:
+    """Summarize stored articles ahead of time (runs in the background)."""
+    if not PREWARM_ENABLED or not gateway.is_configured():
+        return
+
+    articles = []
+    for article_id in article_ids:
+        article = article_store.get_article(article_id)
+        if article is not None and not article.get("brief"):
+            articles.append(article)
+
+    if articles:
+        print(f"[ARTICLES] Pre-warming summaries for {len(articles)} articles")
+        get_article_briefs(articles)
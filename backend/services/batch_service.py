@@ -0,0 +1,261 @@
+"""
+Batch-mode chat completions for non-urgent work (scheduled digests).
+
+Requests are written in the OpenAI Batch API JSONL format, submitted as one
+batch job, polled until complete, and returned keyed by custom_id. Two
+runners share the same interface:
+- OpenAIBatchRunner submits to the Batch API,
+- LocalBatchRunner runs the same JSONL through the normal client, so the
+  whole flow works (and can be tested) without the Batch API.
+
+Responses are read from and written to the LLM response cache, so requests
+already answered are never submitted.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+from services import openai_gateway as gateway
+from services import llm_cache
+
+# "openai" (Batch API) or "local" (stand-in using the normal client)
+RUNNER = os.getenv("BATCH_RUNNER", "openai").lower()
+POLL_INTERVAL_SECONDS = float(os.getenv("BATCH_POLL_INTERVAL_SECONDS", "30"))
+TIMEOUT_SECONDS = float(os.getenv("BATCH_TIMEOUT_SECONDS", str(24 * 3600)))
+
+# Concurrent requests used by the local runner
+LOCAL_CONCURRENCY = int(os.getenv("BATCH_LOCAL_CONCURRENCY", "8"))
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_jsonl(requests: Dict[str, Dict]) -> str:
+    """Build Batch API input (one line per custom_id -> chat completion body)."""
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body},
+                   ensure_ascii=False)
+        for custom_id, body in requests.items()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def parse_batch_output(output: str, record_usage: bool = False) -> Dict[str, Optional[str]]:
+    """
+    Parse Batch API output JSONL into custom_id -> completion text (None on
+    error), optionally adding each response's token usage to the gateway stats.
+    """
+    results = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        text = None
+        if not row.get("error") and response.get("status_code") == 200:
+            try:
+                text = response["body"]["choices"][0]["message"]["content"]
+                if record_usage:
+                    gateway.record_usage(response["body"].get("model", "batch"), response["body"].get("usage"))
+            except (KeyError, IndexError, TypeError):
+                text = None
+        if text is None:
+            print(f"[BATCH] Request {row.get('custom_id')} failed: {row.get('error') or response.get('status_code')}")
+        results[row.get("custom_id")] = text
+    return results
+
+
+def _cache_key(body: Dict) -> str:
+    messages = body["messages"]
+    return llm_cache.make_key(
+        body["model"], messages[0]["content"], messages[-1]["content"],
+        body["max_tokens"], body.get("temperature", 0.7)
+    )
+
+
+# ============================================================================
+# RUNNERS
+# ============================================================================
+
+class OpenAIBatchRunner:
+    """Runs batches on the OpenAI Batch API."""
+
+    # Batch API calls bypass the gateway, so usage comes from the output file
+    records_usage = True
+
+    def submit(self, jsonl: str) -> str:
+        batch = gateway.create_batch_sync(jsonl.encode("utf-8"), endpoint=ENDPOINT)
+        return batch["id"]
+
+    def retrieve(self, batch_id: str) -> Dict:
+        return gateway.retrieve_batch_sync(batch_id)
+
+    def cancel(self, batch_id: str) -> None:
+        gateway.cancel_batch_sync(batch_id)
+
+    def output(self, batch: Dict) -> str:
+        file_id = batch.get("output_file_id")
+        return gateway.file_text_sync(file_id) if file_id else ""
+
+
+class LocalBatchRunner:
+    """
+    Stand-in for the Batch API: runs each JSONL line through the normal
+    client (bounded concurrency) and reports status and output in the same
+    shape as OpenAIBatchRunner.
+    """
+
+    # Usage is already recorded by the gateway for each call
+    records_usage = False
+
+    def __init__(self, concurrency: int = None):
+        self.concurrency = concurrency or LOCAL_CONCURRENCY
+        self._batches: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, jsonl: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        lines = [json.loads(line) for line in jsonl.splitlines() if line.strip()]
+        with self._lock:
+            self._batches[batch_id] = {
+                "id": batch_id,
+                "status": "in_progress",
+                "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+                "output": "",
+            }
+        gateway.submit(self._run(batch_id, lines))
+        return batch_id
+
+    async def _run_line(self, batch_id: str, line: Dict, semaphore: asyncio.Semaphore) -> str:
+        body = dict(line["body"])
+        async with semaphore:
+            try:
+                response = await gateway.chat(
+                    model=body.pop("model"),
+                    messages=body.pop("messages"),
+                    max_tokens=body.pop("max_tokens"),
+                    temperature=body.pop("temperature", 0.7),
+                    **body
+                )
+                row = {"custom_id": line["custom_id"], "response": {"status_code": 200, "body": response.model_dump()},
+                       "error": None}
+                counter = "completed"
+            except Exception as e:
+                row = {"custom_id": line["custom_id"], "response": None,
+                       "error": {"code": type(e).__name__, "message": str(e)}}
+                counter = "failed"
+
+        with self._lock:
+            self._batches[batch_id]["request_counts"][counter] += 1
+        return json.dumps(row, ensure_ascii=False)
+
+    async def _run(self, batch_id: str, lines: List[Dict]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        rows = await asyncio.gather(*[self._run_line(batch_id, line, semaphore) for line in lines])
+        with self._lock:
+            batch = self._batches[batch_id]
+            if batch["status"] == "cancelled":
+                del self._batches[batch_id]
+                return
+            batch["output"] = "\n".join(rows) + "\n"
+            batch["status"] = "completed"
+
+    def retrieve(self, batch_id: str) -> Dict:
+        with self._lock:
+            batch = self._batches[batch_id]
+            return {key: value for key, value in batch.items() if key != "output"}
+
+    def cancel(self, batch_id: str) -> None:
+        # Requests already running finish; the output is discarded
+        with self._lock:
+            self._batches[batch_id]["status"] = "cancelled"
+
+    def output(self, batch: Dict) -> str:
+        with self._lock:
+            return self._batches.pop(batch["id"])["output"]
+
+
+_local_runner: Optional[LocalBatchRunner] = None
+
+
+def get_runner():
+    """Get the configured batch runner (BATCH_RUNNER)."""
+    global _local_runner
+    if RUNNER == "local":
+        if _local_runner is None:
+            _local_runner = LocalBatchRunner()
+        return _local_runner
+    return OpenAIBatchRunner()
+
+
+# ============================================================================
+# RUNNING A BATCH
+# ============================================================================
+
+def run_batch(
+    requests: Dict[str, Dict],
+    runner=None,
+    poll_interval: float = None,
+    timeout: float = None
+) -> Dict[str, Optional[str]]:
+    """
+    Run chat completion requests (custom_id -> request body) as one batch job
+    and block until it finishes or `timeout` passes; a batch still running
+    then is cancelled. Returns custom_id -> completion text, with None for
+    requests that failed or did not complete in time.
+    """
+    runner = runner or get_runner()
+    poll_interval = POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+    timeout = timeout or TIMEOUT_SECONDS
+
+    results: Dict[str, Optional[str]] = {}
+    pending: Dict[str, Dict] = {}
+    for custom_id, body in requests.items():
+        cached = llm_cache.get(_cache_key(body))
+        if cached is not None:
+            results[custom_id] = cached
+        else:
+            pending[custom_id] = body
+
+    print(f"[BATCH] {len(requests)} requests ({len(results)} cached, {len(pending)} to run)")
+    if not pending:
+        return results
+
+    try:
+        batch_id = runner.submit(build_batch_jsonl(pending))
+    except Exception as e:
+        print(f"[BATCH] Failed to submit batch: {e}")
+        return {**results, **{custom_id: None for custom_id in pending}}
+
+    print(f"[BATCH] Submitted {batch_id}")
+    deadline = time.monotonic() + timeout
+    batch = runner.retrieve(batch_id)
+    while batch.get("status") not in TERMINAL_STATUSES:
+        if time.monotonic() >= deadline:
+            print(f"[BATCH] {batch_id} timed out in status {batch.get('status')}, cancelling")
+            try:
+                runner.cancel(batch_id)
+            except Exception as e:
+                print(f"[BATCH] Error cancelling {batch_id}: {e}")
+            return {**results, **{custom_id: None for custom_id in pending}}
+        time.sleep(poll_interval)
+        try:
+            batch = runner.retrieve(batch_id)
+        except Exception as e:
+            print(f"[BATCH] Error polling {batch_id}: {e}")
+
+    print(f"[BATCH] {batch_id} finished: {batch.get('status')} {batch.get('request_counts')}")
+    # Expired batches still return the requests that finished in time
+    output = runner.output(batch) if batch.get("status") in ("completed", "expired") else ""
+    completed = parse_batch_output(output, record_usage=getattr(runner, "records_usage", False))
+
+    for custom_id, body in pending.items():
+        text = completed.get(custom_id)
+        if text is not None:
+            llm_cache.put(_cache_key(body), text)
+        results[custom_id] = text
+    return results
@@ -0,0 +1,309 @@
+"""
+Structured digest format shared by the PDF, email and TTS renderers.
+
+A digest is a dict:
+
+    {
+        "title": "...",
+        "sections": [
+            {"heading": "...", "stories": [
+                {"headline": "...", "summary": "...", "source": "...", "link": "..."}
+            ]}
+        ]
+    }
+
+The LLM produces it directly (DIGEST_SCHEMA, see openai_service); free text
+(local summaries, text posted by the frontend) is parsed into it once with
+digest_from_text. Renderers work from the structure, one story block at a
+time, and rendered blocks are cached so stories repeated across digests
+and users are rendered once.
+"""
+import re
+import json
+from html import escape
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# JSON schema for structured LLM output. Stories cite the "ARTICLE n"
+# numbers of the excerpt block; links are filled in from those articles
+# (see attach_sources) rather than generated by the model.
+DIGEST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "sections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "heading": {"type": "string"},
+                    "stories": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "headline": {"type": "string"},
+                                "summary": {"type": "string"},
+                                "source": {"type": "string"},
+                                "articles": {"type": "array", "items": {"type": "integer"}},
+                            },
+                            "required": ["headline", "summary", "source", "articles"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["heading", "stories"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["title", "sections"],
+    "additionalProperties": False,
+}
+
+# Cached rendered story blocks per renderer
+STORY_CACHE_SIZE = 2048
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.*)$")
+_BOLD_LEAD_RE = re.compile(r"^\*\*(.+?)\*\*(?:\s*\(([^)]*)\))?\s*[:\-–—]?\s*(.*)$", re.DOTALL)
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_RULE_RE = re.compile(r"^(?:-{3,}|\*{3,}|_{3,})$")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^)\s]+)\)")
+_EMPHASIS_RE = re.compile(r"(\*\*|__|\*|_)(.+?)\1")
+
+
+# ============================================================================
+# BUILDING DIGESTS
+# ============================================================================
+
+def _story(headline: str = "", summary: str = "", source: str = "", link: str = "") -> Dict:
+    return {"headline": headline.strip(), "summary": summary.strip(), "source": source.strip(), "link": link.strip()}
+
+
+def _strip_markdown(text: str) -> Tuple[str, str]:
+    """Plain text of a markdown fragment, and its first link (or "")."""
+    match = _LINK_RE.search(text)
+    link = match.group(2) if match else ""
+    text = _LINK_RE.sub(r"\1", text)
+    text = _EMPHASIS_RE.sub(r"\2", text)
+    return re.sub(r"\s+", " ", text).strip(), link
+
+
+def digest_from_text(text: str, title: str = "") -> Dict:
+    """
+    Parse free-form digest text (markdown headings, "**Headline**: summary"
+    paragraphs, bullets or plain paragraphs) into a digest.
+    """
+    sections: List[Dict] = [{"heading": "", "stories": []}]
+    for block in re.split(r"\n\s*\n", text or ""):
+        for line in _split_block(block.strip()):
+            heading = _HEADING_RE.match(line)
+            if heading:
+                sections.append({"heading": _strip_markdown(heading.group(1))[0], "stories": []})
+                continue
+            line = _BULLET_RE.sub("", line)
+            lead = _BOLD_LEAD_RE.match(line)
+            if lead and lead.group(3).strip():
+                summary, link = _strip_markdown(lead.group(3))
+                story = _story(_strip_markdown(lead.group(1))[0], summary, lead.group(2) or "", link)
+            elif lead and len(sections[-1]["stories"]) == 0 and not sections[-1]["heading"]:
+                # A bold line on its own at the top of a section acts as its heading
+                sections[-1]["heading"] = _strip_markdown(lead.group(1))[0]
+                continue
+            else:
+                summary, link = _strip_markdown(line)
+                story = _story(summary=summary, link=link)
+            if story["summary"] or story["headline"]:
+                sections[-1]["stories"].append(story)
+
+    return {"title": title, "sections": [s for s in sections if s["stories"] or s["heading"]]}
+
+
+def _split_block(block: str) -> List[str]:
+    """
+    Lines of a block that start their own item (headings, bullets); other
+    lines are joined. Horizontal rules are dropped and end the current item.
+    """
+    items: List[str] = []
+    boundary = True
+    for line in block.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if _RULE_RE.match(line):
+            boundary = True
+            continue
+        if boundary or _HEADING_RE.match(line) or _BULLET_RE.match(line) or _HEADING_RE.match(items[-1]):
+            items.append(line)
+        else:
+            items[-1] = f"{items[-1]} {line}"
+        boundary = False
+    return items
+
+
+def parse_digest_json(text: str) -> Optional[Dict]:
+    """Parse and normalize structured LLM output (DIGEST_SCHEMA); None if it is not a digest."""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    return normalize_digest(data)
+
+
+def normalize_digest(data) -> Optional[Dict]:
+    """
+    Normalize a digest from an untrusted source (LLM output, request body):
+    fields become strings, malformed sections and stories are dropped.
+    Returns None if nothing digest-shaped is left.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("sections"), list):
+        return None
+
+    sections = []
+    for section in data["sections"]:
+        if not isinstance(section, dict):
+            continue
+        stories = []
+        stories_in = section.get("stories")
+        for story in stories_in if isinstance(stories_in, list) else []:
+            if not isinstance(story, dict) or not str(story.get("summary") or "").strip():
+                continue
+            normalized = _story(str(story.get("headline") or ""), str(story.get("summary")),
+                                str(story.get("source") or ""), str(story.get("link") or ""))
+            if isinstance(story.get("articles"), list):
+                normalized["articles"] = [n for n in story["articles"] if isinstance(n, int)]
+            if isinstance(story.get("article_ids"), list):
+                normalized["article_ids"] = [str(key) for key in story["article_ids"]]
+            stories.append(normalized)
+        if stories:
+            sections.append({"heading": str(section.get("heading") or "").strip(), "stories": stories})
+
+    if not sections:
+        return None
+    return {"title": str(data.get("title") or "").strip(), "sections": sections}
+
+
+def article_key(article: Dict) -> str:
+    """Stable identity of an article across fetches."""
+    return article.get("id") or article.get("link") or article.get("title", "")
+
+
+def attach_sources(digest: Dict, articles: Sequence[Dict]) -> Dict:
+    """
+    Fill each story's source and link from the articles it cites, and record
+    their keys in "article_ids". `articles` are in excerpt order: ARTICLE n
+    is articles[n - 1]. A story representative (see topic_clustering)
+    stands for every article in its cluster.
+    """
+    for _, story in iter_stories(digest):
+        cited = [articles[n - 1] for n in story.pop("articles", []) if 0 < n <= len(articles)]
+        story["article_ids"] = [
+            key for article in cited for key in (article.get("cluster_keys") or [article_key(article)])
+        ]
+        if cited:
+            story["link"] = story.get("link") or cited[0].get("link") or ""
+            story["source"] = story.get("source") or cited[0].get("source") or ""
+    return digest
+
+
+def ensure_digest(digest_or_text, title: str = "") -> Dict:
+    """Digest as-is, or parsed from text."""
+    if isinstance(digest_or_text, dict):
+        return digest_or_text
+    return digest_from_text(digest_or_text or "", title)
+
+
+def iter_stories(digest: Dict) -> Iterator[Tuple[Dict, Dict]]:
+    """(section, story) pairs in reading order."""
+    for section in digest.get("sections", []):
+        for story in section.get("stories", []):
+            yield section, story
+
+
+def _key(story: Dict) -> Tuple[str, str, str, str]:
+    return story.get("headline", ""), story.get("summary", ""), story.get("source", ""), story.get("link", "")
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+@lru_cache(maxsize=STORY_CACHE_SIZE)
+def _story_markdown(headline: str, summary: str, source: str, link: str) -> str:
+    text = f"**{headline}**: {summary}" if headline else summary
+    if source:
+        text += f" ({source})"
+    return text
+
+
+def digest_to_text(digest: Dict) -> str:
+    """Markdown text of a digest (API responses, plain-text email bodies)."""
+    parts = []
+    for section in digest.get("sections", []):
+        if section.get("heading"):
+            parts.append(f"## {section['heading']}")
+        parts.extend(_story_markdown(*_key(story)) for story in section.get("stories", []))
+    return "\n\n".join(parts)
+
+
+@lru_cache(maxsize=STORY_CACHE_SIZE)
+def story_speech(headline: str, summary: str, source: str, link: str) -> str:
+    """Spoken form of one story."""
+    if headline:
+        return f"{headline.rstrip('.')}. {summary}"
+    return summary
+
+
+def digest_to_speech(digest: Dict) -> str:
+    """Plain text of a digest for TTS, without markup."""
+    parts = []
+    for section in digest.get("sections", []):
+        if section.get("heading"):
+            parts.append(f"{section['heading'].rstrip('.')}.")
+        parts.extend(story_speech(*_key(story)) for story in section.get("stories", []))
+    return "\n\n".join(parts)
+
+
+@lru_cache(maxsize=STORY_CACHE_SIZE)
+def story_html(headline: str, summary: str, source: str, link: str) -> str:
+    """HTML block for one story (email bodies)."""
+    html = '<div class="story" style="margin-bottom: 16px;">'
+    if headline:
+        title = escape(headline)
+        if link:
+            title = f'<a href="{escape(link)}" style="color: #4c51bf; text-decoration: none;">{title}</a>'
+        html += f'<div style="font-weight: 600; margin-bottom: 4px;">{title}</div>'
+    html += f"<div>{escape(summary)}</div>"
+    if source:
+        html += f'<div style="color: #888; font-size: 12px; margin-top: 4px;">{escape(source)}</div>'
+    return html + "</div>"
+
+
+def iter_digest_html(digest: Dict) -> Iterator[str]:
+    """HTML of a digest, one section at a time."""
+    for section in digest.get("sections", []):
+        html = ""
+        if section.get("heading"):
+            html += f'<h3 style="color: #667eea; margin: 20px 0 10px 0;">{escape(section["heading"])}</h3>'
+        html += "".join(story_html(*_key(story)) for story in section.get("stories", []))
+        yield html
+
+
+def digest_to_html(digest: Dict) -> str:
+    """HTML fragment of a digest (email bodies)."""
+    return "".join(iter_digest_html(digest))
+
+
+@lru_cache(maxsize=STORY_CACHE_SIZE)
+def story_pdf_markup(headline: str, summary: str, source: str, link: str) -> str:
+    """ReportLab paragraph markup for one story."""
+    markup = ""
+    if headline:
+        title = escape(headline)
+        if link:
+            title = f'<link href="{escape(link)}" color="#1565c0">{title}</link>'
+        markup += f"<b>{title}</b>: "
+    markup += escape(summary)
+    if source:
+        markup += f' <font color="#888888">({escape(source)})</font>'
+    return markup
@@ -1,7 +1,13 @@
+import os
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from bs4 import BeautifulSoup
 from services.news_fetcher import fetch_news
 from services.openai_service import create_digest as openai_create_digest
+from services.prompt_budget import fit_excerpts
+
+# Ask the LLM for structured digests (see digest_format) instead of free text
+STRUCTURED_OUTPUT = os.getenv("DIGEST_STRUCTURED_OUTPUT", "true").lower() == "true"
 
 
 def combine_articles_text(articles: list) -> str:
@@ -21,6 +27,65 @@ def combine_articles_text(articles: list) -> str:
     return "\n\n".join(combined)
 
 
+def _canonical_key(article: Dict):
+    """Sort key that places an article the same way for every user."""
+    group = article.get('category') or article.get('source') or ''
+    return (group, article.get('id') or article.get('link') or article.get('title', ''))
+
+
+def excerpt_order(articles: List[Dict]) -> List[Dict]:
+    """Articles in the order build_combined_excerpts lays them out (ARTICLE n is item n - 1)."""
+    return sorted(articles, key=_canonical_key)
+
+
+def build_combined_excerpts(
+    articles: List[Dict],
+    briefs: Optional[List[Optional[str]]] = None,
+    token_budget: Optional[int] = None,
+    priorities: Optional[List[float]] = None
+) -> str:
+    """
+    Build the combined excerpt text that digest prompts reduce over.
+    
+    Uses each article's precomputed brief when available (see
+    article_summaries), otherwise its cleaned RSS summary. The result is
+    fitted into token_budget (default PROMPT_INPUT_TOKEN_BUDGET), trimming
+    or dropping the lowest-priority excerpts first.
+    
+    Articles are laid out in a canonical order (by category or source, then
+    ID) so users who share categories send the same leading article block,
+    which the provider's prompt cache can reuse.
+    
+    Story representatives from topic_clustering list the other sources that
+    reported the same story on an "Also reported by" line.
+    """
+    if priorities is None:
+        # Earlier articles in the caller's order rank higher
+        priorities = [-i for i in range(len(articles))]
+    order = sorted(range(len(articles)), key=lambda i: _canonical_key(articles[i]))
+    
+    excerpts = []
+    for idx, i in enumerate(order, 1):
+        article = articles[i]
+        title = article.get('title', 'Untitled')
+        source = article.get('source', 'Unknown')
+        
+        section = f"ARTICLE {idx}: {title}\n"
+        section += f"Source: {source}\n"
+        if article.get('also_reported_by'):
+            section += f"Also reported by: {', '.join(article['also_reported_by'])}\n"
+        
+        brief = briefs[i] if briefs else None
+        if brief:
+            section += brief
+        elif article.get('summary'):
+            section += BeautifulSoup(article['summary'], 'html.parser').get_text(separator=' ', strip=True)
+        
+        excerpts.append(section)
+    
+    return "\n\n".join(fit_excerpts(excerpts, token_budget, [priorities[i] for i in order]))
+
+
 def generate_digest() -> Dict:
     """
     Fetch all news and generate a one-page digest.
@@ -40,12 +105,20 @@ def generate_digest() -> Dict:
     # Get unique sources
     sources = list(set(article.get('source', 'Unknown') for article in articles))
     
-    # Try OpenAI digest first
-    digest_text = openai_create_digest(articles)
+    # Map: one short brief per article (shared across requests and users)
+    from services.article_summaries import get_article_briefs
+    briefs = get_article_briefs(articles)
+    brief_articles = [
+        {**article, "content": brief or article.get("content")}
+        for article, brief in zip(articles, briefs)
+    ]
     
-    # Fallback to simple concatenation if OpenAI is not available
+    # Reduce: try OpenAI digest over the briefs first
+    digest_text = openai_create_digest(brief_articles)
+    
+    # Fall back to a local extractive digest if OpenAI is not available
     if not digest_text:
-        digest_text = _create_mock_digest(articles)
+        digest_text = _create_local_digest(articles, briefs)
     
     return {
         "digest": digest_text,
@@ -55,21 +128,21 @@ def generate_digest() -> Dict:
     }
 
 
-def _create_mock_digest(articles: list) -> str:
+def _create_local_digest(articles: list, briefs: Optional[List[Optional[str]]] = None) -> str:
     """
-    Create a concise one-page digest when OpenAI is not available.
+    Create a concise one-page extractive digest (local_summarizer) when
+    OpenAI is not available.
     """
-    today = datetime.now().strftime("%B %d, %Y")
-    
-    # Limit to top 8 articles total for one-page fit
-    top_articles = articles[:8]
+    from services.local_summarizer import summarize_articles
     
+    today = datetime.now().strftime("%B %d, %Y")
     header = f"**Daily News Digest - {today}**\n\n"
     
-    content = ""
-    for i, article in enumerate(top_articles, 1):
-        title = article.get('title', 'Untitled')
-        # Keep only headline, no summary
-        content += f"{i}. {title}\n\n"
+    items = []
+    for idx, article in enumerate(articles):
+        text = (briefs[idx] if briefs else None) or article.get('content') or article.get('summary') or ''
+        text = BeautifulSoup(text, 'html.parser').get_text(separator=' ', strip=True)
+        items.append((article.get('title', 'Untitled'), text))
     
-    return header + content
+    # Same length as the LLM digest (150-200 words)
+    return header + summarize_articles(items, target_words=200)
@@ -4,10 +4,12 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from datetime import datetime
 
+from services.digest_format import digest_to_html, ensure_digest
+
 load_dotenv()
 
 
@@ -98,7 +100,8 @@ def send_news_summary_email(
     summary: str,
     pdf_bytes: Optional[bytes] = None,
     audio_bytes: Optional[bytes] = None,
-    recipients: Optional[List[str]] = None
+    recipients: Optional[List[str]] = None,
+    digest: Optional[Dict] = None
 ) -> bool:
     """
     Send a news summary email with optional PDF and audio attachments.
@@ -108,6 +111,7 @@ def send_news_summary_email(
         pdf_bytes: Optional PDF attachment bytes
         audio_bytes: Optional audio attachment bytes
         recipients: Optional list of recipients (uses config if not provided)
+        digest: Optional structured digest (see digest_format); parsed from summary if not provided
     
     Returns:
         True if email sent successfully, False otherwise
@@ -120,6 +124,7 @@ def send_news_summary_email(
     time_str = now.strftime("%I:%M %p")
     
     subject = f"📰 Your Daily News Summary - {date_str}"
+    summary_html = digest_to_html(ensure_digest(digest or summary))
     
     # Create HTML email body
     body_html = f"""
@@ -180,7 +185,7 @@ def send_news_summary_email(
         </div>
         
         <div class="content">
-            {summary.replace(chr(10), '<br>')}
+            {summary_html}
         </div>
         
         {"<div class='attachments'><strong>📎 Attachments:</strong> " + 
@@ -0,0 +1,173 @@
+"""
+Streaming RSS/Atom parser that stops after the first N entries.
+
+The feed is read in chunks and fed to an lxml pull parser. Each completed
+<item>/<entry> is normalized into a feedparser-style entry and then released,
+and the download is closed as soon as enough entries have been collected, so
+parse time and peak memory scale with the number of entries actually used.
+Feeds that lxml cannot parse (or when lxml is not installed) fall back to
+feedparser.
+"""
+from typing import List
+
+import feedparser
+import requests
+
+from services.news_fetcher import get_headers
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - optional dependency
+    etree = None
+
+CHUNK_SIZE = 16 * 1024
+
+# Local element names that mark one feed entry (RSS 2.0 / RSS 1.0 and Atom)
+_ENTRY_TAGS = {"item", "entry"}
+
+_CONTENT_NS = "http://purl.org/rss/1.0/modules/content/"
+_ATOM_NS = "http://www.w3.org/2005/Atom"
+_DC_NS = "http://purl.org/dc/elements/1.1/"
+
+# Namespaces of the core entry elements: RSS 2.0 (none), RSS 1.0 and Atom.
+# Extension elements with the same local name (media:title, media:content,
+# itunes:summary, ...) are ignored.
+_CORE_NS = {"", "http://purl.org/rss/1.0/", _ATOM_NS}
+
+
+def _local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1] if tag.startswith("{") else tag.split(":")[-1]
+
+
+def _namespace(tag) -> str:
+    if not isinstance(tag, str) or not tag.startswith("{"):
+        return ""
+    return tag[1:].split("}", 1)[0]
+
+
+def _inner_text(element) -> str:
+    """Text of an element, serializing child markup (Atom type="xhtml")."""
+    if len(element):
+        parts = [element.text or ""]
+        for child in element:
+            parts.append(etree.tostring(child, encoding="unicode", with_tail=True))
+        return "".join(parts).strip()
+    return (element.text or "").strip()
+
+
+def _normalize_entry(element) -> feedparser.FeedParserDict:
+    """Convert an <item>/<entry> element into a feedparser-style entry."""
+    entry = feedparser.FeedParserDict()
+    content_values = []
+
+    for child in element:
+        name, namespace = _local_name(child.tag), _namespace(child.tag)
+        if namespace == _CONTENT_NS:
+            if name == "encoded":
+                content_values.append(_inner_text(child))
+            continue
+        if namespace == _DC_NS:
+            if name == "date":
+                entry.setdefault("published", (child.text or "").strip())
+            continue
+        if namespace not in _CORE_NS:
+            continue
+
+        if name == "title":
+            entry.setdefault("title", _inner_text(child))
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                entry.setdefault("link", (child.text or "").strip())
+            elif child.get("rel", "alternate") == "alternate":
+                entry.setdefault("link", href)
+        elif name in ("description", "summary"):
+            entry.setdefault("summary", _inner_text(child))
+        elif name == "content" and namespace == _ATOM_NS:
+            content_values.append(_inner_text(child))
+        elif name in ("pubDate", "published", "issued"):
+            entry.setdefault("published", (child.text or "").strip())
+        elif name in ("updated", "modified"):
+            entry.setdefault("updated", (child.text or "").strip())
+        elif name in ("guid", "id"):
+            entry.setdefault("id", (child.text or "").strip())
+
+    if "published" not in entry and "updated" in entry:
+        entry["published"] = entry["updated"]
+    if content_values:
+        entry["content"] = [feedparser.FeedParserDict(value=v) for v in content_values if v]
+    if "summary" in entry:
+        entry["description"] = entry["summary"]
+
+    return entry
+
+
+def _stream_entries(response, limit: int, buffer: List[bytes]) -> List[feedparser.FeedParserDict]:
+    """Pull-parse the response body until `limit` entries are complete."""
+    parser = etree.XMLPullParser(events=("end",), resolve_entities=False, no_network=True, huge_tree=False)
+    entries = []
+
+    for chunk in response.iter_content(CHUNK_SIZE):
+        buffer.append(chunk)
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if _local_name(element.tag) not in _ENTRY_TAGS:
+                continue
+            entries.append(_normalize_entry(element))
+            # Release the parsed entry and anything before it
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+            if len(entries) >= limit:
+                return entries
+
+    parser.close()
+    return entries
+
+
+def parse_feed_entries(url: str, limit: int, timeout: int = 15) -> List:
+    """
+    Fetch a feed and return at most `limit` normalized entries.
+    Uses the streaming parser when possible and falls back to feedparser.
+    """
+    if limit <= 0:
+        return []
+
+    if etree is None:
+        return feedparser.parse(url).entries[:limit]
+
+    try:
+        response = requests.get(url, headers=get_headers(), timeout=timeout, stream=True)
+    except requests.RequestException as e:
+        print(f"[DEBUG] Streaming fetch failed for {url}: {e}")
+        return feedparser.parse(url).entries[:limit]
+
+    buffer: List[bytes] = []
+    try:
+        response.raise_for_status()
+        entries = _stream_entries(response, limit, buffer)
+        if entries:
+            response.close()
+            return entries
+        reason = "no entries found"
+    except etree.XMLSyntaxError as e:
+        reason = f"malformed XML: {e}"
+    except requests.RequestException as e:
+        print(f"[DEBUG] Error fetching feed {url}: {e}")
+        response.close()
+        return []
+
+    # Let feedparser have a go at the whole document (what we read plus the rest)
+    print(f"[DEBUG] Falling back to feedparser for {url} ({reason})")
+    try:
+        buffer.extend(response.iter_content(CHUNK_SIZE))
+    except requests.RequestException:
+        pass  # Body already fully read
+    finally:
+        response.close()
+
+    return feedparser.parse(b"".join(buffer)).entries[:limit]
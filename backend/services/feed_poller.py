@@ -0,0 +1,327 @@
+"""
+Adaptive poller for user-defined feed subscriptions.
+
+Every subscribed feed URL is polled once no matter how many users follow it.
+Feeds are kept in a heap ordered by next poll time, so the scheduler only
+ever looks at the feed that is due next. After each poll the feed's interval
+adapts to how often it actually publishes: feeds that produce new items are
+polled more often, quiet feeds back off towards FEED_POLL_MAX_SECONDS.
+Conditional GETs (ETag / Last-Modified) keep unchanged polls cheap, and
+fetches only go to public hosts (see url_safety).
+
+Polled entries are stored in the article store; the poller only keeps the
+IDs of each feed's most recent entries.
+"""
+import os
+import time
+import heapq
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import feedparser
+
+from services.url_safety import safe_get
+from services.news_fetcher import get_headers, extract_content_from_entry, make_article_id
+from services import article_store
+
+MIN_INTERVAL = int(os.getenv("FEED_POLL_MIN_SECONDS", "300"))
+MAX_INTERVAL = int(os.getenv("FEED_POLL_MAX_SECONDS", str(6 * 3600)))
+DEFAULT_INTERVAL = int(os.getenv("FEED_POLL_DEFAULT_SECONDS", "1800"))
+POLL_WORKERS = int(os.getenv("FEED_POLL_WORKERS", "16"))
+
+# Aim to find about this many new items per poll
+TARGET_NEW_PER_POLL = 1.0
+# Interval growth when a poll finds nothing new
+QUIET_BACKOFF = 1.5
+# Entries remembered per feed (for "latest articles" and new-item detection)
+KEEP_ENTRIES = 20
+
+
+class FeedState:
+    """Polling state for one feed URL."""
+
+    __slots__ = (
+        "url", "title", "subscribers", "interval", "next_poll", "last_polled",
+        "etag", "modified", "recent_ids", "polls", "new_items", "errors", "polling"
+    )
+
+    def __init__(self, url: str, title: Optional[str] = None):
+        self.url = url
+        self.title = title or url
+        self.subscribers = 0
+        self.interval = float(DEFAULT_INTERVAL)
+        self.next_poll = 0.0
+        self.last_polled: Optional[float] = None
+        self.etag: Optional[str] = None
+        self.modified: Optional[str] = None
+        self.recent_ids: deque = deque(maxlen=KEEP_ENTRIES)
+        self.polls = 0
+        self.new_items = 0
+        self.errors = 0
+        self.polling = False
+
+
+class FeedPoller:
+    """Heap-scheduled poller shared by all feed subscriptions."""
+
+    def __init__(self, workers: int = POLL_WORKERS):
+        self._feeds: Dict[str, FeedState] = {}
+        self._heap: List = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    # --- Subscriptions ---
+
+    def add_feed(self, url: str, title: Optional[str] = None, immediate: bool = False) -> None:
+        """
+        Add a subscriber to a feed, scheduling it if it is new. With
+        immediate=True a new feed is polled as soon as a worker is free.
+        """
+        with self._cond:
+            state = self._feeds.get(url)
+            if state is None:
+                state = FeedState(url, title)
+                self._feeds[url] = state
+                # Spread first polls out so a bulk import does not poll everything at once
+                delay = 0.0 if immediate else random.uniform(0, min(60.0, state.interval))
+                self._schedule(state, time.time() + delay)
+            state.subscribers += 1
+
+    def remove_feed(self, url: str) -> None:
+        """Remove a subscriber; the feed stops being polled when none are left."""
+        with self._cond:
+            state = self._feeds.get(url)
+            if state is None:
+                return
+            state.subscribers -= 1
+            if state.subscribers <= 0:
+                # Heap entry is discarded lazily when it comes up
+                del self._feeds[url]
+
+    def _schedule(self, state: FeedState, when: float) -> None:
+        """Push a feed onto the heap. Caller holds _cond."""
+        state.next_poll = when
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, state.url))
+        self._cond.notify()
+
+    # --- Scheduler loop ---
+
+    def start(self) -> None:
+        """Start the scheduler thread."""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="feed-poll")
+        self._thread = threading.Thread(target=self._run, name="feed-poller", daemon=True)
+        self._thread.start()
+        print(f"[POLLER] Started with {len(self._feeds)} feeds, {self._workers} workers")
+
+    def stop(self) -> None:
+        """Stop the scheduler thread (in-flight polls are allowed to finish)."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                state = None
+                while self._running and state is None:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    when, _, url = self._heap[0]
+                    delay = when - time.time()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    candidate = self._feeds.get(url)
+                    # Skip stale entries for removed or rescheduled feeds
+                    if candidate is None or candidate.next_poll != when or candidate.polling:
+                        continue
+                    candidate.polling = True
+                    state = candidate
+                if not self._running:
+                    return
+                executor = self._executor
+            executor.submit(self._poll_and_reschedule, state)
+
+    def _poll_and_reschedule(self, state: FeedState) -> None:
+        try:
+            self.poll(state)
+        finally:
+            with self._cond:
+                state.polling = False
+                if self._feeds.get(state.url) is state:
+                    self._schedule(state, time.time() + state.interval)
+
+    # --- Polling ---
+
+    def poll(self, state: FeedState) -> int:
+        """
+        Fetch a feed once, store new entries and adapt its interval.
+        Returns the number of new entries found.
+        """
+        now = time.time()
+        headers = get_headers()
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.modified:
+            headers["If-Modified-Since"] = state.modified
+
+        try:
+            # Feed URLs are user-supplied: refuse non-public hosts and redirects to them
+            response = safe_get(state.url, headers=headers, timeout=15)
+            if response.status_code == 304:
+                new_count = 0
+            else:
+                response.raise_for_status()
+                state.etag = response.headers.get("ETag")
+                state.modified = response.headers.get("Last-Modified")
+                new_count = self._store_entries(state, feedparser.parse(response.content))
+            state.errors = 0
+        except Exception as e:
+            state.errors += 1
+            state.interval = min(MAX_INTERVAL, state.interval * 2)
+            print(f"[POLLER] Error polling {state.url}: {e}")
+            return 0
+
+        first_poll = state.last_polled is None
+        if not first_poll:
+            self._adapt_interval(state, new_count, now - state.last_polled)
+        state.last_polled = now
+        state.polls += 1
+        state.new_items += new_count
+        return new_count
+
+    def _store_entries(self, state: FeedState, feed) -> int:
+        """Store unseen entries in the article store. Returns how many were new."""
+        if feed.feed.get("title") and state.title == state.url:
+            state.title = feed.feed.get("title")
+
+        seen = set(state.recent_ids)
+        new_articles = []
+        for entry in feed.entries[:KEEP_ENTRIES]:
+            article_id = make_article_id(entry.get("link", ""), entry.get("title", "Untitled"))
+            if article_id in seen:
+                continue
+            seen.add(article_id)
+            new_articles.append({
+                "id": article_id,
+                "title": entry.get("title", "Untitled"),
+                "link": entry.get("link", ""),
+                "summary": entry.get("summary", entry.get("description", "")),
+                "published": entry.get("published", ""),
+                "source": state.title,
+                "content": extract_content_from_entry(entry)
+            })
+
+        if new_articles:
+            article_store.put_articles(new_articles)
+            # Feeds list newest first; keep that order at the left of the deque
+            with self._cond:
+                for article in reversed(new_articles):
+                    state.recent_ids.appendleft(article["id"])
+
+        return len(new_articles)
+
+    @staticmethod
+    def _adapt_interval(state: FeedState, new_count: int, elapsed: float) -> None:
+        """Move the interval towards the feed's observed publishing rate."""
+        if new_count > 0:
+            target = elapsed * TARGET_NEW_PER_POLL / new_count
+            interval = 0.5 * state.interval + 0.5 * target
+        else:
+            interval = state.interval * QUIET_BACKOFF
+        state.interval = max(MIN_INTERVAL, min(MAX_INTERVAL, interval))
+
+    # --- Reads ---
+
+    def get_feed_articles(self, url: str, limit: int = 10) -> List[Dict]:
+        """
+        Get the latest stored articles for a feed. Never fetches: a feed the
+        poller does not know yet is registered for an immediate poll and has
+        no articles until the poller thread has fetched it.
+        """
+        with self._cond:
+            state = self._feeds.get(url)
+            if state is None:
+                self.add_feed(url, immediate=True)
+                return []
+            recent_ids = list(state.recent_ids)[:limit]
+
+        articles = []
+        for article_id in recent_ids:
+            article = article_store.get_article(article_id)
+            if article is not None:
+                articles.append(article)
+        return articles
+
+    def get_stats(self) -> Dict:
+        """Get poller statistics."""
+        with self._cond:
+            states = list(self._feeds.values())
+            heap_size = len(self._heap)
+        intervals = sorted(state.interval for state in states)
+        return {
+            "running": self._running,
+            "feeds": len(states),
+            "heap_entries": heap_size,
+            "polling": sum(1 for state in states if state.polling),
+            "polls": sum(state.polls for state in states),
+            "new_items": sum(state.new_items for state in states),
+            "failing_feeds": sum(1 for state in states if state.errors),
+            "median_interval_seconds": intervals[len(intervals) // 2] if intervals else None,
+        }
+
+
+_poller: Optional[FeedPoller] = None
+
+
+def get_poller() -> FeedPoller:
+    """Get or create the shared feed poller."""
+    global _poller
+    if _poller is None:
+        _poller = FeedPoller()
+    return _poller
+
+
+def start_feed_poller() -> None:
+    """Load every user feed subscription and start polling."""
+    import firebase_models as fm
+
+    poller = get_poller()
+    try:
+        for feed in fm.get_all_user_feeds():
+            poller.add_feed(feed["url"], feed.get("title"))
+    except Exception as e:
+        print(f"[POLLER] Could not load user feeds: {e}")
+    poller.start()
+
+
+def stop_feed_poller() -> None:
+    """Stop the shared feed poller."""
+    if _poller is not None:
+        _poller.stop()
+
+
+def fetch_news_by_custom_feeds(feed_urls: List[str], max_per_feed: int = 10) -> List[Dict]:
+    """Get the latest articles from a list of custom feed URLs."""
+    poller = get_poller()
+    articles = []
+    for url in feed_urls:
+        articles.extend(poller.get_feed_articles(url, limit=max_per_feed))
+    print(f"[DEBUG] Total articles from custom feeds: {len(articles)}")
+    return articles
@@ -0,0 +1,174 @@
+"""
+Incremental digest updates.
+
+Each delivered digest is stored with a fingerprint of its article set (see
+firebase_models.save_user_digest_state). For the next delivery:
+- same articles and word target: the stored digest is reused as-is,
+- mostly the same articles: new articles about a story already in the
+  stored digest are added to that story's sources, only the others are
+  summarized, and their stories are merged into the stored digest (stories
+  whose articles are all gone are dropped),
+- otherwise the digest is regenerated in full.
+
+Only structured digests (see digest_format) whose stories record their
+article_ids can be merged.
+"""
+import os
+import copy
+import hashlib
+from typing import Dict, List, Optional
+
+from services.digest_format import article_key, iter_stories
+
+INCREMENTAL_ENABLED = os.getenv("DIGEST_INCREMENTAL", "true").lower() == "true"
+
+# Share of the current articles that must have been in the previous digest
+MIN_OVERLAP = float(os.getenv("DIGEST_INCREMENTAL_MIN_OVERLAP", "0.6"))
+
+# Smallest word target for the summary of new articles
+MIN_UPDATE_WORDS = 80
+
+
+def fingerprint(keys: List[str]) -> str:
+    """Order-independent fingerprint of an article set."""
+    return hashlib.sha256("\n".join(sorted(set(keys))).encode("utf-8")).hexdigest()
+
+
+def plan_digest(previous: Optional[Dict], articles: List[Dict], target_word_count: int) -> Dict:
+    """
+    Decide how to build the next digest from the previous delivery's state.
+
+    Returns {"mode": "reuse" | "incremental" | "full", "fingerprint", "keys"},
+    plus "previous" (the stored digest) for reuse/incremental, "mergeable"
+    for reuse, and "new_articles", "removed_keys" and "update_word_count"
+    for incremental (see fold_new_articles).
+    """
+    keys = [article_key(article) for article in articles]
+    plan = {"mode": "full", "fingerprint": fingerprint(keys), "keys": sorted(set(keys))}
+
+    if not INCREMENTAL_ENABLED or not previous or not previous.get("digest"):
+        return plan
+
+    same_target = previous.get("target_word_count") == target_word_count
+    if previous.get("fingerprint") == plan["fingerprint"] and same_target:
+        return {**plan, "mode": "reuse", "previous": previous["digest"], "mergeable": previous.get("mergeable", False)}
+
+    previous_keys = set(previous.get("keys") or [])
+    current_keys = set(keys)
+    overlap = len(previous_keys & current_keys) / max(len(current_keys), 1)
+    if not previous.get("mergeable") or not same_target or overlap < MIN_OVERLAP:
+        return plan
+
+    new_articles = [a for a in articles if article_key(a) not in previous_keys]
+    update_word_count = max(MIN_UPDATE_WORDS, round(target_word_count * len(new_articles) / max(len(articles), 1)))
+    return {
+        **plan,
+        "mode": "incremental",
+        "previous": previous["digest"],
+        "new_articles": new_articles,
+        "removed_keys": sorted(previous_keys - current_keys),
+        "update_word_count": update_word_count,
+    }
+
+
+def fold_new_articles(plan: Dict, stories: List[Dict], target_word_count: int) -> List[Dict]:
+    """
+    Add the new articles of an incremental plan that were clustered (see
+    topic_clustering.cluster_articles) with articles of the previous digest
+    to that digest's stories: their keys join the story's article_ids and
+    their sources its source. `stories` are the representatives of every
+    current article.
+
+    Updates plan's "previous", "new_articles" and "update_word_count" and
+    returns the stories left to summarize, whose articles are all new.
+    """
+    new_by_key = {article_key(a): a for a in plan["new_articles"]}
+    previous = copy.deepcopy(plan["previous"])
+    story_by_key = {key: story for _, story in iter_stories(previous) for key in story.get("article_ids") or []}
+
+    fresh, folded = [], 0
+    for story in stories:
+        keys = story.get("cluster_keys") or [article_key(story)]
+        new_keys = [key for key in keys if key in new_by_key]
+        if not new_keys:
+            continue
+        known = next((story_by_key[key] for key in keys if key in story_by_key), None)
+        if known is None:
+            fresh.append(story)
+            continue
+        sources = [s.strip() for s in known.get("source", "").split(",") if s.strip()]
+        for key in new_keys:
+            known["article_ids"].append(key)
+            source = new_by_key[key].get("source")
+            if source and source not in sources:
+                sources.append(source)
+        known["source"] = ", ".join(sources)
+        folded += len(new_keys)
+
+    fresh_keys = {key for story in fresh for key in (story.get("cluster_keys") or [article_key(story)])}
+    plan["previous"] = previous
+    plan["new_articles"] = [a for a in plan["new_articles"] if article_key(a) in fresh_keys]
+    plan["update_word_count"] = max(
+        MIN_UPDATE_WORDS, round(target_word_count * len(plan["new_articles"]) / max(len(plan["keys"]), 1))
+    )
+    if folded:
+        print(f"[DIGEST] Added {folded} new articles to stories already in the digest")
+    return fresh
+
+
+def _story_words(story: Dict) -> int:
+    return len(story.get("headline", "").split()) + len(story.get("summary", "").split())
+
+
+def merge_digest(previous: Dict, update: Optional[Dict], removed_keys: List[str], target_word_count: int) -> Dict:
+    """
+    Merge the stories of new articles (update) into the previous digest.
+
+    Stories whose articles were all removed are dropped, and so are
+    stories that cite no articles, since nothing shows whether they are
+    still current. New stories go first, into the section with the same
+    heading when there is one. If the result runs over the word target, the
+    oldest stories are dropped from the end.
+    """
+    removed = set(removed_keys)
+    merged = copy.deepcopy(previous)
+
+    for section in merged["sections"]:
+        section["stories"] = [
+            story for story in section["stories"]
+            if story.get("article_ids") and not set(story["article_ids"]) <= removed
+        ]
+
+    new_ids = set()
+    if update:
+        by_heading = {section["heading"].lower(): section for section in merged["sections"]}
+        fresh_sections = []
+        for section in copy.deepcopy(update.get("sections", [])):
+            new_ids.update(id(story) for story in section["stories"])
+            existing = by_heading.get(section["heading"].lower())
+            if existing is not None:
+                existing["stories"] = section["stories"] + existing["stories"]
+            else:
+                fresh_sections.append(section)
+        merged["sections"] = fresh_sections + merged["sections"]
+        merged["title"] = update.get("title") or merged.get("title", "")
+
+    # Keep within about the word target, dropping the oldest stories first
+    words = sum(_story_words(story) for section in merged["sections"] for story in section["stories"])
+    for section in reversed(merged["sections"]):
+        while words > target_word_count * 1.1 and section["stories"] and id(section["stories"][-1]) not in new_ids:
+            words -= _story_words(section["stories"].pop())
+
+    merged["sections"] = [section for section in merged["sections"] if section["stories"]]
+    return merged
+
+
+def digest_state(plan: Dict, digest: Dict, target_word_count: int, mergeable: bool) -> Dict:
+    """State to store after delivering a digest built from plan."""
+    return {
+        "fingerprint": plan["fingerprint"],
+        "keys": plan["keys"],
+        "digest": digest,
+        "target_word_count": target_word_count,
+        "mergeable": mergeable,
+    }
@@ -0,0 +1,284 @@
+"""
+Content-addressed cache for LLM responses.
+
+Keys are a SHA-256 of everything that determines a completion (model,
+system prompt, user prompt, max_tokens, temperature), so byte-identical
+requests - two users with the same categories in the same hour, a Streamlit
+rerun - are served without calling the API.
+
+Two tiers:
+- an in-memory LRU bounded by LLM_CACHE_MAX_BYTES,
+- a persistent SQLite file bounded by LLM_CACHE_DISK_MAX_BYTES, shared by
+  workers on the same host and surviving restarts.
+Entries expire after LLM_CACHE_TTL_SECONDS.
+
+put is called on the gateway event loop, so it only updates memory; disk
+writes and eviction run on a writer thread with its own connection, in
+batches of one transaction each. Disk reads use a connection per thread and
+do not hold the memory tier's lock.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+DISK_MAX_BYTES = int(os.getenv("LLM_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+DB_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "llm_cache.sqlite3")
+)
+
+# Run disk eviction every N writes
+_DISK_EVICT_EVERY = 50
+
+# Most rows written to disk in one transaction
+_WRITE_BATCH = 100
+
+_memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_memory_bytes = 0
+_lock = threading.Lock()
+# Per-thread read connection (.db)
+_local = threading.local()
+_writes_since_evict = 0
+
+# (key, value, created_at, expires_at) rows waiting for the writer thread; None stops it
+_write_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "evictions": 0, "expired": 0}
+
+
+def make_key(model: str, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float) -> str:
+    """Build the content-addressed key for a chat completion request."""
+    payload = json.dumps(
+        [model, system_prompt, user_prompt, int(max_tokens), float(temperature)],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    """Open the persistent cache database, creating the table if needed."""
+    try:
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        db = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, expires_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created_at)")
+        db.commit()
+        return db
+    except Exception as e:
+        print(f"[LLM CACHE] Persistent cache unavailable ({DB_PATH}): {e}")
+        return None
+
+
+def _get_db() -> Optional[sqlite3.Connection]:
+    """Get or open this thread's connection for reads."""
+    db = getattr(_local, "db", None)
+    if db is None:
+        db = _local.db = _connect()
+    return db
+
+
+def _entry_size(key: str, value: str) -> int:
+    return len(key) + len(value.encode("utf-8")) + 100
+
+
+def _memory_put(key: str, expires_at: float, value: str) -> None:
+    """Insert into the memory tier and evict LRU entries over budget. Caller holds _lock."""
+    global _memory_bytes
+    previous = _memory.pop(key, None)
+    if previous is not None:
+        _memory_bytes -= _entry_size(key, previous[1])
+
+    _memory[key] = (expires_at, value)
+    _memory_bytes += _entry_size(key, value)
+
+    while _memory_bytes > MAX_BYTES and _memory:
+        old_key, (_, old_value) = _memory.popitem(last=False)
+        _memory_bytes -= _entry_size(old_key, old_value)
+        _stats["evictions"] += 1
+
+
+def get(key: str) -> Optional[str]:
+    """Get a cached response, or None on a miss."""
+    global _memory_bytes
+    if not ENABLED:
+        return None
+
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                _memory.move_to_end(key)
+                _stats["memory_hits"] += 1
+                return value
+            del _memory[key]
+            _memory_bytes -= _entry_size(key, value)
+            _stats["expired"] += 1
+
+    # Disk read outside the lock; only a hit is promoted into memory
+    row = None
+    db = _get_db()
+    if db is not None:
+        try:
+            row = db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[LLM CACHE] Read error: {e}")
+
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None and entry[0] > now:
+            # Put while reading: the memory entry is newer
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return entry[1]
+        if row is not None:
+            value, expires_at = row
+            if expires_at > now:
+                _memory_put(key, expires_at, value)
+                _stats["disk_hits"] += 1
+                return value
+            _stats["expired"] += 1
+        _stats["misses"] += 1
+        return None
+
+
+def put(key: str, value: str, ttl_seconds: int = None) -> None:
+    """Store a response in memory and queue it for the disk tier. Never blocks on disk."""
+    if not ENABLED or value is None:
+        return
+
+    now = time.time()
+    expires_at = now + (ttl_seconds or TTL_SECONDS)
+    with _lock:
+        _memory_put(key, expires_at, value)
+        _stats["puts"] += 1
+    _start_writer()
+    _write_queue.put((key, value, now, expires_at))
+
+
+# ============================================================================
+# DISK WRITER
+# ============================================================================
+
+def _start_writer() -> None:
+    global _writer
+    if _writer is not None:
+        return
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="llm-cache-writer", daemon=True)
+            _writer.start()
+
+
+def _write_loop() -> None:
+    global _writes_since_evict
+    db = _connect()
+    stopping = False
+    while not stopping:
+        rows = [_write_queue.get()]
+        while len(rows) < _WRITE_BATCH:
+            try:
+                rows.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+        if None in rows:
+            stopping = True
+            rows = [row for row in rows if row is not None]
+
+        try:
+            if db is not None and rows:
+                db.executemany(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at, size) VALUES (?, ?, ?, ?, ?)",
+                    [(key, value, now, expires_at, _entry_size(key, value)) for key, value, now, expires_at in rows]
+                )
+                db.commit()
+                _writes_since_evict += len(rows)
+                if _writes_since_evict >= _DISK_EVICT_EVERY:
+                    _writes_since_evict = 0
+                    _evict_disk(db, time.time())
+        except sqlite3.Error as e:
+            print(f"[LLM CACHE] Write error: {e}")
+        finally:
+            for _ in range(len(rows) + (1 if stopping else 0)):
+                _write_queue.task_done()
+
+
+def _evict_disk(db: sqlite3.Connection, now: float) -> None:
+    """Drop expired rows, then the oldest rows until under the disk budget. Writer thread only."""
+    db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+    count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+    if total > DISK_MAX_BYTES:
+        # Enough of the oldest rows, at the average row size, to get under budget
+        rows = -(-(total - DISK_MAX_BYTES) * count // total)
+        cursor = db.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY created_at LIMIT ?)",
+            (rows,)
+        )
+        with _lock:
+            _stats["evictions"] += cursor.rowcount
+    db.commit()
+
+
+def flush(timeout: float = None) -> bool:
+    """Wait until queued disk writes are done. Returns False on timeout."""
+    if _writer is None:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _write_queue.all_tasks_done:
+        while _write_queue.unfinished_tasks:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _write_queue.all_tasks_done.wait(remaining)
+    return True
+
+
+def _stop_writer() -> None:
+    """Write what is queued before the process exits."""
+    if _writer is not None:
+        _write_queue.put(None)
+        _writer.join(timeout=5)
+
+
+atexit.register(_stop_writer)
+
+
+def get_cache_stats() -> Dict:
+    """Get hit/miss counters and tier sizes."""
+    with _lock:
+        hits = _stats["memory_hits"] + _stats["disk_hits"]
+        lookups = hits + _stats["misses"]
+        stats = dict(_stats)
+        stats.update({
+            "enabled": ENABLED,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "memory_entries": len(_memory),
+            "memory_bytes": _memory_bytes,
+            "memory_max_bytes": MAX_BYTES,
+        })
+    db = _get_db()
+    if db is not None:
+        try:
+            count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            stats.update({"disk_entries": count, "disk_bytes": size, "disk_max_bytes": DISK_MAX_BYTES})
+        except sqlite3.Error:
+            pass
+    return stats
@@ -0,0 +1,186 @@
+"""
+Hedged LLM requests for interactive calls.
+
+If a completion has not returned by a latency percentile of recent calls
+from the same endpoint to the same model (tracked online), an identical
+second request is sent; the first to finish wins and the other is
+cancelled. Latency is measured by the rate-limit scheduler from admission
+to response, so queueing and retry backoff do not inflate it, and no hedge
+is sent while the model's scheduler is queueing calls. Each endpoint has a
+hedge budget (a share of its requests that may be hedged), so the extra
+cost stays bounded. Background work is never hedged.
+
+Runs on the gateway loop (see openai_gateway).
+"""
+import os
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from services import openai_scheduler
+
+HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "true").lower() == "true"
+
+# Hedge once a call is slower than this percentile of recent calls
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+
+# Latency samples kept per endpoint and model, and needed before hedging starts
+LATENCY_WINDOW = int(os.getenv("LLM_HEDGE_LATENCY_WINDOW", "200"))
+MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Never hedge sooner than this
+MIN_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+
+# Share of each endpoint's requests that may be hedged
+DEFAULT_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.05"))
+HEDGE_BUDGETS: Dict[str, float] = {
+    "summarize_combined": 0.10,
+    "simplify": 0.05,
+    "digest": 0.05,
+    "article_brief": 0.02,
+}
+
+# Unused budget that can be saved up for a burst of slow calls
+_MAX_CREDIT = 5.0
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies for one endpoint and model."""
+
+    def __init__(self, window: int = None):
+        self.samples: Deque[float] = deque(maxlen=window or LATENCY_WINDOW)
+
+    def add(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-quantile (0..1) of recent latencies, or None without enough samples."""
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """Every request earns `ratio` of a hedge; a hedge spends one."""
+
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+        self.credit = 1.0 if ratio > 0 else 0.0
+
+    def earn(self) -> None:
+        self.credit = min(_MAX_CREDIT, self.credit + self.ratio)
+
+    def spend(self) -> bool:
+        if self.credit < 1.0:
+            return False
+        self.credit -= 1.0
+        return True
+
+
+_trackers: Dict[Tuple[Optional[str], str], LatencyTracker] = {}
+_budgets: Dict[str, HedgeBudget] = {}
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _get_tracker(endpoint: Optional[str], model: str) -> LatencyTracker:
+    tracker = _trackers.get((endpoint, model))
+    if tracker is None:
+        tracker = _trackers[(endpoint, model)] = LatencyTracker()
+    return tracker
+
+
+def _get_budget(endpoint: str) -> HedgeBudget:
+    budget = _budgets.get(endpoint)
+    if budget is None:
+        budget = _budgets[endpoint] = HedgeBudget(HEDGE_BUDGETS.get(endpoint, DEFAULT_HEDGE_BUDGET))
+    return budget
+
+
+def hedge_delay(endpoint: Optional[str], model: str) -> Optional[float]:
+    """Seconds to wait before hedging an endpoint's call to model, or None if there is no estimate yet."""
+    latency = _get_tracker(endpoint, model).percentile(HEDGE_PERCENTILE)
+    if latency is None:
+        return None
+    return max(MIN_HEDGE_DELAY_SECONDS, latency)
+
+
+async def _timed(call: Callable[[], Awaitable[Any]], endpoint: Optional[str], model: str) -> Any:
+    with openai_scheduler.observe_latency(_get_tracker(endpoint, model).add):
+        return await call()
+
+
+async def hedged(endpoint: Optional[str], model: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Await call(), sending a second identical call if the first is slow (see
+    module docstring). `endpoint` selects the hedge budget; None disables
+    hedging for this call. Raises the error of the last call to fail.
+    """
+    enabled = (HEDGING_ENABLED and endpoint is not None
+               and openai_scheduler.current_priority() == openai_scheduler.INTERACTIVE)
+    if not enabled:
+        return await _timed(call, endpoint, model)
+
+    stats = _stats.setdefault(
+        endpoint, {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "saturated": 0}
+    )
+    stats["calls"] += 1
+    budget = _get_budget(endpoint)
+    budget.earn()
+
+    delay = hedge_delay(endpoint, model)
+    primary = asyncio.ensure_future(_timed(call, endpoint, model))
+    if delay is None:
+        return await primary
+
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+
+        # A slow call while calls are queued is the rate limit, not a straggler
+        if not openai_scheduler.get_scheduler(model).has_capacity():
+            stats["saturated"] += 1
+            return await primary
+
+        if not budget.spend():
+            stats["budget_denied"] += 1
+            return await primary
+
+        stats["hedged"] += 1
+        print(f"[HEDGE] {endpoint}: {model} call slower than {delay:.1f}s, sending a second request")
+        hedge = asyncio.ensure_future(_timed(call, endpoint, model))
+        pending = {primary, hedge}
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # Cancel the loser (or both, if the caller was cancelled)
+        for task in pending:
+            task.cancel()
+
+
+def get_hedging_stats() -> Dict:
+    """Get per-endpoint hedge counters and hedge delays per endpoint and model."""
+    return {
+        "enabled": HEDGING_ENABLED,
+        "endpoints": {
+            endpoint: {**counters, "budget": HEDGE_BUDGETS.get(endpoint, DEFAULT_HEDGE_BUDGET)}
+            for endpoint, counters in list(_stats.items())
+        },
+        "hedge_delay_seconds": {
+            f"{endpoint}/{model}": round(delay, 3) if delay is not None else None
+            for endpoint, model, delay in (
+                (endpoint, model, hedge_delay(endpoint, model)) for endpoint, model in list(_trackers)
+            )
+        },
+    }
@@ -0,0 +1,222 @@
+"""
+Local extractive summarizer.
+
+Scores sentences with TF-IDF and TextRank (vectorized with NumPy) and keeps
+the best ones, in their original order, up to a target word count. Runs in
+milliseconds with no network, so it serves as:
+- the "fast" tier for latency-sensitive requests,
+- the automatic fallback when OpenAI is not configured, down, or over budget.
+"""
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# "textrank" (graph centrality) or "tfidf" (similarity to the document centroid)
+DEFAULT_METHOD = os.getenv("LOCAL_SUMMARY_METHOD", "textrank").lower()
+
+# News puts key facts first: earlier sentences get a small score boost
+POSITION_WEIGHT = float(os.getenv("LOCAL_SUMMARY_POSITION_WEIGHT", "0.5"))
+
+# Smallest share of a digest given to one article
+MIN_ARTICLE_WORDS = 25
+
+_DAMPING = 0.85
+_MAX_ITERATIONS = 50
+_TOLERANCE = 1e-6
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])["\')\]]?\s+(?=["\'(\[]?[A-Z0-9])')
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+_ARTICLE_HEADING_RE = re.compile(r"^ARTICLE \d+:\s*(.*)$")
+_BOLD_TITLE_RE = re.compile(r"^\*\*(.+?)\*\*(?:\s*\([^)]*\))?:?\s*(.*)$", re.DOTALL)
+
+_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself yourselves
+said says say new one two also like get got may might must us
+""".split())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences (whitespace normalized)."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if not text:
+        return []
+    return [s.strip() for s in _SENTENCE_SPLIT_RE.split(text) if s.strip()]
+
+
+def _terms(sentence: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(sentence.lower()) if w not in _STOPWORDS and len(w) > 1]
+
+
+def tfidf_matrix(sentences: Sequence[str]) -> np.ndarray:
+    """Rows: L2-normalized TF-IDF vectors, one per sentence (or document)."""
+    vocabulary = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for term in _terms(sentence):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+
+    matrix = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float64)
+    if rows:
+        np.add.at(matrix, (np.array(rows), np.array(cols)), 1.0)
+
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + document_frequency)) + 1.0
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _textrank(matrix: np.ndarray) -> np.ndarray:
+    """PageRank over the sentence cosine-similarity graph."""
+    n = matrix.shape[0]
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transition = np.divide(similarity, out_weight, out=np.full_like(similarity, 1.0 / n), where=out_weight > 0)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(_MAX_ITERATIONS):
+        updated = (1.0 - _DAMPING) / n + _DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < _TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def score_sentences(sentences: Sequence[str], method: str = None, positions: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Score sentences by importance. `positions` is each sentence's index
+    within its own document (defaults to its index in the list).
+    """
+    if not sentences:
+        return np.zeros(0)
+    method = method or DEFAULT_METHOD
+
+    matrix = tfidf_matrix(sentences)
+    if method == "tfidf" or len(sentences) < 3:
+        centroid = matrix.mean(axis=0)
+        scores = matrix @ centroid
+    else:
+        scores = _textrank(matrix)
+
+    if positions is None:
+        positions = np.arange(len(sentences))
+    scores = scores * (1.0 + POSITION_WEIGHT / (1.0 + positions))
+
+    # Very short fragments (datelines, captions) rarely carry the story
+    lengths = np.array([len(s.split()) for s in sentences])
+    return np.where(lengths < 4, scores * 0.3, scores)
+
+
+def _select(sentences: Sequence[str], scores: np.ndarray, target_words: int) -> List[int]:
+    """Indices of the best sentences fitting target_words (at least one), in original order."""
+    chosen, words = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        length = len(sentences[i].split())
+        if chosen and words + length > target_words:
+            continue
+        chosen.append(int(i))
+        words += length
+        if words >= target_words:
+            break
+    return sorted(chosen)
+
+
+def summarize_text(text: str, target_words: int = 80, method: str = None) -> str:
+    """Extract the most important sentences of a text, up to about target_words."""
+    sentences = split_sentences(text)
+    if not sentences:
+        return ""
+    if sum(len(s.split()) for s in sentences) <= target_words:
+        return " ".join(sentences)
+
+    scores = score_sentences(sentences, method)
+    return " ".join(sentences[i] for i in _select(sentences, scores, target_words))
+
+
+def summarize_articles(articles: Sequence[Tuple[str, str]], target_words: int = 300, method: str = None) -> str:
+    """
+    Build an extractive digest from (title, text) pairs.
+
+    Sentences of all articles are scored together (so stories covered by
+    several sources rank higher); the best articles each get a share of the
+    word budget filled with their best sentences.
+    """
+    sentences, owners, positions = [], [], []
+    for index, (_, text) in enumerate(articles):
+        for position, sentence in enumerate(split_sentences(text)):
+            sentences.append(sentence)
+            owners.append(index)
+            positions.append(position)
+
+    if not sentences:
+        return "\n\n".join(f"**{title}**" for title, _ in articles if title)
+
+    scores = score_sentences(sentences, method, np.array(positions))
+    owners = np.array(owners)
+
+    # Rank articles by their best sentence
+    article_scores = np.full(len(articles), -1.0)
+    np.maximum.at(article_scores, owners, scores)
+    ranked = [int(i) for i in np.argsort(-article_scores, kind="stable") if article_scores[i] >= 0]
+
+    per_article = max(MIN_ARTICLE_WORDS, target_words // max(len(ranked), 1))
+    paragraphs, words = [], 0
+    for index in ranked:
+        if words >= target_words:
+            break
+        members = np.flatnonzero(owners == index)
+        budget = min(per_article, max(target_words - words, MIN_ARTICLE_WORDS))
+        member_sentences = [sentences[i] for i in members]
+        chosen = _select(member_sentences, scores[members], budget)
+        extract = " ".join(member_sentences[i] for i in chosen)
+        words += len(extract.split())
+
+        title = articles[index][0]
+        paragraphs.append(f"**{title}**: {extract}" if title else extract)
+
+    return "\n\n".join(paragraphs)
+
+
+def parse_excerpts(combined_text: str) -> List[Tuple[str, str]]:
+    """
+    Split a combined excerpt block back into (title, text) pairs. Understands
+    the "ARTICLE n: title / Source: ..." layout of build_combined_excerpts and
+    the "**title**: text" layout sent by the frontend.
+    """
+    articles = []
+    for block in re.split(r"\n\s*\n", combined_text or ""):
+        block = block.strip()
+        if not block or block == "---":
+            continue
+
+        lines = block.split("\n")
+        heading = _ARTICLE_HEADING_RE.match(lines[0])
+        if heading:
+            body = [line for line in lines[1:] if not line.startswith(("Source:", "Also reported by:"))]
+            articles.append((heading.group(1).strip(), " ".join(body)))
+            continue
+
+        bold = _BOLD_TITLE_RE.match(block)
+        if bold:
+            articles.append((bold.group(1).strip(), bold.group(2).strip()))
+        elif articles:
+            # Another paragraph of the previous article
+            title, text = articles[-1]
+            articles[-1] = (title, f"{text} {block}")
+        else:
+            articles.append(("", block))
+    return articles
+
+
+def summarize_excerpts(combined_text: str, target_words: int = 300, method: str = None) -> str:
+    """Extractive digest of a combined excerpt block (see parse_excerpts)."""
+    return summarize_articles(parse_excerpts(combined_text), target_words, method)
@@ -0,0 +1,37 @@
+"""
+In-process service metrics.
+
+Named counters plus a short log of recent events (e.g. degraded summaries),
+exposed through /admin/system-stats. Safe to call from any thread.
+"""
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict
+
+# Recent events kept for inspection
+EVENT_HISTORY = 100
+
+_counters: Dict[str, int] = {}
+_events: Deque[Dict[str, Any]] = deque(maxlen=EVENT_HISTORY)
+_lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Add to a named counter."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def record_event(name: str, **fields: Any) -> None:
+    """Count an event and keep it, with its fields, in the recent event log."""
+    event = {"event": name, "at": datetime.now(timezone.utc).isoformat(), **fields}
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + 1
+        _events.append(event)
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Get all counters and the recent event log (newest last)."""
+    with _lock:
+        return {"counters": dict(_counters), "recent_events": list(_events)}
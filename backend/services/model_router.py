@@ -0,0 +1,159 @@
+"""
+Model routing for the summarization functions.
+
+Each endpoint has an ordered list of allowed models (ROUTES). Per request,
+the router drops models whose context or output limit cannot hold it, then
+orders the rest:
+- interactive requests with small inputs: lowest predicted latency first,
+- scheduled/background work and large inputs: best throughput first.
+Models that failed recently go last, so the list doubles as the fallback
+order. Predictions start from the static profiles in MODELS and are
+corrected online from observed latencies.
+
+All routing configuration lives in this module (context and output limits
+come from prompt_budget.MODEL_LIMITS). LLM_ROUTE_<ENDPOINT> overrides a
+route, e.g. LLM_ROUTE_SIMPLIFY="gpt-4o-mini,gpt-3.5-turbo".
+"""
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+
+from services import openai_scheduler
+from services.prompt_budget import MODEL_LIMITS
+
+# Static speed profiles: fixed overhead per call and output tokens per second
+MODELS: Dict[str, Dict[str, float]] = {
+    "gpt-4o-mini": {"overhead_seconds": 0.4, "tokens_per_second": 85.0},
+    "gpt-3.5-turbo": {"overhead_seconds": 0.5, "tokens_per_second": 70.0},
+    "gpt-4o": {"overhead_seconds": 0.7, "tokens_per_second": 50.0},
+}
+
+# Endpoint -> allowed models, in order of preference when predictions tie
+ROUTES: Dict[str, List[str]] = {
+    "simplify": ["gpt-3.5-turbo", "gpt-4o-mini"],
+    "article_brief": ["gpt-4o-mini", "gpt-3.5-turbo"],
+    "digest": ["gpt-3.5-turbo", "gpt-4o-mini"],
+    "summarize_combined": ["gpt-4o-mini", "gpt-3.5-turbo"],
+}
+for _endpoint in ROUTES:
+    _override = os.getenv(f"LLM_ROUTE_{_endpoint.upper()}")
+    if _override:
+        ROUTES[_endpoint] = [m.strip() for m in _override.split(",") if m.strip()]
+
+# Models that accept response_format json_schema; others get json_object
+JSON_SCHEMA_MODELS = {"gpt-4o-mini", "gpt-4o"}
+
+# Inputs above this many tokens are routed for throughput, even when interactive
+LARGE_INPUT_TOKENS = int(os.getenv("LLM_ROUTE_LARGE_INPUT_TOKENS", "6000"))
+
+# A model that errored is tried last for this long
+ERROR_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTE_ERROR_COOLDOWN_SECONDS", "60"))
+
+_DEFAULT_PROFILE = {"overhead_seconds": 0.5, "tokens_per_second": 60.0}
+_DEFAULT_LIMITS = (16385, 4096)
+
+# Per model: observed/predicted latency (EWMA), last error time, counters
+_health: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def response_format_for(model: str, response_format: Optional[Dict]) -> Optional[Dict]:
+    """The response_format to send to model (json_schema downgraded where unsupported)."""
+    if response_format and response_format.get("type") == "json_schema" and model not in JSON_SCHEMA_MODELS:
+        return {"type": "json_object"}
+    return response_format
+
+
+def primary_model(endpoint: str) -> str:
+    """The endpoint's preferred model (used to size prompts and key the response cache)."""
+    return ROUTES[endpoint][0]
+
+
+def _cooling_down(health: Dict, now: float) -> bool:
+    return health["last_error"] is not None and now - health["last_error"] < ERROR_COOLDOWN_SECONDS
+
+
+def _get_health(model: str) -> Dict:
+    health = _health.get(model)
+    if health is None:
+        health = _health[model] = {"slowdown": 1.0, "last_error": None, "calls": 0, "errors": 0}
+    return health
+
+
+def predicted_latency(model: str, output_tokens: int) -> float:
+    """Expected seconds for a response of output_tokens from model."""
+    profile = MODELS.get(model, _DEFAULT_PROFILE)
+    with _lock:
+        slowdown = _get_health(model)["slowdown"]
+    return (profile["overhead_seconds"] + output_tokens / profile["tokens_per_second"]) * slowdown
+
+
+def throughput(model: str) -> float:
+    """Expected output tokens per second from model."""
+    with _lock:
+        slowdown = _get_health(model)["slowdown"]
+    return MODELS.get(model, _DEFAULT_PROFILE)["tokens_per_second"] / slowdown
+
+
+def _fits(model: str, input_tokens: int, output_tokens: int) -> bool:
+    context_window, max_output = MODEL_LIMITS.get(model, _DEFAULT_LIMITS)
+    return output_tokens <= max_output and input_tokens + output_tokens <= context_window
+
+
+def route(endpoint: str, input_tokens: int, output_tokens: int, priority: int = None) -> List[str]:
+    """
+    Models to try for a request, best first; later entries are fallbacks.
+    Priority defaults to the caller's (see openai_scheduler.call_priority).
+    """
+    models = ROUTES[endpoint]
+    priority = openai_scheduler.current_priority() if priority is None else priority
+
+    candidates = [m for m in models if _fits(m, input_tokens, output_tokens)]
+    if not candidates:
+        # Nothing fits: largest context first and let the API decide
+        candidates = sorted(models, key=lambda m: -MODEL_LIMITS.get(m, _DEFAULT_LIMITS)[0])
+
+    if priority == openai_scheduler.INTERACTIVE and input_tokens <= LARGE_INPUT_TOKENS:
+        ranked = sorted(candidates, key=lambda m: predicted_latency(m, output_tokens))
+    else:
+        ranked = sorted(candidates, key=lambda m: -throughput(m))
+
+    now = time.monotonic()
+    with _lock:
+        cooling = {m for m in ranked if _cooling_down(_get_health(m), now)}
+    return [m for m in ranked if m not in cooling] + [m for m in ranked if m in cooling]
+
+
+def observe(model: str, latency: float, output_tokens: int) -> None:
+    """Record a successful call, correcting the model's latency prediction."""
+    profile = MODELS.get(model, _DEFAULT_PROFILE)
+    expected = profile["overhead_seconds"] + output_tokens / profile["tokens_per_second"]
+    with _lock:
+        health = _get_health(model)
+        health["calls"] += 1
+        health["slowdown"] = 0.8 * health["slowdown"] + 0.2 * (latency / expected)
+
+
+def observe_error(model: str) -> None:
+    """Record a failed call (after retries); the model is tried last for a while."""
+    with _lock:
+        health = _get_health(model)
+        health["errors"] += 1
+        health["last_error"] = time.monotonic()
+
+
+def get_routing_stats() -> Dict:
+    """Get routes and per-model health."""
+    now = time.monotonic()
+    with _lock:
+        models = {
+            model: {
+                "calls": health["calls"],
+                "errors": health["errors"],
+                "slowdown": round(health["slowdown"], 3),
+                "cooling_down": _cooling_down(health, now),
+            }
+            for model, health in _health.items()
+        }
+    return {"routes": ROUTES, "models": models}
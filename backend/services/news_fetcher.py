@@ -1,6 +1,10 @@
+import os
+import json
+import hashlib
 import feedparser
 import requests
 from bs4 import BeautifulSoup
+from datetime import datetime, timezone
 from typing import List, Dict, Optional, Tuple
 from urllib.parse import urlparse, urljoin
 
@@ -155,6 +159,20 @@ COMMON_RSS_PATHS = [
 # Cache for discovered RSS feeds to avoid repeated lookups
 _rss_cache: Dict[str, Optional[str]] = {}
 
+# Precomputed domain -> feed URL index (built by build_feed_index.py)
+FEED_INDEX_PATH = os.getenv(
+    "FEED_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "feed_index.json")
+)
+FEED_INDEX_VERSION = 1
+
+# Publisher domains seen in resolved article links (input for the next index build)
+SEEN_DOMAINS_PATH = os.getenv(
+    "SEEN_DOMAINS_PATH",
+    os.path.join(os.path.dirname(FEED_INDEX_PATH), "seen_domains.txt")
+)
+_seen_domains: set = set()
+
 
 def get_headers() -> Dict[str, str]:
     """Return common headers for HTTP requests."""
@@ -187,20 +205,102 @@ def resolve_redirect(url: str) -> Optional[str]:
             return None
 
 
+def load_feed_index(path: str = None) -> int:
+    """
+    Seed the RSS discovery cache from the precomputed feed index.
+    Returns the number of domains loaded (0 if no index exists).
+    """
+    path = path or FEED_INDEX_PATH
+    if not os.path.exists(path):
+        return 0
+    
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except Exception as e:
+        print(f"[DEBUG] Could not load feed index {path}: {e}")
+        return 0
+    
+    if index.get("version") != FEED_INDEX_VERSION:
+        print(f"[DEBUG] Ignoring feed index with unsupported version: {index.get('version')}")
+        return 0
+    
+    feeds = index.get("feeds", {})
+    for base_url, feed_url in feeds.items():
+        # Live discoveries made by this process take precedence
+        _rss_cache.setdefault(base_url, feed_url)
+    
+    print(f"[DEBUG] Loaded {len(feeds)} domains from feed index")
+    return len(feeds)
+
+
+def save_feed_index(feeds: Dict[str, Optional[str]] = None, path: str = None) -> str:
+    """
+    Write a domain -> feed URL index to disk (atomically).
+    Defaults to the current contents of the discovery cache.
+    """
+    path = path or FEED_INDEX_PATH
+    feeds = dict(_rss_cache if feeds is None else feeds)
+    
+    index = {
+        "version": FEED_INDEX_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "feeds": dict(sorted(feeds.items())),
+    }
+    
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    
+    return path
+
+
+def record_seen_domain(base_url: str) -> None:
+    """Append a newly seen publisher base URL to the seen-domains file."""
+    if base_url in _seen_domains:
+        return
+    _seen_domains.add(base_url)
+    
+    try:
+        os.makedirs(os.path.dirname(SEEN_DOMAINS_PATH) or ".", exist_ok=True)
+        with open(SEEN_DOMAINS_PATH, "a", encoding="utf-8") as f:
+            f.write(base_url + "\n")
+    except Exception as e:
+        print(f"[DEBUG] Could not record seen domain {base_url}: {e}")
+
+
+# Seed the discovery cache once at startup so known publishers skip live probing
+load_feed_index()
+
+
 def discover_rss_feed(base_url: str) -> Optional[str]:
     """
     Discover the RSS feed URL for a given website.
     
     Strategy:
-    1. Check cached results
-    2. Try common RSS paths
-    3. Parse HTML for RSS link tags
+    1. Check cached results (seeded from the feed index at startup)
+    2. Probe the site live (see probe_rss_feed)
     """
     # Check cache first
     if base_url in _rss_cache:
         print(f"[DEBUG] RSS cache hit for {base_url}")
         return _rss_cache[base_url]
     
+    feed_url = probe_rss_feed(base_url)
+    _rss_cache[base_url] = feed_url
+    return feed_url
+
+
+def probe_rss_feed(base_url: str) -> Optional[str]:
+    """
+    Probe a website for its RSS feed URL, bypassing the cache.
+    
+    Strategy:
+    1. Try common RSS paths
+    2. Parse HTML for RSS link tags
+    """
     print(f"[DEBUG] Discovering RSS feed for: {base_url}")
     
     # Strategy 1: Try common RSS paths
@@ -216,7 +316,6 @@ def discover_rss_feed(base_url: str) -> Optional[str]:
                     feed = feedparser.parse(response.content)
                     if feed.entries:
                         print(f"[DEBUG] Found RSS feed at: {feed_url}")
-                        _rss_cache[base_url] = feed_url
                         return feed_url
         except Exception:
             continue
@@ -246,7 +345,6 @@ def discover_rss_feed(base_url: str) -> Optional[str]:
                         feed = feedparser.parse(feed_url)
                         if feed.entries:
                             print(f"[DEBUG] Found RSS feed via HTML: {feed_url}")
-                            _rss_cache[base_url] = feed_url
                             return feed_url
                     except Exception:
                         continue
@@ -254,7 +352,6 @@ def discover_rss_feed(base_url: str) -> Optional[str]:
         print(f"[DEBUG] Error parsing HTML for RSS: {e}")
     
     print(f"[DEBUG] No RSS feed found for: {base_url}")
-    _rss_cache[base_url] = None
     return None
 
 
@@ -338,6 +435,8 @@ def fetch_content_via_rss(article_link: str, article_title: str) -> Tuple[Option
     
     # Get base URL of the source
     base_url = get_base_url(resolved_url)
+    if base_url not in _rss_cache:
+        record_seen_domain(base_url)
     
     # Discover the RSS feed
     rss_feed_url = discover_rss_feed(base_url)
@@ -410,7 +509,47 @@ def fetch_article_content_fallback(url: str) -> Optional[str]:
     return None
 
 
-def fetch_news_by_categories(categories: List[str] = None, max_per_category: int = 3) -> List[Dict]:
+def make_article_id(link: str, title: str = "") -> str:
+    """
+    Build a stable article ID from the article link (title as a fallback).
+    The same article gets the same ID across requests and restarts.
+    """
+    key = link if link and link != "#" else title
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def fetch_article_content(article_link: str, article_title: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Fetch the full content for one article (the slow, per-article phase).
+    Tries RSS discovery first, then direct scraping.
+    Returns (content, rss_source) tuple.
+    """
+    # Try to fetch content via RSS discovery
+    print(f"[DEBUG] Processing: {article_title[:50]}...")
+    content, rss_source = fetch_content_via_rss(article_link, article_title)
+    
+    # Fallback to direct scraping if RSS discovery failed
+    if not content:
+        print(f"[DEBUG] RSS discovery failed, trying direct scraping...")
+        content = fetch_article_content_fallback(article_link)
+        rss_source = None
+    
+    if content:
+        source_info = f"via RSS: {rss_source}" if rss_source else "via direct scraping"
+        print(f"[DEBUG] Got {len(content)} chars {source_info}")
+    else:
+        print(f"[DEBUG] Could not fetch content from any source")
+    
+    return content, rss_source
+
+
+def parse_feed_entries(url: str, limit: int) -> List:
+    """Fetch at most `limit` entries from a feed (see services.feed_parser)."""
+    from services.feed_parser import parse_feed_entries as stream_parse_entries
+    return stream_parse_entries(url, limit)
+
+
+def fetch_news_by_categories(categories: List[str] = None, max_per_category: int = 3, enrich: bool = True) -> List[Dict]:
     """
     Fetches news from specified categories.
     
@@ -418,6 +557,9 @@ def fetch_news_by_categories(categories: List[str] = None, max_per_category: int
         categories: List of category keys (e.g., ['technology', 'business'])
                    If None, uses default categories.
         max_per_category: Maximum articles to fetch per category (default: 3)
+        enrich: If True, fetch full content for every article. If False, return
+                RSS-level data only (content is None) - see article_store for
+                lazy enrichment.
     
     Returns:
         List of article dictionaries with category info.
@@ -439,23 +581,18 @@ def fetch_news_by_categories(categories: List[str] = None, max_per_category: int
         
         try:
             print(f"[DEBUG] Fetching category: {cat_emoji} {cat_name}")
-            feed = feedparser.parse(url)
             
-            for entry in feed.entries[:max_per_category]:  # Use configurable limit
+            # Stream-parse only the entries we are going to use
+            for entry in parse_feed_entries(url, max_per_category):
                 article_link = entry.get("link", "#")
                 article_title = entry.get("title", "No Title")
                 
-                # Try to fetch content via RSS discovery
-                print(f"[DEBUG] Processing: {article_title[:50]}...")
-                content, rss_source = fetch_content_via_rss(article_link, article_title)
-                
-                # Fallback to direct scraping if RSS discovery failed
-                if not content:
-                    print(f"[DEBUG] RSS discovery failed, trying direct scraping...")
-                    content = fetch_article_content_fallback(article_link)
-                    rss_source = None
+                content, rss_source = None, None
+                if enrich:
+                    content, rss_source = fetch_article_content(article_link, article_title)
                 
                 article = {
+                    "id": make_article_id(article_link, article_title),
                     "title": article_title,
                     "link": article_link,
                     "summary": entry.get("summary", entry.get("description", "No summary available.")),
@@ -467,12 +604,6 @@ def fetch_news_by_categories(categories: List[str] = None, max_per_category: int
                     "rss_source": rss_source
                 }
                 
-                if content:
-                    source_info = f"via RSS: {rss_source}" if rss_source else "via direct scraping"
-                    print(f"[DEBUG] Got {len(content)} chars {source_info}")
-                else:
-                    print(f"[DEBUG] Could not fetch content from any source")
-                
                 articles.append(article)
                 
         except Exception as e:
@@ -509,10 +640,10 @@ def fetch_news_by_sources(sources: List[str] = None, max_per_source: int = 10) -
         print(f"[DEBUG] Fetching from source: {source_name}")
         
         try:
-            feed = feedparser.parse(feed_url)
-            
-            for entry in feed.entries[:max_per_source]:  # Use configurable limit
+            # Stream-parse only the entries we are going to use
+            for entry in parse_feed_entries(feed_url, max_per_source):
                 article = {
+                    "id": make_article_id(entry.get("link", ""), entry.get("title", "Untitled")),
                     "title": entry.get("title", "Untitled"),
                     "link": entry.get("link", ""),
                     "summary": entry.get("summary", entry.get("description", "")),
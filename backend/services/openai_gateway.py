@@ -0,0 +1,373 @@
+"""
+Async OpenAI gateway.
+
+Owns the single AsyncOpenAI client (and its pooled HTTP connections) used by
+every chat and TTS call in the backend. The client lives on a dedicated
+event loop thread, so:
+- async callers (FastAPI endpoints) await calls without holding a thread,
+- sync callers (schedulers, threadpool endpoints) use the *_sync wrappers,
+- all calls share one connection pool regardless of where they come from.
+
+Every call is admitted, rate limited and retried by openai_scheduler, and
+counted against the quota of the user it is made for (see user_quota).
+"""
+import os
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, List, Optional
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
+
+from services import openai_scheduler
+from services import model_router
+from services import user_quota
+from services.prompt_budget import count_tokens
+
+load_dotenv()
+
+# Connection pool limits for the shared client
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "120"))
+
+_client: Optional[AsyncOpenAI] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_api_key() -> Optional[str]:
+    """Get the OpenAI API key, or None if it is missing or a placeholder."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or api_key == "sk-your-api-key-here":
+        return None
+    return api_key
+
+
+def is_configured() -> bool:
+    """Check if OpenAI is configured."""
+    return get_api_key() is not None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Get or start the gateway event loop thread."""
+    global _loop
+    if _loop is not None:
+        return _loop
+
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="openai-gateway", daemon=True)
+            thread.start()
+            _loop = loop
+    return _loop
+
+
+def _get_client() -> AsyncOpenAI:
+    """Get or create the pooled AsyncOpenAI client. Only called on the gateway loop."""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=get_api_key(),
+            timeout=REQUEST_TIMEOUT_SECONDS,
+            max_retries=0,  # Retries are handled by openai_scheduler
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                )
+            )
+        )
+    return _client
+
+
+def submit(coro: Coroutine) -> Future:
+    """Schedule a coroutine on the gateway loop from any thread."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the gateway loop and block until it finishes."""
+    return submit(coro).result(timeout)
+
+
+async def run_async(coro: Coroutine) -> Any:
+    """Await a coroutine on the gateway loop from any event loop."""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if running is _get_loop():
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
+
+
+# ============================================================================
+# CHAT COMPLETIONS
+# ============================================================================
+
+# Per-model token usage reported by the API, including prompt-cache hits
+_usage: Dict[str, Dict[str, int]] = {}
+
+
+def record_usage(model: str, usage: Any) -> None:
+    """Add a response's usage (object or dict) to the per-model counters."""
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    details = usage.get("prompt_tokens_details") or {}
+    if not isinstance(details, dict):
+        details = details.model_dump() if hasattr(details, "model_dump") else vars(details)
+
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    cached_tokens = details.get("cached_tokens") or 0
+    with _lock:
+        counters = _usage.setdefault(model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+        counters["calls"] += 1
+        counters["prompt_tokens"] += prompt_tokens
+        counters["cached_tokens"] += cached_tokens
+        counters["completion_tokens"] += usage.get("completion_tokens") or 0
+    if cached_tokens:
+        print(f"[OPENAI] {model}: {cached_tokens}/{prompt_tokens} prompt tokens served from prompt cache")
+
+
+def get_usage_stats() -> Dict[str, Dict]:
+    """Get per-model token usage and the share of prompt tokens served from the prompt cache."""
+    with _lock:
+        return {
+            model: {
+                **counters,
+                "cached_ratio": round(counters["cached_tokens"] / counters["prompt_tokens"], 3)
+                if counters["prompt_tokens"] else None
+            }
+            for model, counters in _usage.items()
+        }
+
+
+def _estimate_tokens(model: str, messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Tokens a request counts against the TPM limit (prompt plus max_tokens)."""
+    return sum(count_tokens(m.get("content") or "", model) + 4 for m in messages) + max_tokens
+
+
+async def _chat_completion(
+    model: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+    **kwargs
+):
+    async def call():
+        return await _get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            **kwargs
+        )
+
+    tokens = _estimate_tokens(model, messages, max_tokens)
+    owner = user_quota.reserve(tokens)
+    # Admission-to-response time only: queueing and retry backoff are not the model's speed
+    latencies: List[float] = []
+    try:
+        with openai_scheduler.observe_latency(latencies.append):
+            response = await openai_scheduler.get_scheduler(model).run(call, tokens=tokens)
+    except asyncio.CancelledError:
+        # The request may already be billed
+        user_quota.settle(owner, tokens, tokens)
+        raise
+    except Exception:
+        user_quota.settle(owner, tokens, 0)
+        model_router.observe_error(model)
+        raise
+    usage = getattr(response, "usage", None)
+    record_usage(model, usage)
+    user_quota.settle(owner, tokens, getattr(usage, "total_tokens", None) or tokens)
+    if latencies:
+        model_router.observe(model, latencies[-1], getattr(usage, "completion_tokens", None) or max_tokens)
+    return response
+
+
+async def chat(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0.7, **kwargs):
+    """Create a chat completion. Raises on API errors."""
+    return await run_async(_chat_completion(model, messages, max_tokens, temperature, **kwargs))
+
+
+def chat_sync(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0.7, **kwargs):
+    """Blocking wrapper around chat() for sync callers."""
+    return run_sync(_chat_completion(model, messages, max_tokens, temperature, **kwargs))
+
+
+# Marks the end of a streamed completion
+_STREAM_END = object()
+
+
+async def _pump_chat_stream(
+    put: Callable[[Any], None],
+    model: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float,
+    **kwargs
+) -> None:
+    """Forward streamed completion deltas to put(); runs on the gateway loop."""
+    started = False
+    output_tokens = max_tokens
+    used_tokens = 0
+
+    async def call():
+        nonlocal started, output_tokens, used_tokens
+        stream = await _get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                started = True
+                put(chunk.choices[0].delta.content)
+            if getattr(chunk, "usage", None) is not None:
+                record_usage(model, chunk.usage)
+                output_tokens = chunk.usage.completion_tokens or output_tokens
+                used_tokens = chunk.usage.total_tokens or used_tokens
+
+    tokens = _estimate_tokens(model, messages, max_tokens)
+    try:
+        owner = user_quota.reserve(tokens)
+    except user_quota.QuotaExceededError as e:
+        put(e)
+        return
+
+    latencies: List[float] = []
+    try:
+        # Holds a concurrency slot for the whole stream; only retried before any output
+        with openai_scheduler.observe_latency(latencies.append):
+            await openai_scheduler.get_scheduler(model).run(call, tokens=tokens, retryable=lambda: not started)
+        if latencies:
+            model_router.observe(model, latencies[-1], output_tokens)
+        put(_STREAM_END)
+    except Exception as e:
+        model_router.observe_error(model)
+        put(e)
+    finally:
+        user_quota.settle(owner, tokens, used_tokens or (tokens if started else 0))
+
+
+async def chat_stream(
+    model: str,
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    temperature: float = 0.7,
+    **kwargs
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion as text deltas. Raises on API errors.
+    Closing the iterator early cancels the request.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def put(item: Any) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    future = submit(_pump_chat_stream(put, model, messages, max_tokens, temperature, **kwargs))
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        future.cancel()
+
+
+# ============================================================================
+# TEXT TO SPEECH
+# ============================================================================
+
+async def _speech(text: str, voice: str, model: str) -> bytes:
+    async def call():
+        response = await _get_client().audio.speech.create(model=model, voice=voice, input=text)
+        return response.content
+
+    # TTS input counts against the user's quota as the tokens of its text
+    tokens = count_tokens(text, model)
+    owner = user_quota.reserve(tokens)
+    try:
+        audio = await openai_scheduler.get_scheduler(model).run(call)
+    except Exception:
+        user_quota.settle(owner, tokens, 0)
+        raise
+    user_quota.settle(owner, tokens, tokens)
+    return audio
+
+
+async def speech(text: str, voice: str = "alloy", model: str = "tts-1") -> bytes:
+    """Generate speech audio (MP3 bytes). Raises on API errors."""
+    return await run_async(_speech(text, voice, model))
+
+
+def speech_sync(text: str, voice: str = "alloy", model: str = "tts-1") -> bytes:
+    """Blocking wrapper around speech() for sync callers."""
+    return run_sync(_speech(text, voice, model))
+
+
+# ============================================================================
+# BATCHES
+# ============================================================================
+
+async def _create_batch(jsonl: bytes, endpoint: str, completion_window: str) -> Dict[str, Any]:
+    client = _get_client()
+    input_file = await client.files.create(file=("batch_input.jsonl", jsonl), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=endpoint,
+        completion_window=completion_window
+    )
+    return batch.model_dump()
+
+
+async def _retrieve_batch(batch_id: str) -> Dict[str, Any]:
+    batch = await _get_client().batches.retrieve(batch_id)
+    return batch.model_dump()
+
+
+async def _cancel_batch(batch_id: str) -> Dict[str, Any]:
+    batch = await _get_client().batches.cancel(batch_id)
+    return batch.model_dump()
+
+
+async def _file_text(file_id: str) -> str:
+    response = await _get_client().files.content(file_id)
+    return response.text
+
+
+def create_batch_sync(jsonl: bytes, endpoint: str = "/v1/chat/completions", completion_window: str = "24h") -> Dict[str, Any]:
+    """Upload a Batch API input file and start the batch. Raises on API errors."""
+    return run_sync(_create_batch(jsonl, endpoint, completion_window))
+
+
+def retrieve_batch_sync(batch_id: str) -> Dict[str, Any]:
+    """Get a batch's status (id, status, output_file_id, request_counts, ...)."""
+    return run_sync(_retrieve_batch(batch_id))
+
+
+def cancel_batch_sync(batch_id: str) -> Dict[str, Any]:
+    """Cancel a batch that is no longer wanted."""
+    return run_sync(_cancel_batch(batch_id))
+
+
+def file_text_sync(file_id: str) -> str:
+    """Download a file (e.g. a batch output file) as text."""
+    return run_sync(_file_text(file_id))
@@ -0,0 +1,314 @@
+"""
+Rate-limit-aware scheduler in front of every OpenAI call.
+
+One ModelScheduler per model (OpenAI rate limits are per model), living on
+the gateway event loop:
+- requests-per-minute and tokens-per-minute token buckets,
+- an adaptive concurrency limit (AIMD): additive increase while calls
+  succeed within the latency target, multiplicative decrease on 429s,
+- retries of 429s, timeouts, connection errors and 5xx with full-jitter
+  exponential backoff, honouring Retry-After,
+- a priority queue, so interactive calls go ahead of scheduled/background
+  ones.
+
+Callers mark background work with `with call_priority(BACKGROUND):` or the
+@background_priority decorator; the priority travels with the request
+through context variables (including across gateway.run_sync / submit).
+"""
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import openai
+
+# Priorities (lower runs first)
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RPM_LIMIT = float(os.getenv("OPENAI_RPM_LIMIT", "500"))
+TPM_LIMIT = float(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+
+INITIAL_CONCURRENCY = float(os.getenv("OPENAI_INITIAL_CONCURRENCY", "8"))
+MIN_CONCURRENCY = float(os.getenv("OPENAI_MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = float(os.getenv("OPENAI_MAX_CONCURRENCY", "64"))
+DECREASE_FACTOR = 0.5
+
+# Calls slower than this do not grow the concurrency limit
+LATENCY_TARGET_SECONDS = float(os.getenv("OPENAI_LATENCY_TARGET_SECONDS", "20"))
+
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = float(os.getenv("OPENAI_BACKOFF_BASE_SECONDS", "1"))
+BACKOFF_MAX_SECONDS = float(os.getenv("OPENAI_BACKOFF_MAX_SECONDS", "60"))
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("openai_call_priority", default=INTERACTIVE)
+
+# Called with the latency of each successful attempt (see observe_latency)
+_latency_observer: contextvars.ContextVar = contextvars.ContextVar("openai_latency_observer", default=None)
+
+
+@contextmanager
+def call_priority(priority: int):
+    """Run OpenAI calls made inside this block at the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def background_priority(func: Callable) -> Callable:
+    """Decorator: OpenAI calls made by func (scheduled/background work) run at BACKGROUND priority."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with call_priority(BACKGROUND):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def observe_latency(callback: Callable[[float], None]):
+    """
+    Report the latency of OpenAI calls made inside this block to callback:
+    time from admission to response of the successful attempt, excluding
+    queueing, rate-limit waits and retry backoff. Nested blocks report to
+    every enclosing callback.
+    """
+    outer = _latency_observer.get()
+
+    def observe(latency: float) -> None:
+        callback(latency)
+        if outer is not None:
+            outer(latency)
+
+    token = _latency_observer.set(observe)
+    try:
+        yield
+    finally:
+        _latency_observer.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute` tokens per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self) -> None:
+        """Empty the bucket (the server told us we are over the limit)."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-requested delay in seconds (Retry-After / retry-after-ms), if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class ModelScheduler:
+    """Admission control and retries for one model. Only used on the gateway loop."""
+
+    def __init__(self, model: str, rpm: float = None, tpm: float = None):
+        self.model = model
+        self.requests = TokenBucket(rpm or RPM_LIMIT)
+        self.tokens = TokenBucket(tpm or TPM_LIMIT)
+        self.limit = INITIAL_CONCURRENCY
+        self.active = 0
+        self.paused_until = 0.0
+        self._queue: list = []  # heap of (priority, seq, tokens, future)
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"calls": 0, "rate_limited": 0, "retries": 0, "errors": 0}
+        self.latency_ewma: Optional[float] = None
+
+    # ---- admission ----
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), tokens, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # Admitted just as we were cancelled
+            raise
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit queued calls in priority order while limits allow."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            priority, _, tokens, future = self._queue[0]
+            if future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+            if self.active >= int(self.limit):
+                return  # A release will dispatch again
+
+            wait = max(
+                self.paused_until - time.monotonic(),
+                self.requests.wait_time(1),
+                self.tokens.wait_time(tokens)
+            )
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self.active += 1
+            future.set_result(None)
+
+    # ---- adaptation ----
+
+    def _on_success(self, latency: float) -> None:
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        if latency <= LATENCY_TARGET_SECONDS:
+            # Additive increase: about +1 per limit's worth of successful calls
+            self.limit = min(MAX_CONCURRENCY, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def _on_rate_limited(self, retry_after: Optional[float]) -> None:
+        self.stats["rate_limited"] += 1
+        self.limit = max(MIN_CONCURRENCY, self.limit * DECREASE_FACTOR)
+        self.requests.drain()
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    # ---- running calls ----
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        tokens: int = 0,
+        priority: int = None,
+        retryable: Callable[[], bool] = None
+    ) -> Any:
+        """
+        Run call() once admitted, retrying transient failures. `retryable`
+        can veto retries (e.g. once a stream has produced output).
+        """
+        priority = current_priority() if priority is None else priority
+        attempt = 0
+        while True:
+            await self._acquire(priority, tokens)
+            started = time.monotonic()
+            try:
+                result = await call()
+                latency = time.monotonic() - started
+                self.stats["calls"] += 1
+                self._on_success(latency)
+                observer = _latency_observer.get()
+                if observer is not None:
+                    observer(latency)
+                return result
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if isinstance(e, openai.RateLimitError):
+                    self._on_rate_limited(retry_after)
+                if (attempt >= MAX_RETRIES or not _is_retryable(e)
+                        or (retryable is not None and not retryable())):
+                    self.stats["errors"] += 1
+                    raise
+                delay = retry_after if retry_after is not None else _backoff(attempt)
+                print(f"[OPENAI] {self.model} {type(e).__name__}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+                self.stats["retries"] += 1
+            finally:
+                self._release()
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def has_capacity(self) -> bool:
+        """True if a new call would be admitted right away (nothing queued, under every limit)."""
+        if any(not future.cancelled() for _, _, _, future in self._queue):
+            return False
+        return (self.active < int(self.limit) and self.paused_until <= time.monotonic()
+                and self.requests.wait_time(1) <= 0)
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "concurrency_limit": round(self.limit, 2),
+            "active": self.active,
+            "queued": len(self._queue),
+            "latency_ewma_seconds": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "paused_seconds": max(0.0, round(self.paused_until - time.monotonic(), 1)),
+        }
+
+
+_schedulers: Dict[str, ModelScheduler] = {}
+
+
+def get_scheduler(model: str) -> ModelScheduler:
+    """Get the scheduler for a model. Only called on the gateway loop."""
+    scheduler = _schedulers.get(model)
+    if scheduler is None:
+        scheduler = _schedulers[model] = ModelScheduler(model)
+    return scheduler
+
+
+def get_scheduler_stats() -> Dict:
+    """Get per-model admission, concurrency and retry counters."""
+    return {model: scheduler.get_stats() for model, scheduler in list(_schedulers.items())}
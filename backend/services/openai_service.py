@@ -1,67 +1,382 @@
+"""
+OpenAI summarization functions.
+
+Each function has an async implementation (awaited by async endpoints) and a
+sync wrapper with the original name for existing callers. The interactive
+ones also have a *_stream variant that yields text as it is generated. All
+calls go through the shared client in openai_gateway.
+"""
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-from typing import List, Dict, Optional
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+from services import openai_gateway as gateway
+from services import llm_cache
+from services import prompt_budget
+from services import llm_hedging
+from services import model_router
+from services import digest_format
+from services import local_summarizer
+from services import metrics
+from services import user_quota
+
+# Target length of per-article briefs (see summarize_article_brief_async)
+ARTICLE_BRIEF_WORDS = 80
+
+# Texts longer than this many tokens are simplified in chunks, concurrently
+# (see summarize_text_async); chunks are split at paragraph boundaries
+LONG_TEXT_TOKENS = int(os.getenv("SIMPLIFY_LONG_TEXT_TOKENS", "2000"))
+CHUNK_TOKENS = int(os.getenv("SIMPLIFY_CHUNK_TOKENS", "1200"))
+MAX_CHUNKS = int(os.getenv("SIMPLIFY_MAX_CHUNKS", "8"))
+CHUNK_OUTPUT_TOKENS = 200
+
+# Output of a simplification; stitched chunks longer than
+# CONDENSE_ABOVE_TOKENS are condensed back to about this size
+SIMPLIFY_OUTPUT_TOKENS = 300
+CONDENSE_ABOVE_TOKENS = 450
+
+# How long a caller waits for an identical in-flight request before giving up
+COALESCE_TIMEOUT_SECONDS = float(os.getenv("LLM_COALESCE_TIMEOUT_SECONDS", "180"))
+
+# Default deadlines (seconds) for interactive summaries and scheduled digests;
+# past it the API call is cancelled and a local summary is used instead
+SUMMARY_DEADLINE_SECONDS = float(os.getenv("SUMMARY_DEADLINE_SECONDS", "30"))
+DIGEST_DEADLINE_SECONDS = float(os.getenv("DIGEST_DEADLINE_SECONDS", "300"))
+
+# Cache key -> in-flight completion shared by concurrent identical requests,
+# and how many callers are waiting on it
+_in_flight: Dict[str, Future] = {}
+_waiters: Dict[str, int] = {}
+_in_flight_lock = threading.Lock()
+_coalesce_stats = {"calls": 0, "coalesced": 0, "timeouts": 0, "abandoned": 0}
+
+
+def _route(endpoint: str, system_prompt: str, user_prompt: str, max_tokens: int) -> List[str]:
+    """Models to try for a request, best first (see model_router)."""
+    input_tokens = prompt_budget.count_tokens(system_prompt + user_prompt, model_router.primary_model(endpoint))
+    return model_router.route(endpoint, input_tokens, max_tokens)
+
+
+async def _fetch_completion(key: str, endpoint: str, system_prompt: str, user_prompt: str,
+                            max_tokens: int, temperature: float, response_format: Optional[Dict]) -> str:
+    """
+    Call the API and cache the response, trying the routed models in order
+    until one succeeds (each hedged, see llm_hedging). Runs on the gateway loop.
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    extra = {}
+    models = _route(endpoint, system_prompt, user_prompt, max_tokens)
+    for attempt, model in enumerate(models):
+        if response_format:
+            extra["response_format"] = model_router.response_format_for(model, response_format)
+        try:
+            response = await llm_hedging.hedged(endpoint, model, lambda: gateway.chat(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                **extra
+            ))
+            break
+        except user_quota.QuotaExceededError:
+            raise
+        except Exception as e:
+            if attempt == len(models) - 1:
+                raise
+            print(f"[ROUTER] {endpoint}: {model} failed ({type(e).__name__}), falling back to {models[attempt + 1]}")
+    
+    result = response.choices[0].message.content
+    llm_cache.put(key, result)
+    return result
+
+
+def _release_in_flight(key: str, future: Future) -> None:
+    with _in_flight_lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+
+async def _complete(
+    endpoint: str,
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int,
+    temperature: float = 0.7,
+    response_format: Optional[Dict] = None
+) -> str:
+    """
+    Run one chat completion for an endpoint (which selects the model route
+    and hedge budget), serving byte-identical requests from the response
+    cache. Requests with a response_format must use their own system prompt,
+    which keeps their cache key distinct. Concurrent identical requests
+    (from any thread or event loop) share a single in-flight call and its
+    result or error; the call is cancelled once every caller has given up.
+    Raises on API errors, and asyncio.TimeoutError after
+    COALESCE_TIMEOUT_SECONDS.
+    """
+    model = model_router.primary_model(endpoint)
+    key = llm_cache.make_key(model, system_prompt, user_prompt, max_tokens, temperature)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        print(f"[LLM CACHE] Hit for {model} request ({len(user_prompt)} chars)")
+        return cached
+    
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            # The call runs detached on the gateway loop, so a caller that
+            # times out or is cancelled does not cancel it for the others
+            future = gateway.submit(
+                _fetch_completion(key, endpoint, system_prompt, user_prompt, max_tokens, temperature, response_format)
+            )
+            _in_flight[key] = future
+            _coalesce_stats["calls"] += 1
+        else:
+            _coalesce_stats["coalesced"] += 1
+        _waiters[key] = _waiters.get(key, 0) + 1
+    
+    if leader:
+        future.add_done_callback(lambda done: _release_in_flight(key, done))
+    else:
+        print(f"[LLM] Joined in-flight {endpoint} request ({len(user_prompt)} chars)")
+    
+    completed = False
+    try:
+        result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), COALESCE_TIMEOUT_SECONDS)
+        completed = True
+        return result
+    except asyncio.TimeoutError:
+        with _in_flight_lock:
+            _coalesce_stats["timeouts"] += 1
+        raise
+    finally:
+        with _in_flight_lock:
+            _waiters[key] -= 1
+            abandoned = _waiters[key] == 0 and not completed and not future.done()
+            if _waiters[key] == 0:
+                del _waiters[key]
+            if abandoned:
+                _coalesce_stats["abandoned"] += 1
+                if _in_flight.get(key) is future:
+                    del _in_flight[key]
+        if abandoned:
+            # Timed out or cancelled (e.g. a deadline) with nobody else waiting
+            future.cancel()
+
+
+def _cached(endpoint: str, system_prompt: str, user_prompt: str, max_tokens: int, temperature: float = 0.7) -> Optional[str]:
+    """The cached response _complete would serve for a request, without calling the API."""
+    model = model_router.primary_model(endpoint)
+    return llm_cache.get(llm_cache.make_key(model, system_prompt, user_prompt, max_tokens, temperature))
 
-# Load environment variables
-load_dotenv()
 
-# Initialize OpenAI client
-_client: Optional[OpenAI] = None
+def get_coalescing_stats() -> Dict:
+    """Get single-flight counters (API calls made, requests that joined one, timeouts, calls cancelled)."""
+    with _in_flight_lock:
+        return {**_coalesce_stats, "in_flight": len(_in_flight)}
 
-def _get_client() -> Optional[OpenAI]:
-    """Get or create OpenAI client."""
-    global _client
-    api_key = os.getenv("OPENAI_API_KEY")
+
+async def _complete_stream(
+    endpoint: str,
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int,
+    temperature: float = 0.7
+) -> AsyncIterator[str]:
+    """
+    Stream one chat completion as text deltas. A cached response is yielded
+    in one piece; a fully streamed response is added to the cache. Falls
+    back to the next routed model only if a model fails before any output.
+    Raises on API errors.
+    """
+    model = model_router.primary_model(endpoint)
+    key = llm_cache.make_key(model, system_prompt, user_prompt, max_tokens, temperature)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        print(f"[LLM CACHE] Hit for {model} request ({len(user_prompt)} chars)")
+        yield cached
+        return
     
-    if not api_key or api_key == "sk-your-api-key-here":
+    parts = []
+    models = _route(endpoint, system_prompt, user_prompt, max_tokens)
+    for attempt, model in enumerate(models):
+        try:
+            async for delta in gateway.chat_stream(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature
+            ):
+                parts.append(delta)
+                yield delta
+            break
+        except user_quota.QuotaExceededError:
+            raise
+        except Exception as e:
+            if parts or attempt == len(models) - 1:
+                raise
+            print(f"[ROUTER] {endpoint}: {model} failed ({type(e).__name__}), falling back to {models[attempt + 1]}")
+    
+    llm_cache.put(key, "".join(parts))
+
+
+SIMPLIFY_SYSTEM_PROMPT = "You are a helpful assistant that simplifies news articles. Make the text easy to understand for a general audience. Keep it concise but informative."
+
+
+def _simplify_prompts(text: str) -> Tuple[str, str]:
+    text = prompt_budget.truncate_to_tokens(text, prompt_budget.ARTICLE_TOKEN_BUDGET, model_router.primary_model("simplify"))
+    user_prompt = f"Please simplify this news article:\n\n{text}"
+    return SIMPLIFY_SYSTEM_PROMPT, user_prompt
+
+
+def _chunk_prompts(chunk: str, part: int, parts: int) -> Tuple[str, str]:
+    user_prompt = f"Please simplify this section (part {part} of {parts}) of a news article:\n\n{chunk}"
+    return SIMPLIFY_SYSTEM_PROMPT, user_prompt
+
+
+def _condense_prompts(stitched: str) -> Tuple[str, str]:
+    user_prompt = ("These are simplified sections of one news article, in order. "
+                   f"Condense them into one short, easy to understand summary:\n\n{stitched}")
+    return SIMPLIFY_SYSTEM_PROMPT, user_prompt
+
+
+def _text_chunks(text: str) -> Optional[List[str]]:
+    """Chunks of a long text (at most MAX_CHUNKS, the rest dropped), or None for a short one."""
+    model = model_router.primary_model("simplify")
+    if prompt_budget.count_tokens(text, model) <= LONG_TEXT_TOKENS:
         return None
+    chunks = prompt_budget.split_to_chunks(text, CHUNK_TOKENS, model)
+    if len(chunks) > MAX_CHUNKS:
+        print(f"[SIMPLIFY] Keeping the first {MAX_CHUNKS} of {len(chunks)} chunks")
+    return chunks[:MAX_CHUNKS]
+
+
+def _needs_condense(stitched: str) -> bool:
+    return prompt_budget.count_tokens(stitched, model_router.primary_model("simplify")) > CONDENSE_ABOVE_TOKENS
+
+
+async def _simplify_chunks(chunks: List[str]) -> str:
+    """
+    Simplify chunks concurrently and stitch them in order. A chunk whose
+    call fails gets a local extract instead; if every call fails, the error
+    is raised.
+    """
+    results = await asyncio.gather(*[
+        _complete("simplify", *_chunk_prompts(chunk, i + 1, len(chunks)), max_tokens=CHUNK_OUTPUT_TOKENS)
+        for i, chunk in enumerate(chunks)
+    ], return_exceptions=True)
     
-    if _client is None:
-        _client = OpenAI(api_key=api_key)
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if len(failures) == len(results):
+        raise failures[0]
+    if failures:
+        print(f"[SIMPLIFY] {len(failures)} of {len(chunks)} chunks failed, using local extracts for them")
     
-    return _client
+    words = round(CHUNK_OUTPUT_TOKENS / prompt_budget.TOKENS_PER_WORD)
+    return "\n\n".join(
+        local_summarizer.summarize_text(chunk, words) if isinstance(result, BaseException) else result
+        for chunk, result in zip(chunks, results)
+    )
 
 
-def summarize_text(text: str) -> Optional[str]:
+async def summarize_text_async(text: str) -> Optional[str]:
     """
     Summarize a single piece of text using OpenAI GPT.
+    Long texts are split into chunks that are simplified concurrently and
+    stitched together, then condensed by one more call if the result is
+    long, so they take about as long as one chunk (plus the condense pass).
     Returns None if OpenAI is not configured.
     """
-    client = _get_client()
-    if not client:
+    if not gateway.is_configured():
         return None
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that simplifies news articles. Make the text easy to understand for a general audience. Keep it concise but informative."
-                },
-                {
-                    "role": "user",
-                    "content": f"Please simplify this news article:\n\n{text}"
-                }
-            ],
-            max_tokens=300,
-            temperature=0.7
-        )
-        return response.choices[0].message.content
+        chunks = _text_chunks(text)
+        if chunks is None:
+            system_prompt, user_prompt = _simplify_prompts(text)
+            return await _complete("simplify", system_prompt, user_prompt, max_tokens=SIMPLIFY_OUTPUT_TOKENS)
+        
+        print(f"[SIMPLIFY] Simplifying long text in {len(chunks)} chunks")
+        stitched = await _simplify_chunks(chunks)
+        if not _needs_condense(stitched):
+            return stitched
+        return await _complete("simplify", *_condense_prompts(stitched), max_tokens=SIMPLIFY_OUTPUT_TOKENS)
     except Exception as e:
         print(f"OpenAI API error: {e}")
         return None
 
 
-def create_digest(articles: List[Dict]) -> Optional[str]:
+def summarize_text_cached(text: str) -> Optional[str]:
+    """The cached summarize_text_async result for text, or None (never calls the API)."""
+    chunks = _text_chunks(text)
+    if chunks is None:
+        system_prompt, user_prompt = _simplify_prompts(text)
+        return _cached("simplify", system_prompt, user_prompt, max_tokens=SIMPLIFY_OUTPUT_TOKENS)
+    
+    parts = [
+        _cached("simplify", *_chunk_prompts(chunk, i + 1, len(chunks)), max_tokens=CHUNK_OUTPUT_TOKENS)
+        for i, chunk in enumerate(chunks)
+    ]
+    if not all(parts):
+        return None
+    stitched = "\n\n".join(parts)
+    if not _needs_condense(stitched):
+        return stitched
+    return _cached("simplify", *_condense_prompts(stitched), max_tokens=SIMPLIFY_OUTPUT_TOKENS)
+
+
+async def summarize_text_stream(text: str) -> AsyncIterator[str]:
+    """
+    Streaming variant of summarize_text_async. For long texts the stitched
+    chunks are yielded in one piece, or the condense pass is streamed.
+    Raises on API errors.
+    """
+    chunks = _text_chunks(text)
+    if chunks is None:
+        system_prompt, user_prompt = _simplify_prompts(text)
+        async for delta in _complete_stream("simplify", system_prompt, user_prompt, max_tokens=SIMPLIFY_OUTPUT_TOKENS):
+            yield delta
+        return
+    
+    print(f"[SIMPLIFY] Simplifying long text in {len(chunks)} chunks")
+    stitched = await _simplify_chunks(chunks)
+    if not _needs_condense(stitched):
+        yield stitched
+        return
+    async for delta in _complete_stream("simplify", *_condense_prompts(stitched), max_tokens=SIMPLIFY_OUTPUT_TOKENS):
+        yield delta
+
+
+def summarize_text(text: str) -> Optional[str]:
+    """Sync wrapper for summarize_text_async."""
+    return gateway.run_sync(summarize_text_async(text))
+
+
+DIGEST_SYSTEM_PROMPT = """You are a news editor creating a VERY BRIEF daily digest.
+Your task is to:
+1. Summarize ALL articles into ONE short paragraph (150-200 words max)
+2. Mention only the most important 4-5 headlines
+3. Write in a clear, engaging style
+4. Be extremely concise - this must fit on ONE page"""
+
+
+async def create_digest_async(articles: List[Dict]) -> Optional[str]:
     """
     Create a one-page digest from multiple news articles using OpenAI GPT.
     Goes through each headline and compiles raw text before sending to OpenAI.
     Returns None if OpenAI is not configured.
     """
-    client = _get_client()
-    if not client:
+    if not gateway.is_configured():
         print("[DEBUG] OpenAI client not configured - API key missing or invalid")
         return None
     
@@ -105,8 +420,14 @@ def create_digest(articles: List[Dict]) -> Optional[str]:
         # Compile the article text
         articles_parts.append(f"**{title}** ({source})\n{content}")
     
-    # Join all articles into raw text
-    raw_news_text = "\n\n---\n\n".join(articles_parts)
+    # Join all articles into raw text, fitted to the input token budget
+    model = model_router.primary_model("digest")
+    max_tokens = prompt_budget.max_output_tokens(200, model)
+    budget = prompt_budget.input_budget(model, DIGEST_SYSTEM_PROMPT, max_tokens)
+    separator = "\n\n---\n\n"
+    raw_news_text = separator.join(
+        prompt_budget.fit_excerpts(articles_parts, budget, model=model, separator=separator)
+    )
     
     print("\n" + "-" * 70)
     print("CONTENT COMPILATION SUMMARY:")
@@ -118,12 +439,7 @@ def create_digest(articles: List[Dict]) -> Optional[str]:
     
     # ========== PREPARE OPENAI REQUEST ==========
     
-    system_prompt = """You are a news editor creating a VERY BRIEF daily digest.
-Your task is to:
-1. Summarize ALL articles into ONE short paragraph (150-200 words max)
-2. Mention only the most important 4-5 headlines
-3. Write in a clear, engaging style
-4. Be extremely concise - this must fit on ONE page"""
+    system_prompt = DIGEST_SYSTEM_PROMPT
 
     user_prompt = f"Create a brief one-paragraph news digest from these articles:\n\n{raw_news_text}"
     
@@ -145,23 +461,7 @@ Your task is to:
     # =============================================================
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ],
-            max_tokens=300,
-            temperature=0.7
-        )
-        
-        result = response.choices[0].message.content
+        result = await _complete("digest", system_prompt, user_prompt, max_tokens=max_tokens)
         print(f"[DEBUG] OpenAI Response received: {len(result)} characters")
         return result
     except Exception as e:
@@ -169,13 +469,54 @@ Your task is to:
         return None
 
 
-def summarize_combined_excerpts(combined_text: str) -> Optional[str]:
+def _article_brief_prompts(title: str, text: str, word_count: int) -> Tuple[str, str, int]:
+    # Fixed prompt so identical articles hit the response cache across users
+    system_prompt = f"""You are a helpful assistant that simplifies news articles.
+Summarize the article in plain language for a general audience in at most {word_count} words.
+Keep the key facts: who, what, when, where, and any important numbers."""
+
+    model = model_router.primary_model("article_brief")
+    text = prompt_budget.truncate_to_tokens(text, prompt_budget.ARTICLE_TOKEN_BUDGET, model)
+    user_prompt = f"Title: {title}\n\n{text}"
+    max_tokens = prompt_budget.max_output_tokens(word_count, model)
+    return system_prompt, user_prompt, max_tokens
+
+
+async def summarize_article_brief_async(title: str, text: str, word_count: int = ARTICLE_BRIEF_WORDS) -> Optional[str]:
+    """
+    Summarize one article into a short plain-language brief.
+    Used once per article for /simplify and as the map step of digests.
+    Returns None if OpenAI is not configured or on error.
+    """
+    if not gateway.is_configured():
+        return None
+    
+    system_prompt, user_prompt, max_tokens = _article_brief_prompts(title, text, word_count)
+    
+    try:
+        return await _complete("article_brief", system_prompt, user_prompt, max_tokens=max_tokens)
+    except Exception as e:
+        print(f"OpenAI API error: {e}")
+        return None
+
+
+def summarize_article_brief_stream(title: str, text: str, word_count: int = ARTICLE_BRIEF_WORDS) -> AsyncIterator[str]:
+    """Streaming variant of summarize_article_brief_async. Raises on API errors."""
+    system_prompt, user_prompt, max_tokens = _article_brief_prompts(title, text, word_count)
+    return _complete_stream("article_brief", system_prompt, user_prompt, max_tokens=max_tokens)
+
+
+def create_digest(articles: List[Dict]) -> Optional[str]:
+    """Sync wrapper for create_digest_async."""
+    return gateway.run_sync(create_digest_async(articles))
+
+
+async def summarize_combined_excerpts_async(combined_text: str) -> Optional[str]:
     """
-    Summarize combined RSS excerpts using GPT-4o-mini.
+    Summarize combined RSS excerpts (model chosen by model_router).
     Returns a concise summary of all the news.
     """
-    client = _get_client()
-    if not client:
+    if not gateway.is_configured():
         print("[DEBUG] OpenAI client not configured - API key missing or invalid")
         return None
     
@@ -190,32 +531,21 @@ def summarize_combined_excerpts(combined_text: str) -> Optional[str]:
 5. Keep the summary to 200-300 words
 6. Group related stories together if applicable"""
 
+    model = model_router.primary_model("summarize_combined")
+    max_tokens = prompt_budget.max_output_tokens(300, model)
+    combined_text = prompt_budget.fit_text(
+        combined_text, prompt_budget.input_budget(model, system_prompt, max_tokens), model=model
+    )
     user_prompt = f"Please summarize these news excerpts into a cohesive news digest:\n\n{combined_text}"
     
     print("\n" + "=" * 70)
-    print("   SUMMARIZING COMBINED EXCERPTS WITH GPT-4o-mini")
+    print("   SUMMARIZING COMBINED EXCERPTS")
     print("=" * 70)
     print(f"Input text length: {len(combined_text)} characters")
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ],
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        result = response.choices[0].message.content
-        print(f"[DEBUG] GPT-4o-mini Summary received: {len(result)} characters")
+        result = await _complete("summarize_combined", system_prompt, user_prompt, max_tokens=max_tokens)
+        print(f"[DEBUG] Summary received: {len(result)} characters")
         print("=" * 70 + "\n")
         return result
     except Exception as e:
@@ -223,9 +553,57 @@ def summarize_combined_excerpts(combined_text: str) -> Optional[str]:
         return None
 
 
-def summarize_combined_excerpts_with_word_limit(combined_text: str, target_word_count: int = 500) -> Optional[str]:
+def summarize_combined_excerpts(combined_text: str) -> Optional[str]:
+    """Sync wrapper for summarize_combined_excerpts_async."""
+    return gateway.run_sync(summarize_combined_excerpts_async(combined_text))
+
+
+WORD_LIMIT_SYSTEM_PROMPT = """You are a skilled news editor. Your task is to:
+1. Read through all the news excerpts provided
+2. Create a comprehensive but concise summary
+3. Highlight the most important stories and key themes
+4. Write in clear, engaging prose
+5. Keep the summary to the word count requested at the end of the message
+6. Group related stories together if applicable"""
+
+
+def _word_limit_prompts(
+    combined_text: str,
+    target_word_count: int,
+    system_prompt: str = WORD_LIMIT_SYSTEM_PROMPT,
+    output_overhead: float = 1.0
+) -> Tuple[str, str, int]:
+    # Size the response for the target word count (see prompt_budget)
+    model = model_router.primary_model("summarize_combined")
+    max_tokens = prompt_budget.max_output_tokens(int(target_word_count * output_overhead), model)
+    
+    # Stable prefix first (instructions, then the shared article block) and the
+    # per-user word target last, so requests over the same articles share a
+    # prompt prefix the provider can cache
+    instruction = (
+        f"Please summarize the news excerpts above into a cohesive news digest of approximately "
+        f"{target_word_count} words.\n"
+        f"IMPORTANT: Your summary should be close to {target_word_count} words - not too short, not too long."
+    )
+    budget = prompt_budget.input_budget(model, system_prompt, max_tokens)
+    combined_text = prompt_budget.fit_text(
+        combined_text, budget - prompt_budget.count_tokens(instruction, model), model=model
+    )
+    user_prompt = f"News excerpts:\n\n{combined_text}\n\n---\n\n{instruction}"
+    
+    print("\n" + "=" * 70)
+    print(f"   SUMMARIZING WITH TARGET WORD COUNT: {target_word_count}")
+    print("=" * 70)
+    print(f"Input text length: {len(combined_text)} characters "
+          f"({prompt_budget.count_tokens(combined_text, model)} tokens)")
+    print(f"Max tokens: {max_tokens}")
+    
+    return system_prompt, user_prompt, max_tokens
+
+
+async def summarize_combined_excerpts_with_word_limit_async(combined_text: str, target_word_count: int = 500) -> Optional[str]:
     """
-    Summarize combined RSS excerpts using GPT-4o-mini with a specific word count target.
+    Summarize combined RSS excerpts with a specific word count target (model chosen by model_router).
     Supports adaptive word count based on user feedback.
     
     Args:
@@ -235,58 +613,263 @@ def summarize_combined_excerpts_with_word_limit(combined_text: str, target_word_
     Returns:
         A summary with approximately the target word count, or None on error.
     """
-    client = _get_client()
-    if not client:
+    if not gateway.is_configured():
         print("[DEBUG] OpenAI client not configured - API key missing or invalid")
         return None
     
     if not combined_text or len(combined_text.strip()) < 50:
         return "No content available to summarize."
     
-    # Adjust max_tokens based on word count target (roughly 1.3 tokens per word)
-    max_tokens = min(int(target_word_count * 1.5), 2000)
-    
-    system_prompt = f"""You are a skilled news editor. Your task is to:
-1. Read through all the news excerpts provided
-2. Create a comprehensive but concise summary
-3. Highlight the most important stories and key themes
-4. Write in clear, engaging prose
-5. Keep the summary to approximately {target_word_count} words
-6. Group related stories together if applicable
-
-IMPORTANT: Your summary should be close to {target_word_count} words - not too short, not too long."""
-
-    user_prompt = f"Please summarize these news excerpts into a cohesive news digest of approximately {target_word_count} words:\n\n{combined_text}"
-    
-    print("\n" + "=" * 70)
-    print(f"   SUMMARIZING WITH TARGET WORD COUNT: {target_word_count}")
-    print("=" * 70)
-    print(f"Input text length: {len(combined_text)} characters")
-    print(f"Max tokens: {max_tokens}")
+    system_prompt, user_prompt, max_tokens = _word_limit_prompts(combined_text, target_word_count)
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                }
-            ],
-            max_tokens=max_tokens,
-            temperature=0.7
-        )
-        
-        result = response.choices[0].message.content
+        result = await _complete("summarize_combined", system_prompt, user_prompt, max_tokens=max_tokens)
         actual_words = len(result.split())
-        print(f"[DEBUG] GPT-4o-mini Summary: {actual_words} words ({len(result)} chars)")
+        print(f"[DEBUG] Summary: {actual_words} words ({len(result)} chars)")
         print(f"[DEBUG] Target was {target_word_count} words")
         print("=" * 70 + "\n")
         return result
     except Exception as e:
         print(f"OpenAI API error: {e}")
         return None
+
+
+def summarize_combined_excerpts_with_word_limit_stream(combined_text: str, target_word_count: int = 500) -> AsyncIterator[str]:
+    """
+    Streaming variant of summarize_combined_excerpts_with_word_limit_async.
+    Callers check gateway.is_configured() and the input first. Raises on API errors.
+    """
+    system_prompt, user_prompt, max_tokens = _word_limit_prompts(combined_text, target_word_count)
+    return _complete_stream("summarize_combined", system_prompt, user_prompt, max_tokens=max_tokens)
+
+
+def summarize_combined_excerpts_with_word_limit_request(combined_text: str, target_word_count: int = 500) -> Dict:
+    """
+    Chat completion request body equivalent to
+    summarize_combined_excerpts_with_word_limit, for batch jobs (see batch_service).
+    Batches run on the route's primary model.
+    """
+    system_prompt, user_prompt, max_tokens = _word_limit_prompts(combined_text, target_word_count)
+    return {
+        "model": model_router.primary_model("summarize_combined"),
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.7
+    }
+
+
+def summarize_combined_excerpts_with_word_limit(combined_text: str, target_word_count: int = 500) -> Optional[str]:
+    """Sync wrapper for summarize_combined_excerpts_with_word_limit_async."""
+    return gateway.run_sync(summarize_combined_excerpts_with_word_limit_async(combined_text, target_word_count))
+
+
+
+STRUCTURED_DIGEST_SYSTEM_PROMPT = WORD_LIMIT_SYSTEM_PROMPT + """
+
+Respond with JSON only: a short "title" and "sections" (group related stories
+under a heading). Each story has a "headline", a "summary" of one to three
+sentences, the "source" named in the excerpt, and "articles": the numbers of
+the ARTICLE excerpts it is based on (empty if the excerpts are not numbered)."""
+
+DIGEST_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "news_digest", "strict": True, "schema": digest_format.DIGEST_SCHEMA}
+}
+
+# JSON keys and structure take roughly a quarter more tokens than prose
+STRUCTURED_OUTPUT_OVERHEAD = 1.25
+
+
+def _structured_prompts(combined_text: str, target_word_count: int) -> Tuple[str, str, int]:
+    return _word_limit_prompts(
+        combined_text, target_word_count, STRUCTURED_DIGEST_SYSTEM_PROMPT, STRUCTURED_OUTPUT_OVERHEAD
+    )
+
+
+async def summarize_combined_excerpts_structured_async(
+    combined_text: str,
+    target_word_count: int = 500,
+    articles: Optional[List[Dict]] = None
+) -> Optional[Dict]:
+    """
+    Structured variant of summarize_combined_excerpts_with_word_limit_async:
+    returns a digest dict (see digest_format). `articles`, in excerpt order
+    (ARTICLE n is articles[n - 1]), supply story sources and links.
+    Returns None if OpenAI is not configured, on error, or on invalid output.
+    """
+    if not gateway.is_configured():
+        print("[DEBUG] OpenAI client not configured - API key missing or invalid")
+        return None
+    
+    if not combined_text or len(combined_text.strip()) < 50:
+        return None
+    
+    system_prompt, user_prompt, max_tokens = _structured_prompts(combined_text, target_word_count)
+    
+    try:
+        result = await _complete("summarize_combined", system_prompt, user_prompt, max_tokens=max_tokens,
+                                 response_format=DIGEST_RESPONSE_FORMAT)
+    except Exception as e:
+        print(f"OpenAI API error: {e}")
+        return None
+    
+    return parse_structured_digest(result, articles)
+
+
+def parse_structured_digest(result: Optional[str], articles: Optional[List[Dict]] = None) -> Optional[Dict]:
+    """Parse structured digest output, attaching article sources and links. None if invalid."""
+    digest = digest_format.parse_digest_json(result) if result else None
+    if digest is None:
+        print("[DEBUG] Structured digest output was not valid JSON")
+        return None
+    return digest_format.attach_sources(digest, articles or [])
+
+
+def summarize_combined_excerpts_structured_request(combined_text: str, target_word_count: int = 500) -> Dict:
+    """Chat completion request body for summarize_combined_excerpts_structured, for batch jobs."""
+    system_prompt, user_prompt, max_tokens = _structured_prompts(combined_text, target_word_count)
+    model = model_router.primary_model("summarize_combined")
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "response_format": model_router.response_format_for(model, DIGEST_RESPONSE_FORMAT)
+    }
+
+
+def summarize_combined_excerpts_structured(
+    combined_text: str,
+    target_word_count: int = 500,
+    articles: Optional[List[Dict]] = None
+) -> Optional[Dict]:
+    """Sync wrapper for summarize_combined_excerpts_structured_async."""
+    return gateway.run_sync(summarize_combined_excerpts_structured_async(combined_text, target_word_count, articles))
+
+
+# ============================================================================
+# DEADLINES
+# ============================================================================
+
+async def run_with_deadline(coro, deadline: Optional[float], name: str):
+    """
+    Await coro for at most `deadline` seconds (None: no limit). When the
+    deadline passes, coro is cancelled - which cancels its API calls unless
+    another request is waiting on them (see _complete) - the event is
+    recorded in metrics and None is returned.
+    """
+    if deadline is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, max(deadline, 0.0))
+    except asyncio.TimeoutError:
+        print(f"[DEADLINE] {name} exceeded {deadline:.1f}s, API call cancelled")
+        metrics.record_event("llm_deadline_exceeded", endpoint=name, deadline_seconds=deadline)
+        return None
+
+
+async def _summarize_combined_remote(
+    combined_text: str,
+    target_word_count: int,
+    structured: bool,
+    articles: Optional[List[Dict]]
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """(summary, digest) from OpenAI: the structured digest if requested, else text."""
+    if structured:
+        digest = await summarize_combined_excerpts_structured_async(combined_text, target_word_count, articles)
+        if digest:
+            return digest_format.digest_to_text(digest), digest
+    summary = await summarize_combined_excerpts_with_word_limit_async(combined_text, target_word_count)
+    return summary, None
+
+
+def _summary_result(
+    outcome: Optional[Tuple[Optional[str], Optional[Dict]]],
+    combined_text: str,
+    target_word_count: int,
+    structured: bool,
+    started: float
+) -> Dict:
+    """Result dict for an OpenAI outcome, falling back to a degraded local summary."""
+    if outcome and outcome[0]:
+        summary, digest = outcome
+        return {"summary": summary, "digest": digest, "tier": "llm", "degraded": False, "reason": None}
+    
+    if not gateway.is_configured():
+        reason = "not_configured"
+    elif user_quota.exhausted() or user_quota.rejected_since(started):
+        reason = "quota"
+    else:
+        reason = "deadline" if outcome is None else "error"
+    print(f"[DEADLINE] AI summary unavailable ({reason}), using local summary")
+    metrics.record_event("summary_degraded", reason=reason, target_words=target_word_count)
+    
+    summary = local_summarizer.summarize_excerpts(combined_text, target_word_count)
+    digest = digest_format.digest_from_text(summary) if structured else None
+    return {"summary": summary, "digest": digest, "tier": "local", "degraded": True, "reason": reason}
+
+
+async def summarize_combined_with_deadline_async(
+    combined_text: str,
+    target_word_count: int = 500,
+    deadline: Optional[float] = SUMMARY_DEADLINE_SECONDS,
+    structured: bool = False,
+    articles: Optional[List[Dict]] = None
+) -> Dict:
+    """
+    Summarize combined excerpts within `deadline` seconds (None: no limit):
+    the structured digest when `structured` (articles as for
+    summarize_combined_excerpts_structured_async), else or failing that the
+    word-limited text summary. If the deadline passes, the API call is
+    cancelled; without an AI summary a local extractive one is returned.
+    
+    A user whose token quota is used up (see user_quota) gets the local
+    summary straight away.
+    
+    Returns {"summary", "digest" (None unless structured), "tier": "llm" |
+    "local", "degraded": bool, "reason": None | "deadline" | "quota" |
+    "error" | "not_configured"}.
+    """
+    started = time.monotonic()
+    outcome = None
+    if gateway.is_configured() and not user_quota.exhausted():
+        outcome = await run_with_deadline(
+            _summarize_combined_remote(combined_text, target_word_count, structured, articles),
+            deadline, "summarize_combined"
+        )
+    return _summary_result(outcome, combined_text, target_word_count, structured, started)
+
+
+def summarize_combined_with_deadline(
+    combined_text: str,
+    target_word_count: int = 500,
+    deadline: Optional[float] = DIGEST_DEADLINE_SECONDS,
+    structured: bool = False,
+    articles: Optional[List[Dict]] = None
+) -> Dict:
+    """
+    Sync wrapper for summarize_combined_with_deadline_async (scheduled
+    digests, so the default deadline is DIGEST_DEADLINE_SECONDS). The local
+    fallback runs in the calling thread rather than on the gateway loop.
+    """
+    started = time.monotonic()
+    outcome = None
+    if gateway.is_configured() and not user_quota.exhausted():
+        outcome = gateway.run_sync(run_with_deadline(
+            _summarize_combined_remote(combined_text, target_word_count, structured, articles),
+            deadline, "summarize_combined"
+        ))
+    return _summary_result(outcome, combined_text, target_word_count, structured, started)
+
+
+def deadline_remaining(started: float, deadline: Optional[float]) -> Optional[float]:
+    """Seconds left of a deadline started at time.monotonic() value `started` (None: no limit)."""
+    if deadline is None:
+        return None
+    return deadline - (time.monotonic() - started)
@@ -0,0 +1,43 @@
+"""
+OPML import for user feed subscriptions.
+"""
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+from urllib.parse import urlparse
+
+
+def is_valid_feed_url(url: str) -> bool:
+    """Check that a feed URL is an absolute http(s) URL."""
+    parsed = urlparse(url or "")
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def parse_opml(data: bytes) -> List[Dict[str, str]]:
+    """
+    Extract feed subscriptions from an OPML document.
+
+    Outlines may be nested in folders; every outline with an xmlUrl is a feed.
+    Returns a list of {"url", "title"} dicts, de-duplicated by URL.
+
+    Raises:
+        ValueError: If the document is not valid OPML/XML.
+    """
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid OPML file: {e}")
+
+    if root.tag.lower() != "opml":
+        raise ValueError("Invalid OPML file: missing <opml> root element")
+
+    feeds = []
+    seen = set()
+    for outline in root.iter("outline"):
+        url = (outline.get("xmlUrl") or "").strip()
+        if not is_valid_feed_url(url) or url in seen:
+            continue
+        seen.add(url)
+        title = outline.get("title") or outline.get("text") or url
+        feeds.append({"url": url, "title": title.strip()})
+
+    return feeds
@@ -1,4 +1,5 @@
 from io import BytesIO
+from html import escape
 from datetime import datetime
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -6,10 +7,13 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.colors import HexColor
 
+from services.digest_format import ensure_digest, story_pdf_markup
 
-def create_pdf(digest_text: str, title: str = "Daily News Digest") -> bytes:
+
+def create_pdf(digest, title: str = "Daily News Digest") -> bytes:
     """
-    Generate a PDF document from the digest text.
+    Generate a PDF document from a structured digest (see digest_format)
+    or digest text.
     Returns PDF as bytes.
     """
     buffer = BytesIO()
@@ -77,35 +81,14 @@ def create_pdf(digest_text: str, title: str = "Daily News Digest") -> bytes:
     # Spacer
     story.append(Spacer(1, 0.25 * inch))
     
-    # Process digest text - handle markdown-style formatting
-    lines = digest_text.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
-            story.append(Spacer(1, 0.1 * inch))
-            continue
-        
-        # Handle headers
-        if line.startswith('# '):
-            story.append(Paragraph(line[2:], heading_style))
-        elif line.startswith('## '):
-            story.append(Paragraph(line[3:], heading_style))
-        elif line.startswith('**') and line.endswith('**'):
-            # Bold text
-            clean = line.strip('*')
-            story.append(Paragraph(f"<b>{clean}</b>", body_style))
-        elif line.startswith('---'):
-            story.append(Spacer(1, 0.2 * inch))
-        elif line.startswith('*') and line.endswith('*'):
-            # Italic text
-            clean = line.strip('*')
-            story.append(Paragraph(f"<i>{clean}</i>", body_style))
-        else:
-            # Regular paragraph - escape any HTML-like content
-            safe_line = line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            # But preserve our intentional bold/italic
-            safe_line = safe_line.replace('**', '')
-            story.append(Paragraph(safe_line, body_style))
+    # One heading per section, one paragraph per story
+    for section in ensure_digest(digest).get("sections", []):
+        if section.get("heading"):
+            story.append(Paragraph(escape(section["heading"]), heading_style))
+        for item in section.get("stories", []):
+            story.append(Paragraph(story_pdf_markup(
+                item.get("headline", ""), item.get("summary", ""), item.get("source", ""), item.get("link", "")
+            ), body_style))
     
     # Build PDF
     doc.build(story)
@@ -0,0 +1,228 @@
+"""
+Token-aware prompt budgeting.
+
+Counts tokens locally (tiktoken when available, a character-based estimate
+otherwise), fits a list of excerpts into an input token budget by priority,
+splits long texts into token-bounded chunks, and derives max_tokens from a
+target word count, so prompts have a predictable size and outputs are not
+cut off by a guessed limit.
+"""
+import os
+import re
+import math
+import threading
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Input budget for the excerpt block of combined/digest prompts
+INPUT_TOKEN_BUDGET = int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "12000"))
+
+# Input budget for a single article sent for summarization
+ARTICLE_TOKEN_BUDGET = int(os.getenv("PROMPT_ARTICLE_TOKEN_BUDGET", "3000"))
+
+# Excerpts are trimmed down to this size before any are dropped
+MIN_EXCERPT_TOKENS = int(os.getenv("PROMPT_MIN_EXCERPT_TOKENS", "60"))
+
+# English prose averages ~1.3 tokens per word; the margin covers headings and markup
+TOKENS_PER_WORD = float(os.getenv("PROMPT_TOKENS_PER_WORD", "1.35"))
+OUTPUT_MARGIN = float(os.getenv("PROMPT_OUTPUT_MARGIN", "1.15"))
+
+# Per-model limits: (context window, max output tokens)
+MODEL_LIMITS: Dict[str, tuple] = {
+    "gpt-4o-mini": (128000, 16384),
+    "gpt-4o": (128000, 16384),
+    "gpt-3.5-turbo": (16385, 4096),
+}
+_DEFAULT_LIMITS = (16385, 4096)
+
+# Tokens the chat format adds around each message
+_MESSAGE_OVERHEAD = 4
+
+# Used when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+_encodings: Dict[str, Optional[object]] = {}
+_lock = threading.Lock()
+
+
+def _get_encoding(model: str):
+    """Get the tokenizer for a model, or None if tiktoken (or its data) is unavailable."""
+    if tiktoken is None:
+        return None
+
+    with _lock:
+        if model in _encodings:
+            return _encodings[model]
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"[PROMPT BUDGET] Tokenizer for {model} unavailable, estimating: {e}")
+            encoding = None
+        _encodings[model] = encoding
+        return encoding
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count the tokens in a piece of text for a model."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Cut text down to at most max_tokens, preferring a word boundary."""
+    if not text or max_tokens <= 0:
+        return ""
+
+    # One token is reserved for the trailing ellipsis
+    encoding = _get_encoding(model)
+    if encoding is None:
+        if len(text) <= max_tokens * _CHARS_PER_TOKEN:
+            return text
+        cut = text[:(max_tokens - 1) * _CHARS_PER_TOKEN]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = encoding.decode(tokens[:max_tokens - 1])
+
+    space = cut.rfind(" ")
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + "..."
+
+
+def split_to_chunks(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> List[str]:
+    """
+    Split text into chunks of at most max_tokens, at paragraph boundaries.
+    Paragraphs that do not fit are split between sentences, and sentences
+    that still do not fit are truncated.
+    """
+    # (piece, separator before it) - paragraphs apart, sentences of one paragraph together
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n|\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph, model) <= max_tokens:
+            pieces.append((paragraph, "\n\n"))
+            continue
+        for i, sentence in enumerate(re.split(r"(?<=[.!?])\s+", paragraph)):
+            pieces.append((truncate_to_tokens(sentence, max_tokens, model), " " if i else "\n\n"))
+
+    chunks: List[str] = []
+    current, current_tokens = "", 0
+    for piece, separator in pieces:
+        tokens = count_tokens(piece, model)
+        if current and current_tokens + count_tokens(separator, model) + tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = "", 0
+        if current:
+            current = f"{current}{separator}{piece}"
+            tokens += count_tokens(separator, model)
+        else:
+            current = piece
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def fit_excerpts(
+    excerpts: Sequence[str],
+    budget: int = None,
+    priorities: Optional[Sequence[float]] = None,
+    model: str = "gpt-4o-mini",
+    separator: str = "\n\n"
+) -> List[str]:
+    """
+    Fit excerpts into a token budget, keeping their original order.
+
+    Lowest-priority excerpts are trimmed first (down to MIN_EXCERPT_TOKENS);
+    if that is not enough, they are dropped. Without priorities, earlier
+    excerpts rank higher.
+    """
+    budget = INPUT_TOKEN_BUDGET if budget is None else max(budget, 0)
+    if not excerpts:
+        return []
+    if priorities is None:
+        priorities = [-i for i in range(len(excerpts))]
+
+    texts = list(excerpts)
+    counts = [count_tokens(text, model) for text in texts]
+    separator_tokens = count_tokens(separator, model)
+
+    def total() -> int:
+        kept = [c for c in counts if c]
+        return sum(kept) + separator_tokens * max(len(kept) - 1, 0)
+
+    overflow = total() - budget
+    if overflow <= 0:
+        return texts
+
+    by_priority = sorted(range(len(texts)), key=lambda i: priorities[i])
+
+    # Trim the least important excerpts first
+    for i in by_priority:
+        if overflow <= 0:
+            break
+        spare = counts[i] - MIN_EXCERPT_TOKENS
+        if spare <= 0:
+            continue
+        target = counts[i] - min(spare, overflow)
+        texts[i] = truncate_to_tokens(texts[i], target, model)
+        new_count = count_tokens(texts[i], model)
+        overflow -= counts[i] - new_count
+        counts[i] = new_count
+
+    # Then drop them, always keeping the most important one
+    dropped = 0
+    for i in by_priority[:-1]:
+        if overflow <= 0:
+            break
+        overflow -= counts[i] + separator_tokens
+        counts[i] = 0
+        dropped += 1
+
+    if overflow > 0:
+        i = by_priority[-1]
+        texts[i] = truncate_to_tokens(texts[i], counts[i] - overflow, model)
+        counts[i] = count_tokens(texts[i], model)
+
+    print(f"[PROMPT BUDGET] Fitted {len(texts)} excerpts into {budget} tokens "
+          f"({dropped} dropped, {total()} used)")
+    return [text for text, count in zip(texts, counts) if count]
+
+
+def fit_text(text: str, budget: int = None, model: str = "gpt-4o-mini", separator: str = "\n\n") -> str:
+    """Fit an already-combined text (excerpts joined by separator) into a token budget."""
+    if not text:
+        return text
+    return separator.join(fit_excerpts(text.split(separator), budget, model=model, separator=separator))
+
+
+def max_output_tokens(target_word_count: int, model: str = "gpt-4o-mini") -> int:
+    """max_tokens for a response of about target_word_count words, within the model's limit."""
+    tokens = math.ceil(target_word_count * TOKENS_PER_WORD * OUTPUT_MARGIN)
+    return max(16, min(tokens, MODEL_LIMITS.get(model, _DEFAULT_LIMITS)[1]))
+
+
+def input_budget(model: str, system_prompt: str, max_tokens: int, budget: int = None) -> int:
+    """
+    Tokens left for the user prompt: the configured budget, capped so the
+    system prompt, user prompt and response fit the model's context window.
+    """
+    context_window = MODEL_LIMITS.get(model, _DEFAULT_LIMITS)[0]
+    available = context_window - max_tokens - count_tokens(system_prompt, model) - 3 * _MESSAGE_OVERHEAD
+    budget = INPUT_TOKEN_BUDGET if budget is None else max(budget, 0)
+    return max(0, min(budget, available))
@@ -4,6 +4,7 @@ from typing import Optional
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from dotenv import load_dotenv
+from services.openai_scheduler import background_priority
 
 load_dotenv()
 
@@ -17,6 +18,7 @@ def get_scheduler() -> Optional[BackgroundScheduler]:
     return _scheduler
 
 
+@background_priority
 def scheduled_news_job():
     """
     Job that runs every 12 hours to:
@@ -32,11 +34,16 @@ def scheduled_news_job():
     try:
         # Import services
         from services.news_fetcher import fetch_news
-        from services.openai_service import summarize_combined_excerpts
+        from services.openai_service import summarize_combined_excerpts, summarize_combined_excerpts_structured
         from services.pdf_service import create_pdf
         from services.tts_service import text_to_speech_openai
         from services.sendgrid_service import send_summary_email
-        from bs4 import BeautifulSoup
+        from services.article_summaries import get_article_briefs
+        from services.digest_service import build_combined_excerpts, excerpt_order, STRUCTURED_OUTPUT
+        from services.digest_format import digest_to_text, ensure_digest
+        from services.local_summarizer import summarize_excerpts
+        from services.topic_clustering import cluster_articles
+        from services.article_ranking import select_articles, story_priorities
         
         # Get recipients from environment
         recipients_str = os.getenv("EMAIL_RECIPIENTS", "")
@@ -55,29 +62,24 @@ def scheduled_news_job():
             print("[SCHEDULER] No articles found, skipping email")
             return
         
-        # Step 2: Build combined excerpts
+        # Step 2: Build combined excerpts from the most relevant articles
         print("[SCHEDULER] Building combined excerpts...")
-        excerpts = []
-        for idx, article in enumerate(articles, 1):
-            title = article.get('title', 'Untitled')
-            source = article.get('source', 'Unknown')
-            summary = article.get('summary', '')
-            
-            section = f"ARTICLE {idx}: {title}\n"
-            section += f"Source: {source}\n"
-            
-            if summary:
-                clean_summary = BeautifulSoup(summary, 'html.parser').get_text(separator=' ', strip=True)
-                section += clean_summary
-            
-            excerpts.append(section)
-        
-        combined_text = "\n\n".join(excerpts)
+        articles, scores = select_articles(articles)
+        briefs = get_article_briefs(articles)
+        stories, story_briefs = cluster_articles(articles, briefs)
+        combined_text = build_combined_excerpts(stories, story_briefs, priorities=story_priorities(stories, scores))
         print(f"[SCHEDULER] Combined text: {len(combined_text)} characters")
         
         # Step 3: Generate AI summary
-        print("[SCHEDULER] Generating AI summary with GPT-4o-mini...")
-        summary = summarize_combined_excerpts(combined_text)
+        print("[SCHEDULER] Generating AI summary...")
+        digest = None
+        if STRUCTURED_OUTPUT:
+            digest = summarize_combined_excerpts_structured(combined_text, 300, excerpt_order(stories))
+        summary = digest_to_text(digest) if digest else summarize_combined_excerpts(combined_text)
+        
+        if not summary:
+            print("[SCHEDULER] AI summary unavailable, using local summary")
+            summary = summarize_excerpts(combined_text, 300)
         
         if not summary:
             print("[SCHEDULER] Failed to generate summary, skipping email")
@@ -85,14 +87,17 @@ def scheduled_news_job():
         
         print(f"[SCHEDULER] Summary generated: {len(summary)} characters")
         
+        # Parse text once; every renderer works from the structure
+        digest = digest or ensure_digest(summary)
+        
         # Step 4: Generate PDF
         print("[SCHEDULER] Generating PDF...")
-        pdf_bytes = create_pdf(summary, "AI News Summary")
+        pdf_bytes = create_pdf(digest, "AI News Summary")
         print(f"[SCHEDULER] PDF generated: {len(pdf_bytes)} bytes")
         
         # Step 5: Generate audio
         print("[SCHEDULER] Generating audio with OpenAI TTS...")
-        audio_bytes = text_to_speech_openai(summary, voice="nova")
+        audio_bytes = text_to_speech_openai(digest, voice="nova")
         print(f"[SCHEDULER] Audio generated: {len(audio_bytes)} bytes")
         
         # Step 6: Send email via SendGrid to all recipients
@@ -103,7 +108,8 @@ def scheduled_news_job():
                 to_email=recipient,
                 summary_text=summary,
                 pdf_bytes=pdf_bytes,
-                audio_bytes=audio_bytes
+                audio_bytes=audio_bytes,
+                digest=digest
             )
             if success:
                 print(f"[SCHEDULER] ✅ Email sent to {recipient}")
@@ -1,8 +1,10 @@
 import os
 import base64
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
+from services.digest_format import digest_to_html, ensure_digest
+
 load_dotenv()
 
 
@@ -91,7 +93,8 @@ def send_summary_email(
     to_email: str,
     summary_text: str,
     pdf_bytes: Optional[bytes] = None,
-    audio_bytes: Optional[bytes] = None
+    audio_bytes: Optional[bytes] = None,
+    digest: Optional[Dict] = None
 ) -> Tuple[bool, str]:
     """
     Send a news summary email with optional PDF and audio attachments.
@@ -101,6 +104,7 @@ def send_summary_email(
         summary_text: The news summary text
         pdf_bytes: Optional PDF attachment bytes
         audio_bytes: Optional audio attachment bytes
+        digest: Optional structured digest (see digest_format); parsed from summary_text if not provided
     
     Returns:
         Tuple of (success: bool, message: str)
@@ -112,6 +116,7 @@ def send_summary_email(
     time_str = now.strftime("%I:%M %p")
     
     subject = f"📰 Your AI News Summary - {date_str}"
+    summary_html = digest_to_html(ensure_digest(digest or summary_text))
     
     # Create HTML email body
     html_content = f"""
@@ -156,7 +161,6 @@ def send_summary_email(
                 padding: 20px;
                 border-radius: 12px;
                 border-left: 4px solid #667eea;
-                white-space: pre-wrap;
             }}
             .attachments {{
                 background: #e8f4fd;
@@ -181,7 +185,7 @@ def send_summary_email(
             </div>
             
             <div class="content">
-                <div class="summary">{summary_text}</div>
+                <div class="summary">{summary_html}</div>
                 
                 {f'<div class="attachments"><strong>📎 Attachments included:</strong><br>' + 
                  ('• PDF Summary<br>' if pdf_bytes else '') + 
@@ -228,7 +232,8 @@ def send_summary_email_with_feedback(
     pdf_bytes: Optional[bytes] = None,
     audio_bytes: Optional[bytes] = None,
     feedback_token: Optional[str] = None,
-    app_base_url: str = None
+    app_base_url: str = None,
+    digest: Optional[Dict] = None
 ) -> Tuple[bool, str]:
     """
     Send a news summary email with feedback buttons and optional attachments.
@@ -240,6 +245,7 @@ def send_summary_email_with_feedback(
         audio_bytes: Optional audio attachment bytes
         feedback_token: Unique token for feedback tracking
         app_base_url: Base URL for feedback links (default from env)
+        digest: Optional structured digest (see digest_format); parsed from summary_text if not provided
     
     Returns:
         Tuple of (success: bool, message: str)
@@ -254,6 +260,7 @@ def send_summary_email_with_feedback(
     time_str = now.strftime("%I:%M %p")
     
     subject = f"📰 Your AI News Summary - {date_str}"
+    summary_html = digest_to_html(ensure_digest(digest or summary_text))
     
     # Feedback buttons HTML (only if token provided)
     feedback_html = ""
@@ -322,7 +329,6 @@ def send_summary_email_with_feedback(
                 padding: 20px;
                 border-radius: 12px;
                 border-left: 4px solid #667eea;
-                white-space: pre-wrap;
             }}
             .attachments {{
                 background: #e8f4fd;
@@ -347,7 +353,7 @@ def send_summary_email_with_feedback(
             </div>
             
             <div class="content">
-                <div class="summary">{summary_text}</div>
+                <div class="summary">{summary_html}</div>
                 
                 {f'<div class="attachments"><strong>📎 Attachments included:</strong><br>' + 
                  ('• PDF Summary<br>' if pdf_bytes else '') + 
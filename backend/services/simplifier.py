@@ -1,34 +1,128 @@
-import random
+import os
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from services import openai_gateway as gateway
+from services import local_summarizer
 from services.openai_service import summarize_text as openai_summarize
+from services.openai_service import summarize_text_async as openai_summarize_async
+from services.openai_service import summarize_text_stream as openai_summarize_stream
+from services.openai_service import summarize_text_cached as openai_summarize_cached
+from services.openai_service import ARTICLE_BRIEF_WORDS
+
+# Concurrent completions per batch (see simplify_batch)
+BATCH_CONCURRENCY = int(os.getenv("SIMPLIFY_BATCH_CONCURRENCY", "16"))
 
 def simplify_text(text: str) -> str:
     """
-    Simplifies text using OpenAI API with fallback to mock.
+    Simplifies text using OpenAI API with fallback to local extraction.
     """
     # Try OpenAI first
     result = openai_summarize(text)
     if result:
         return result
     
-    # Fallback to mock logic if OpenAI is not configured
-    return _mock_simplify(text)
+    # Fall back to local extraction if OpenAI is not configured or fails
+    return local_simplify(text)
+
+
+async def simplify_text_async(text: str) -> str:
+    """
+    Async version of simplify_text for async endpoints.
+    """
+    result = await openai_summarize_async(text)
+    if result:
+        return result
+    
+    return local_simplify(text)
+
+
+async def simplify_text_stream(text: str) -> AsyncIterator[str]:
+    """
+    Streaming version of simplify_text_async: yields text as OpenAI generates it.
+    Falls back to local extraction in one piece if OpenAI is not configured
+    or fails before producing any output.
+    """
+    if gateway.is_configured():
+        started = False
+        try:
+            async for delta in openai_summarize_stream(text):
+                started = True
+                yield delta
+            return
+        except Exception as e:
+            if started:
+                raise
+            print(f"OpenAI API error: {e}")
+    
+    yield local_simplify(text)
 
 
-def _mock_simplify(text: str) -> str:
+def local_simplify(text: str) -> str:
     """
-    Mock simplification for when OpenAI is not available.
+    Extractive simplification (local_summarizer) - the fast tier, and the
+    fallback when OpenAI is not available.
     """
-    sentences = text.split('. ')
-    if len(sentences) > 1:
-        simplified = ". ".join(sentences[:2]) + "."
-    else:
-        simplified = text
+    return local_summarizer.summarize_text(text, ARTICLE_BRIEF_WORDS) or text
+
+
+def _stored_brief(article: Optional[Dict]) -> Optional[str]:
+    """An article's brief if it already has one (on the record or in the store)."""
+    from services import article_store
+    
+    if article is None:
+        return None
+    if article.get("brief"):
+        return article["brief"]
+    stored = article_store.get_article(article["id"]) if article.get("id") else None
+    return stored.get("brief") if stored else None
+
 
-    prefixes = [
-        "Simply put: ",
-        "In short: ",
-        "To break it down: ",
-        "The key takeaway is: "
-    ]
+async def simplify_batch(items: List[Dict], concurrency: int = None) -> AsyncIterator[Tuple[int, Dict]]:
+    """
+    Simplify many items ({"text", "article" (optional), "tier"}) and yield
+    (index, result) as results become available: items with a stored brief,
+    a cached response or the fast tier first, then the rest as their
+    completions finish, at most `concurrency` at a time.
+    
+    Results are {"simplified", "tier": "llm" | "local", "cached"}, or
+    {"error"} for an item without text. Closing the iterator early cancels
+    the outstanding completions.
+    """
+    from services.article_summaries import get_article_brief_async
+    
+    pending = []
+    for index, item in enumerate(items):
+        text, article = item.get("text") or "", item.get("article")
+        if not text and article is None:
+            yield index, {"error": "No text provided"}
+        elif item.get("tier") == "fast":
+            yield index, {"simplified": _stored_brief(article) or local_simplify(text), "tier": "local", "cached": False}
+        else:
+            cached = _stored_brief(article) or (openai_summarize_cached(text) if text else None)
+            if cached:
+                yield index, {"simplified": cached, "tier": "llm", "cached": True}
+            else:
+                pending.append((index, text, article))
+    
+    if not pending:
+        return
+    
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    
+    async def _one(index: int, text: str, article: Optional[Dict]) -> Tuple[int, Dict]:
+        tier = "llm"
+        async with semaphore:
+            simplified = await get_article_brief_async(article) if article is not None else None
+            if not simplified and text:
+                simplified = await openai_summarize_async(text)
+                if not simplified:
+                    simplified, tier = local_simplify(text), "local"
+        return index, {"simplified": simplified or "", "tier": tier, "cached": False}
     
-    return f"{random.choice(prefixes)} {simplified}"
+    tasks = [asyncio.ensure_future(_one(*job)) for job in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,100 @@
+"""
+Topic clustering of articles before summarization.
+
+Articles about the same event - from different feeds, categories or
+publishers - are grouped into one story by the TF-IDF cosine similarity of
+their titles and excerpts (vectorized with NumPy, no network). Only one
+representative excerpt per story goes into the digest prompt, with the other
+sources listed on it, so prompts are smaller and the digest does not repeat
+the same story.
+"""
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+from services.local_summarizer import tfidf_matrix
+from services.digest_format import article_key
+
+CLUSTERING_ENABLED = os.getenv("DIGEST_CLUSTERING", "true").lower() == "true"
+
+# Articles at least this similar to a story's representative join the story
+SIMILARITY_THRESHOLD = float(os.getenv("DIGEST_CLUSTER_SIMILARITY", "0.45"))
+
+# Titles say most about which event an article covers: count them this many times
+TITLE_WEIGHT = 2
+
+
+def clustering_text(article: Dict, brief: Optional[str] = None) -> str:
+    """Text an article is compared by: its title (weighted) and brief or summary."""
+    text = brief or BeautifulSoup(article.get("summary") or "", "html.parser").get_text(separator=" ", strip=True)
+    return " ".join([article.get("title", "")] * TITLE_WEIGHT + [text])
+
+
+def cluster_indices(texts: Sequence[str], threshold: float = None) -> List[List[int]]:
+    """
+    Group texts into clusters of indices. The most central text not yet
+    assigned leads a new cluster and takes every unassigned text at least
+    `threshold` similar to it; the leader comes first in its cluster.
+    Clusters are ordered by their earliest member.
+    """
+    threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+    if len(texts) < 2:
+        return [[i] for i in range(len(texts))]
+
+    matrix = tfidf_matrix(texts)
+    similarity = matrix @ matrix.T
+    centrality = similarity.sum(axis=1)
+
+    assigned = np.zeros(len(texts), dtype=bool)
+    clusters = []
+    for leader in np.argsort(-centrality, kind="stable"):
+        if assigned[leader]:
+            continue
+        members = np.flatnonzero(~assigned & (similarity[leader] >= threshold))
+        members = [int(leader)] + [int(m) for m in members if m != leader]
+        assigned[members] = True
+        clusters.append(members)
+
+    return sorted(clusters, key=min)
+
+
+def cluster_articles(
+    articles: List[Dict],
+    briefs: Optional[List[Optional[str]]] = None
+) -> Tuple[List[Dict], List[Optional[str]]]:
+    """
+    Merge articles about the same story. Returns one representative per
+    story, with its brief: a copy of the article with "also_reported_by"
+    (the other sources) and "cluster_keys" (article keys of every member,
+    see digest_format.attach_sources).
+    """
+    briefs = list(briefs) if briefs else [None] * len(articles)
+    if not CLUSTERING_ENABLED or len(articles) < 2:
+        return articles, briefs
+
+    clusters = cluster_indices([clustering_text(a, b) for a, b in zip(articles, briefs)])
+    if len(clusters) == len(articles):
+        return articles, briefs
+
+    representatives, representative_briefs = [], []
+    for members in clusters:
+        leader = articles[members[0]]
+        if len(members) == 1:
+            representatives.append(leader)
+        else:
+            sources = []
+            for i in members[1:]:
+                source = articles[i].get("source")
+                if source and source != leader.get("source") and source not in sources:
+                    sources.append(source)
+            representatives.append({
+                **leader,
+                "also_reported_by": sources,
+                "cluster_keys": [article_key(articles[i]) for i in members],
+            })
+        representative_briefs.append(briefs[members[0]])
+
+    print(f"[CLUSTER] {len(articles)} articles -> {len(clusters)} stories")
+    return representatives, representative_briefs
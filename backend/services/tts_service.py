@@ -1,15 +1,18 @@
+import re
+import asyncio
 from io import BytesIO
 from gtts import gTTS
-import re
+from services import openai_gateway as gateway
+from services.digest_format import digest_to_speech
 
 
-def text_to_speech(text: str, lang: str = 'en') -> bytes:
+def text_to_speech(text, lang: str = 'en') -> bytes:
     """
-    Convert text to speech using Google Text-to-Speech.
+    Convert text (or a structured digest) to speech using Google Text-to-Speech.
     Returns MP3 audio as bytes.
     """
     # Clean the text for better speech output
-    clean_text = _clean_text_for_speech(text)
+    clean_text = _speech_text(text)
     
     if not clean_text.strip():
         clean_text = "No content available for audio."
@@ -37,6 +40,13 @@ def text_to_speech(text: str, lang: str = 'en') -> bytes:
         return buffer.getvalue()
 
 
+def _speech_text(text) -> str:
+    """Speech text of a structured digest (see digest_format), or of cleaned-up text."""
+    if isinstance(text, dict):
+        return digest_to_speech(text)
+    return _clean_text_for_speech(text)
+
+
 def _clean_text_for_speech(text: str) -> str:
     """
     Clean markdown and special characters for better speech output.
@@ -68,46 +78,30 @@ def _clean_text_for_speech(text: str) -> str:
     return text.strip()
 
 
-def text_to_speech_openai(text: str, voice: str = 'alloy') -> bytes:
+async def text_to_speech_openai_async(text, voice: str = 'alloy') -> bytes:
     """
-    Convert text to speech using OpenAI TTS.
+    Convert text (or a structured digest) to speech using OpenAI TTS.
     Uses high-quality neural voice.
     
     Available voices: alloy, echo, fable, onyx, nova, shimmer
     Returns MP3 audio as bytes.
     """
-    import os
-    from openai import OpenAI
-    from dotenv import load_dotenv
-    
-    load_dotenv()
-    
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or api_key == "sk-your-api-key-here":
+    if not gateway.is_configured():
         print("[DEBUG] OpenAI API key not configured, falling back to gTTS")
-        return text_to_speech(text)
+        return await asyncio.to_thread(text_to_speech, text)
     
     # Clean the text
-    clean_text = _clean_text_for_speech(text)
+    clean_text = _speech_text(text)
     
     if not clean_text.strip():
         clean_text = "No content available for audio."
     
     try:
-        client = OpenAI(api_key=api_key)
-        
         print(f"[DEBUG] Generating OpenAI TTS with voice: {voice}")
         print(f"[DEBUG] Text length: {len(clean_text)} characters")
         
         # Using tts-1 standard model
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice=voice,
-            input=clean_text
-        )
-        
-        # Get audio bytes
-        audio_bytes = response.content
+        audio_bytes = await gateway.speech(clean_text, voice=voice, model="tts-1")
         
         print(f"[DEBUG] OpenAI TTS generated: {len(audio_bytes)} bytes")
         return audio_bytes
@@ -115,4 +109,9 @@ def text_to_speech_openai(text: str, voice: str = 'alloy') -> bytes:
     except Exception as e:
         print(f"OpenAI TTS Error: {e}")
         print("[DEBUG] Falling back to gTTS")
-        return text_to_speech(text)
+        return await asyncio.to_thread(text_to_speech, text)
+
+
+def text_to_speech_openai(text, voice: str = 'alloy') -> bytes:
+    """Sync wrapper for text_to_speech_openai_async."""
+    return gateway.run_sync(text_to_speech_openai_async(text, voice))
@@ -0,0 +1,79 @@
+"""
+Guards for fetching user-supplied URLs.
+
+Custom feed URLs come from users, so the server must not be made to fetch
+its own loopback interface, private networks or cloud metadata endpoints
+(169.254.169.254). Hosts are resolved and every address checked when a feed
+is added, and again on each fetch and redirect hop (see safe_get), since DNS
+records and redirect targets can change after the URL was accepted.
+"""
+import socket
+import ipaddress
+from typing import Optional
+from urllib.parse import urljoin, urlparse
+
+import requests
+
+MAX_REDIRECTS = 5
+
+
+class UnsafeURLError(ValueError):
+    """A URL points at a host the server must not fetch."""
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not (
+        ip.is_loopback or ip.is_private or ip.is_link_local or ip.is_reserved
+        or ip.is_multicast or ip.is_unspecified
+    )
+
+
+def check_public_url(url: str) -> None:
+    """
+    Raise UnsafeURLError unless url is http(s) and every address its host
+    resolves to is public.
+    """
+    parsed = urlparse(url or "")
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise UnsafeURLError(f"Not an absolute http(s) URL: {url}")
+
+    try:
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        infos = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError) as e:
+        raise UnsafeURLError(f"Cannot resolve {parsed.hostname}: {e}")
+
+    for info in infos:
+        if not _is_public_address(info[4][0]):
+            raise UnsafeURLError(f"{parsed.hostname} resolves to a non-public address")
+
+
+def is_public_url(url: str) -> bool:
+    """True if url is http(s) and its host resolves only to public addresses."""
+    try:
+        check_public_url(url)
+    except UnsafeURLError:
+        return False
+    return True
+
+
+def safe_get(url: str, headers: Optional[dict] = None, timeout: int = 15, **kwargs) -> requests.Response:
+    """
+    requests.get for user-supplied URLs: the URL and every redirect target
+    are checked with check_public_url before they are requested.
+
+    Raises:
+        UnsafeURLError: If the URL or a redirect points at a non-public host.
+        requests.TooManyRedirects: After MAX_REDIRECTS hops.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        check_public_url(url)
+        response = requests.get(url, headers=headers, timeout=timeout, allow_redirects=False, **kwargs)
+        if not response.is_redirect:
+            return response
+        url = urljoin(url, response.headers["Location"])
+        response.close()
+    raise requests.TooManyRedirects(f"More than {MAX_REDIRECTS} redirects")
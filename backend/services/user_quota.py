@@ -0,0 +1,272 @@
+"""
+Per-user OpenAI token quotas.
+
+Every chat and TTS call made on behalf of a user (signed-in email, else
+"ip:<address>") counts against that user's per-minute and per-day token
+budgets, so one heavy user cannot use up the shared rate limit. Callers mark
+whose work they are doing with `with quota_user(owner):`; like the call
+priority (see openai_scheduler), the owner travels with the request through
+context variables to the gateway, which reserves the estimated tokens before
+each call and settles the actual usage afterwards. Calls with no owner
+(shared digests, cache warming) are not limited.
+
+Usage is counted in memory and written to Firestore in batches every
+QUOTA_FLUSH_SECONDS; an owner's usage for the day is loaded once per process
+(load), so restarts keep the daily count. TTS input counts as the tokens of
+its text.
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+QUOTA_ENABLED = os.getenv("USER_QUOTA_ENABLED", "true").lower() == "true"
+
+# Token budgets per user
+DAILY_TOKEN_LIMIT = int(os.getenv("USER_DAILY_TOKEN_LIMIT", "300000"))
+MINUTE_TOKEN_LIMIT = int(os.getenv("USER_MINUTE_TOKEN_LIMIT", "30000"))
+
+# How often pending usage is written to Firestore
+QUOTA_FLUSH_SECONDS = int(os.getenv("USER_QUOTA_FLUSH_SECONDS", "30"))
+
+_owner: contextvars.ContextVar = contextvars.ContextVar("quota_owner", default=None)
+
+# Owner -> {"day", "day_tokens", "minute", "minute_tokens", "loaded", "last_rejected"}
+_usage: Dict[str, Dict] = {}
+# (owner, day) -> tokens not yet written to Firestore
+_pending: Dict[tuple, int] = {}
+_stats = {"calls": 0, "rejected": 0, "flushes": 0, "flush_errors": 0}
+_lock = threading.Lock()
+
+_flush_thread: Optional[threading.Thread] = None
+_flush_stop = threading.Event()
+
+
+class QuotaExceededError(Exception):
+    """A user's token budget does not cover a call."""
+
+    def __init__(self, owner: str, window: str, retry_after: float):
+        super().__init__(f"Token quota exceeded for {owner} ({window}), retry in {retry_after:.0f}s")
+        self.owner = owner
+        self.window = window
+        self.retry_after = retry_after
+
+
+@contextmanager
+def quota_user(owner: Optional[str]):
+    """Count OpenAI calls made inside this block against owner's quota."""
+    token = _owner.set(owner)
+    try:
+        yield
+    finally:
+        _owner.reset(token)
+
+
+def current_owner() -> Optional[str]:
+    return _owner.get()
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _current_usage(owner: str) -> Dict:
+    """The owner's counters, rolled over to the current day and minute. Call with _lock held."""
+    day, minute = _today(), int(time.time() // 60)
+    usage = _usage.get(owner)
+    if usage is None or usage["day"] != day:
+        usage = _usage[owner] = {
+            "day": day, "day_tokens": 0, "minute": minute, "minute_tokens": 0, "loaded": False, "last_rejected": None
+        }
+    if usage["minute"] != minute:
+        usage["minute"] = minute
+        usage["minute_tokens"] = 0
+    return usage
+
+
+def load(owner: str) -> None:
+    """
+    Load owner's usage for today from Firestore, once per process and day.
+    Blocking - call from request threads or schedulers, not the gateway loop.
+    """
+    if not QUOTA_ENABLED:
+        return
+    with _lock:
+        usage = _current_usage(owner)
+        if usage["loaded"]:
+            return
+        usage["loaded"] = True
+        day = usage["day"]
+
+    try:
+        import firebase_models as fm
+        stored = fm.get_user_token_usage(owner, day)
+    except Exception as e:
+        print(f"[QUOTA] Could not load usage for {owner}: {e}")
+        return
+
+    with _lock:
+        usage = _current_usage(owner)
+        if usage["day"] == day:
+            usage["day_tokens"] += stored
+
+
+def reserve(tokens: int) -> Optional[str]:
+    """
+    Reserve tokens for a call against the current owner's quota. Returns the
+    owner (None when unlimited), to pass to settle once the call is done.
+    Raises QuotaExceededError if either budget would be exceeded.
+    """
+    owner = _owner.get()
+    if owner is None or not QUOTA_ENABLED:
+        return None
+
+    with _lock:
+        usage = _current_usage(owner)
+        if usage["day_tokens"] + tokens > DAILY_TOKEN_LIMIT:
+            _stats["rejected"] += 1
+            usage["last_rejected"] = time.monotonic()
+            raise QuotaExceededError(owner, "day", 86400 - time.time() % 86400)
+        # A single call larger than the minute budget may still run on its own
+        if usage["minute_tokens"] and usage["minute_tokens"] + tokens > MINUTE_TOKEN_LIMIT:
+            _stats["rejected"] += 1
+            usage["last_rejected"] = time.monotonic()
+            raise QuotaExceededError(owner, "minute", 60 - time.time() % 60)
+        _stats["calls"] += 1
+        usage["day_tokens"] += tokens
+        usage["minute_tokens"] += tokens
+    return owner
+
+
+def settle(owner: Optional[str], reserved: int, used: int) -> None:
+    """Replace a reservation with the tokens actually used (0 if the call failed)."""
+    if owner is None:
+        return
+    with _lock:
+        usage = _current_usage(owner)
+        usage["day_tokens"] = max(0, usage["day_tokens"] + used - reserved)
+        usage["minute_tokens"] = max(0, usage["minute_tokens"] + used - reserved)
+        if used:
+            key = (owner, usage["day"])
+            _pending[key] = _pending.get(key, 0) + used
+
+
+def exhausted(owner: Optional[str] = None) -> bool:
+    """True if owner (default: the current owner) has used up a budget."""
+    owner = owner or _owner.get()
+    if owner is None or not QUOTA_ENABLED:
+        return False
+    with _lock:
+        usage = _current_usage(owner)
+        return usage["day_tokens"] >= DAILY_TOKEN_LIMIT or usage["minute_tokens"] >= MINUTE_TOKEN_LIMIT
+
+
+def rejected_since(since: float, owner: Optional[str] = None) -> bool:
+    """True if a call for owner (default: the current owner) was rejected after time.monotonic() value `since`."""
+    owner = owner or _owner.get()
+    if owner is None:
+        return False
+    with _lock:
+        usage = _usage.get(owner)
+        return usage is not None and usage["last_rejected"] is not None and usage["last_rejected"] >= since
+
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+def flush() -> int:
+    """Write pending usage to Firestore in one batch. Returns the number of owners written."""
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return 0
+
+    try:
+        import firebase_models as fm
+        fm.add_user_token_usage(pending)
+    except Exception as e:
+        # Keep the counts not yet written for the next flush
+        written = set(getattr(e, "committed", ()))
+        with _lock:
+            for key, tokens in pending.items():
+                if key not in written:
+                    _pending[key] = _pending.get(key, 0) + tokens
+            _stats["flush_errors"] += 1
+        print(f"[QUOTA] Flush failed ({len(written)} of {len(pending)} written): {e}")
+        return len(written)
+
+    with _lock:
+        _stats["flushes"] += 1
+    return len(pending)
+
+
+def _flush_loop(interval_seconds: int) -> None:
+    while not _flush_stop.wait(interval_seconds):
+        flush()
+
+
+def start_flusher(interval_seconds: int = None) -> None:
+    """Start writing usage to Firestore periodically in the background."""
+    global _flush_thread
+
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return
+
+    _flush_stop.clear()
+    _flush_thread = threading.Thread(
+        target=_flush_loop,
+        args=(interval_seconds or QUOTA_FLUSH_SECONDS,),
+        name="quota-flush",
+        daemon=True
+    )
+    _flush_thread.start()
+
+
+def stop_flusher() -> None:
+    """Stop the background flusher and write any pending usage."""
+    global _flush_thread
+
+    _flush_stop.set()
+    _flush_thread = None
+    flush()
+
+
+def get_owner_usage(owner: str) -> Dict:
+    """Get owner's token usage today and the limits (loads it from Firestore if needed)."""
+    load(owner)
+    with _lock:
+        usage = _current_usage(owner)
+        return {
+            "day": usage["day"],
+            "day_tokens": usage["day_tokens"],
+            "minute_tokens": usage["minute_tokens"],
+            "daily_token_limit": DAILY_TOKEN_LIMIT,
+            "minute_token_limit": MINUTE_TOKEN_LIMIT,
+            "exhausted": usage["day_tokens"] >= DAILY_TOKEN_LIMIT or usage["minute_tokens"] >= MINUTE_TOKEN_LIMIT,
+        }
+
+
+def get_quota_stats(top: int = 50) -> Dict:
+    """Get limits, counters and today's heaviest users (in this process)."""
+    day = _today()
+    with _lock:
+        users: List[Dict] = [
+            {"owner": owner, "day_tokens": usage["day_tokens"], "minute_tokens": usage["minute_tokens"]}
+            for owner, usage in _usage.items() if usage["day"] == day
+        ]
+        stats = dict(_stats)
+        pending = sum(_pending.values())
+    users.sort(key=lambda u: -u["day_tokens"])
+    return {
+        "enabled": QUOTA_ENABLED,
+        "daily_token_limit": DAILY_TOKEN_LIMIT,
+        "minute_token_limit": MINUTE_TOKEN_LIMIT,
+        **stats,
+        "pending_tokens": pending,
+        "users": users[:top],
+    }
@@ -5,10 +5,11 @@ Handles individual user schedules, premium audio generation, and feedback-based
 import os
 import secrets
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, List, Optional, Union
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from dotenv import load_dotenv
+from services.openai_scheduler import background_priority
 
 load_dotenv()
 
@@ -26,6 +27,295 @@ def generate_feedback_token() -> str:
     return secrets.token_urlsafe(32)
 
 
+# Collect due users' summaries into one batch job (see batch_service)
+BATCH_MODE = os.getenv("DIGEST_BATCH_MODE", "false").lower() == "true"
+
+# Longest a schedule check waits for its batch before summarizing directly.
+# Kept well under the hourly check so other due users are not held up.
+BATCH_MAX_WAIT_SECONDS = float(os.getenv("DIGEST_BATCH_MAX_WAIT_SECONDS", "900"))
+
+
+def prepare_user_digest(user_id: str) -> Optional[Dict]:
+    """
+    Load a user's settings and collect the articles and combined excerpts for
+    their digest. Returns the digest job, or None if nothing should be sent.
+    """
+    import firebase_models as fm
+    from services.news_fetcher import fetch_news_by_categories, fetch_news_by_sources
+    from services.feed_poller import fetch_news_by_custom_feeds
+    from services.article_summaries import get_article_briefs
+    from services.digest_service import build_combined_excerpts, excerpt_order
+    from services.topic_clustering import cluster_articles
+    from services.article_ranking import select_articles, story_priorities
+    from services.incremental_digest import INCREMENTAL_ENABLED, plan_digest, fold_new_articles
+    
+    # Load user and settings
+    user = fm.get_user_by_id(user_id)
+    if not user:
+        print(f"[SCHEDULER] User {user_id} not found")
+        return None
+    
+    settings = fm.get_user_settings(user_id)
+    if not settings:
+        print(f"[SCHEDULER] No settings for user {user_id}")
+        return None
+    
+    if not settings.get("scheduler_enabled", False):
+        print(f"[SCHEDULER] Scheduler disabled for user {user_id}")
+        return None
+    
+    if not settings.get("notification_email"):
+        print(f"[SCHEDULER] No notification email for user {user_id}")
+        return None
+    
+    print(f"[SCHEDULER] User: {user['email']}")
+    print(f"[SCHEDULER] Settings: interval={settings.get('scheduler_interval_hours', 12)}h, max_items={settings.get('max_items_per_category', 5)}, word_count={settings.get('target_word_count', 500)}")
+    
+    # Fetch news based on categories and sources
+    articles = []
+    max_items = settings.get("max_items_per_category", 5)
+    
+    if settings.get("categories"):
+        print(f"[SCHEDULER] Fetching from categories: {settings['categories']}")
+        # Digests are built from RSS summaries, so skip content scraping
+        cat_articles = fetch_news_by_categories(
+            settings["categories"], 
+            max_per_category=max_items,
+            enrich=False
+        )
+        articles.extend(cat_articles)
+    
+    if settings.get("sources"):
+        print(f"[SCHEDULER] Fetching from sources: {settings['sources']}")
+        src_articles = fetch_news_by_sources(
+            settings["sources"],
+            max_per_source=max_items
+        )
+        articles.extend(src_articles)
+    
+    custom_feeds = fm.get_user_feeds(user_id)
+    if custom_feeds:
+        print(f"[SCHEDULER] Fetching from {len(custom_feeds)} custom feeds")
+        feed_articles = fetch_news_by_custom_feeds(
+            [f["url"] for f in custom_feeds],
+            max_per_feed=max_items
+        )
+        articles.extend(feed_articles)
+    
+    if not articles:
+        print(f"[SCHEDULER] No articles found for user {user_id}")
+        return None
+    
+    print(f"[SCHEDULER] Collected {len(articles)} articles")
+    
+    # Keep the most relevant articles that fit the prompt budget
+    articles, scores = select_articles(articles, category_weights=settings.get("category_weights"))
+    
+    # Build combined excerpts, one per story
+    briefs = get_article_briefs(articles)
+    stories, story_briefs = cluster_articles(articles, briefs)
+    combined_text = build_combined_excerpts(stories, story_briefs, priorities=story_priorities(stories, scores))
+    print(f"[SCHEDULER] Combined text: {len(combined_text)} characters")
+    
+    job = {
+        "user_id": user_id,
+        "user": user,
+        "settings": settings,
+        "articles": articles,
+        "excerpt_articles": excerpt_order(stories),
+        "combined_text": combined_text,
+        "max_items": max_items,
+        "target_word_count": settings.get("target_word_count", 500),
+    }
+    
+    # Compare with the last delivery: reuse it, update it, or start over
+    previous = None
+    if INCREMENTAL_ENABLED:
+        try:
+            previous = fm.get_user_digest_state(user_id)
+        except Exception as e:
+            print(f"[SCHEDULER] Could not load previous digest for user {user_id}: {e}")
+    plan = plan_digest(previous, articles, job["target_word_count"])
+    job["plan"] = plan
+    print(f"[SCHEDULER] Digest plan: {plan['mode']}")
+    
+    if plan["mode"] == "incremental" and plan["new_articles"]:
+        # New articles were clustered with the previous ones above: those on a
+        # story already in the digest join it, only the rest are summarized
+        new_count = len(plan["new_articles"])
+        brief_by_story = {id(story): brief for story, brief in zip(stories, story_briefs)}
+        new_stories = fold_new_articles(plan, stories, job["target_word_count"])
+        if new_stories:
+            job["update_text"] = build_combined_excerpts(
+                new_stories, [brief_by_story[id(story)] for story in new_stories],
+                priorities=story_priorities(new_stories, scores)
+            )
+            job["update_articles"] = excerpt_order(new_stories)
+        print(f"[SCHEDULER] {new_count} new articles ({len(plan['new_articles'])} to summarize), "
+              f"{len(plan['removed_keys'])} removed")
+    
+    return job
+
+
+def summarize_user_digest(job: Dict, structured: Optional[bool] = None) -> Optional[Union[Dict, str]]:
+    """
+    Summarize a prepared digest job: a structured digest (see digest_format)
+    when enabled, else AI text, else a local extractive summary. OpenAI gets
+    DIGEST_DEADLINE_SECONDS in total; past it the job is marked "degraded"
+    and the local summary is used.
+    """
+    import time
+    from services import openai_gateway
+    from services.openai_service import (
+        summarize_combined_excerpts_structured_async,
+        summarize_combined_with_deadline,
+        run_with_deadline,
+        deadline_remaining,
+        DIGEST_DEADLINE_SECONDS
+    )
+    from services.digest_service import STRUCTURED_OUTPUT
+    
+    user_id = job["user_id"]
+    target_word_count = job["target_word_count"]
+    plan = job.get("plan") or {"mode": "full"}
+    started = time.monotonic()
+    
+    if plan["mode"] == "reuse":
+        print(f"[SCHEDULER] Articles unchanged for user {user_id}, reusing previous digest")
+        job["mergeable"] = plan["mergeable"]
+        return plan["previous"]
+    
+    if plan["mode"] == "incremental":
+        update = None
+        if plan["new_articles"]:
+            print(f"[SCHEDULER] Summarizing {len(plan['new_articles'])} new articles "
+                  f"(target: {plan['update_word_count']} words)...")
+            update = openai_gateway.run_sync(run_with_deadline(
+                summarize_combined_excerpts_structured_async(
+                    job["update_text"], plan["update_word_count"], job["update_articles"]
+                ),
+                DIGEST_DEADLINE_SECONDS, "digest_update"
+            ))
+        if update or not plan["new_articles"]:
+            return merge_user_digest(job, update)
+        print(f"[SCHEDULER] Incremental update failed for user {user_id}, regenerating digest")
+    
+    print(f"[SCHEDULER] Generating AI summary (target: {target_word_count} words)...")
+    
+    result = summarize_combined_with_deadline(
+        job["combined_text"],
+        target_word_count,
+        deadline=deadline_remaining(started, DIGEST_DEADLINE_SECONDS),
+        structured=STRUCTURED_OUTPUT if structured is None else structured,
+        articles=job["excerpt_articles"]
+    )
+    if result["degraded"]:
+        print(f"[SCHEDULER] AI summary unavailable for user {user_id} ({result['reason']}), using local summary")
+        job["degraded"] = True
+    elif result["digest"]:
+        job["mergeable"] = True
+        return result["digest"]
+    return result["summary"] or None
+
+
+def merge_user_digest(job: Dict, update: Optional[Dict]) -> Dict:
+    """Merge the digest of a job's new articles into its previous digest (see incremental_digest)."""
+    from services.incremental_digest import merge_digest
+    
+    plan = job["plan"]
+    job["mergeable"] = True
+    return merge_digest(plan["previous"], update, plan["removed_keys"], job["target_word_count"])
+
+
+def deliver_user_digest(job: Dict, summary: Union[Dict, str]) -> bool:
+    """
+    Render a prepared digest job's summary (structured digest or text) as a
+    PDF and premium audio, email it with feedback links and log the delivery.
+    Returns True if the email was sent.
+    """
+    import firebase_models as fm
+    from services.pdf_service import create_pdf
+    from services.tts_service import text_to_speech_openai
+    from services.sendgrid_service import send_summary_email_with_feedback
+    from services.digest_format import digest_to_text, ensure_digest
+    from services.incremental_digest import digest_state
+    
+    user_id = job["user_id"]
+    user = job["user"]
+    settings = job["settings"]
+    
+    # Parse text once; every renderer works from the structure
+    digest = ensure_digest(summary)
+    summary = summary if isinstance(summary, str) else digest_to_text(digest)
+    
+    actual_word_count = len(summary.split())
+    print(f"[SCHEDULER] Summary generated: {actual_word_count} words")
+    
+    # Create PDF
+    print("[SCHEDULER] Generating PDF...")
+    pdf_bytes = create_pdf(digest, "AI News Summary")
+    print(f"[SCHEDULER] PDF generated: {len(pdf_bytes)} bytes")
+    
+    # Generate audio only for premium users
+    audio_bytes = None
+    if user.get("is_premium", False):
+        print("[SCHEDULER] Premium user - generating audio...")
+        audio_bytes = text_to_speech_openai(digest, voice="nova")
+        print(f"[SCHEDULER] Audio generated: {len(audio_bytes)} bytes")
+    else:
+        print("[SCHEDULER] Non-premium user - skipping audio")
+    
+    # Generate feedback token
+    feedback_token = generate_feedback_token()
+    
+    # Send email with feedback links
+    notification_email = settings["notification_email"]
+    print(f"[SCHEDULER] Sending email to {notification_email}...")
+    success, message = send_summary_email_with_feedback(
+        to_email=notification_email,
+        summary_text=summary,
+        pdf_bytes=pdf_bytes,
+        audio_bytes=audio_bytes,
+        feedback_token=feedback_token,
+        digest=digest
+    )
+    
+    if not success:
+        print(f"[SCHEDULER] ❌ Failed to send email: {message}")
+        return False
+    
+    print(f"[SCHEDULER] ✅ Email sent to {notification_email}")
+    
+    # Remember this digest for the next incremental update; a local fallback
+    # summary is not kept, so the next run summarizes with OpenAI again
+    if job.get("degraded"):
+        print(f"[SCHEDULER] Degraded digest for user {user_id}, not stored for reuse")
+    elif job.get("plan"):
+        try:
+            fm.save_user_digest_state(
+                user_id, digest_state(job["plan"], digest, job["target_word_count"], job.get("mergeable", False))
+            )
+        except Exception as e:
+            print(f"[SCHEDULER] Could not store digest for user {user_id}: {e}")
+    
+    # Log delivery to Firebase
+    delivery_log = fm.create_delivery_log(
+        user_id=user_id,
+        email_sent_to=notification_email,
+        categories_used=settings.get("categories", []),
+        sources_used=settings.get("sources", []),
+        items_per_category=job["max_items"],
+        word_count_target=job["target_word_count"],
+        actual_word_count=actual_word_count,
+        pdf_included=True,
+        audio_included=audio_bytes is not None,
+        degraded=job.get("degraded", False)
+    )
+    print(f"[SCHEDULER] Delivery logged (id={delivery_log['id']})")
+    return True
+
+
+@background_priority
 def process_user_digest(user_id: str):
     """
     Process and send news digest for a single user.
@@ -39,148 +329,31 @@ def process_user_digest(user_id: str):
     6. If premium: generates audio
     7. Sends email with feedback buttons
     8. Logs delivery to Firebase
+    
+    Summary and audio calls count against the user's token quota.
     """
+    from services import user_quota
+    
     print(f"\n{'='*70}")
     print(f"   PROCESSING DIGEST FOR USER {user_id} - {datetime.now()}")
     print(f"{'='*70}")
     
     try:
-        import firebase_models as fm
-        from services.news_fetcher import fetch_news_by_categories, fetch_news_by_sources
-        from services.openai_service import summarize_combined_excerpts_with_word_limit
-        from services.pdf_service import create_pdf
-        from services.tts_service import text_to_speech_openai
-        from services.sendgrid_service import send_summary_email_with_feedback
-        from bs4 import BeautifulSoup
-        
-        # Load user and settings
-        user = fm.get_user_by_id(user_id)
-        if not user:
-            print(f"[SCHEDULER] User {user_id} not found")
-            return
-        
-        settings = fm.get_user_settings(user_id)
-        if not settings:
-            print(f"[SCHEDULER] No settings for user {user_id}")
-            return
-        
-        if not settings.get("scheduler_enabled", False):
-            print(f"[SCHEDULER] Scheduler disabled for user {user_id}")
-            return
-        
-        if not settings.get("notification_email"):
-            print(f"[SCHEDULER] No notification email for user {user_id}")
-            return
-        
-        print(f"[SCHEDULER] User: {user['email']}")
-        print(f"[SCHEDULER] Settings: interval={settings.get('scheduler_interval_hours', 12)}h, max_items={settings.get('max_items_per_category', 5)}, word_count={settings.get('target_word_count', 500)}")
-        
-        # Fetch news based on categories and sources
-        articles = []
-        max_items = settings.get("max_items_per_category", 5)
-        
-        if settings.get("categories"):
-            print(f"[SCHEDULER] Fetching from categories: {settings['categories']}")
-            cat_articles = fetch_news_by_categories(
-                settings["categories"], 
-                max_per_category=max_items
-            )
-            articles.extend(cat_articles)
-        
-        if settings.get("sources"):
-            print(f"[SCHEDULER] Fetching from sources: {settings['sources']}")
-            src_articles = fetch_news_by_sources(
-                settings["sources"],
-                max_per_source=max_items
-            )
-            articles.extend(src_articles)
-        
-        if not articles:
-            print(f"[SCHEDULER] No articles found for user {user_id}")
+        job = prepare_user_digest(user_id)
+        if job is None:
             return
         
-        print(f"[SCHEDULER] Collected {len(articles)} articles")
-        
-        # Build combined excerpts
-        excerpts = []
-        for idx, article in enumerate(articles, 1):
-            title = article.get('title', 'Untitled')
-            source = article.get('source', 'Unknown')
-            summary = article.get('summary', '')
+        owner = job["user"]["email"]
+        user_quota.load(owner)
+        with user_quota.quota_user(owner):
+            # Generate AI summary with word limit
+            summary = summarize_user_digest(job)
             
-            section = f"ARTICLE {idx}: {title}\n"
-            section += f"Source: {source}\n"
+            if not summary:
+                print(f"[SCHEDULER] Failed to generate summary for user {user_id}")
+                return
             
-            if summary:
-                clean_summary = BeautifulSoup(summary, 'html.parser').get_text(separator=' ', strip=True)
-                section += clean_summary
-            
-            excerpts.append(section)
-        
-        combined_text = "\n\n".join(excerpts)
-        print(f"[SCHEDULER] Combined text: {len(combined_text)} characters")
-        
-        # Generate AI summary with word limit
-        target_word_count = settings.get("target_word_count", 500)
-        print(f"[SCHEDULER] Generating AI summary (target: {target_word_count} words)...")
-        summary = summarize_combined_excerpts_with_word_limit(
-            combined_text, 
-            target_word_count=target_word_count
-        )
-        
-        if not summary:
-            print(f"[SCHEDULER] Failed to generate summary for user {user_id}")
-            return
-        
-        actual_word_count = len(summary.split())
-        print(f"[SCHEDULER] Summary generated: {actual_word_count} words")
-        
-        # Create PDF
-        print("[SCHEDULER] Generating PDF...")
-        pdf_bytes = create_pdf(summary, "AI News Summary")
-        print(f"[SCHEDULER] PDF generated: {len(pdf_bytes)} bytes")
-        
-        # Generate audio only for premium users
-        audio_bytes = None
-        if user.get("is_premium", False):
-            print("[SCHEDULER] Premium user - generating audio...")
-            audio_bytes = text_to_speech_openai(summary, voice="nova")
-            print(f"[SCHEDULER] Audio generated: {len(audio_bytes)} bytes")
-        else:
-            print("[SCHEDULER] Non-premium user - skipping audio")
-        
-        # Generate feedback token
-        feedback_token = generate_feedback_token()
-        
-        # Send email with feedback links
-        notification_email = settings["notification_email"]
-        print(f"[SCHEDULER] Sending email to {notification_email}...")
-        success, message = send_summary_email_with_feedback(
-            to_email=notification_email,
-            summary_text=summary,
-            pdf_bytes=pdf_bytes,
-            audio_bytes=audio_bytes,
-            feedback_token=feedback_token
-        )
-        
-        if success:
-            print(f"[SCHEDULER] ✅ Email sent to {notification_email}")
-            
-            # Log delivery to Firebase
-            delivery_log = fm.create_delivery_log(
-                user_id=user_id,
-                email_sent_to=notification_email,
-                categories_used=settings.get("categories", []),
-                sources_used=settings.get("sources", []),
-                items_per_category=max_items,
-                word_count_target=target_word_count,
-                actual_word_count=actual_word_count,
-                pdf_included=True,
-                audio_included=audio_bytes is not None
-            )
-            print(f"[SCHEDULER] Delivery logged (id={delivery_log['id']})")
-        else:
-            print(f"[SCHEDULER] ❌ Failed to send email: {message}")
+            deliver_user_digest(job, summary)
     
     except Exception as e:
         print(f"[SCHEDULER] Error processing user {user_id}: {e}")
@@ -192,6 +365,94 @@ def process_user_digest(user_id: str):
     print(f"{'='*70}\n")
 
 
+@background_priority
+def process_user_digests_batch(user_ids: List[str]):
+    """
+    Process digests for many users with one batch summarization job.
+    
+    Each user's digest is prepared as usual, all summary requests are run
+    as a single batch (see batch_service), and the results are fanned back
+    into delivery. Unchanged digests need no request and incremental ones
+    only summarize their new articles. The batch gets at most
+    BATCH_MAX_WAIT_SECONDS; users whose request failed or was still pending
+    are summarized directly.
+    """
+    print(f"\n{'='*70}")
+    print(f"   BATCH DIGESTS FOR {len(user_ids)} USERS - {datetime.now()}")
+    print(f"{'='*70}")
+    
+    from services.openai_service import (
+        summarize_combined_excerpts_structured_request,
+        summarize_combined_excerpts_with_word_limit_request
+    )
+    from services.batch_service import run_batch
+    from services.digest_service import STRUCTURED_OUTPUT
+    from services import user_quota
+    
+    jobs = {}
+    for user_id in user_ids:
+        try:
+            job = prepare_user_digest(user_id)
+            if job is not None:
+                jobs[str(user_id)] = job
+        except Exception as e:
+            print(f"[SCHEDULER] Error preparing digest for user {user_id}: {e}")
+    
+    if not jobs:
+        return
+    
+    build_request = (summarize_combined_excerpts_structured_request if STRUCTURED_OUTPUT
+                     else summarize_combined_excerpts_with_word_limit_request)
+    requests = {}
+    for custom_id, job in jobs.items():
+        plan = job["plan"]
+        if plan["mode"] == "full":
+            requests[custom_id] = build_request(job["combined_text"], job["target_word_count"])
+        elif plan["mode"] == "incremental" and plan["new_articles"]:
+            requests[custom_id] = summarize_combined_excerpts_structured_request(
+                job["update_text"], plan["update_word_count"]
+            )
+    results = run_batch(requests, timeout=BATCH_MAX_WAIT_SECONDS) if requests else {}
+    
+    for custom_id, job in jobs.items():
+        owner = job["user"]["email"]
+        user_quota.load(owner)
+        try:
+            with user_quota.quota_user(owner):
+                _finish_batch_job(job, custom_id, results.get(custom_id), custom_id in requests)
+        except Exception as e:
+            print(f"[SCHEDULER] Error delivering digest for user {custom_id}: {e}")
+    
+    print(f"{'='*70}")
+    print(f"   BATCH DIGESTS COMPLETED - {datetime.now()}")
+    print(f"{'='*70}\n")
+
+
+def _finish_batch_job(job: Dict, custom_id: str, summary: Optional[str], requested: bool) -> None:
+    """Turn a job's batch result into its digest and deliver it (see process_user_digests_batch)."""
+    from services.openai_service import parse_structured_digest
+    from services.digest_service import STRUCTURED_OUTPUT
+    
+    mode = job["plan"]["mode"]
+    if summary and mode == "incremental":
+        update = parse_structured_digest(summary, job["update_articles"])
+        summary = merge_user_digest(job, update) if update else None
+    elif summary and STRUCTURED_OUTPUT:
+        summary = parse_structured_digest(summary, job["excerpt_articles"])
+        job["mergeable"] = summary is not None
+    
+    if not summary and not requested:
+        # Unchanged, or only removals: no LLM call needed
+        summary = summarize_user_digest(job)
+    if not summary:
+        print(f"[SCHEDULER] No batch result for user {custom_id}, summarizing directly")
+        summary = summarize_user_digest(job)
+    if not summary:
+        print(f"[SCHEDULER] Failed to generate summary for user {custom_id}")
+        return
+    deliver_user_digest(job, summary)
+
+
 def run_all_user_digests():
     """
     Run digests for all users with enabled schedulers.
@@ -278,6 +539,7 @@ def check_user_schedules():
         
         print(f"[SCHEDULER] {len(enabled_users)} users with enabled scheduling")
         
+        due_user_ids = []
         for user in enabled_users:
             settings = user.get("settings", {})
             
@@ -308,7 +570,13 @@ def check_user_schedules():
                         print(f"[SCHEDULER] User {user['id']}: {hours_since:.1f}h since last delivery, waiting")
             
             if needs_digest:
-                process_user_digest(user["id"])
+                due_user_ids.append(user["id"])
+        
+        if BATCH_MODE and len(due_user_ids) > 1:
+            process_user_digests_batch(due_user_ids)
+        else:
+            for user_id in due_user_ids:
+                process_user_digest(user_id)
     
     except Exception as e:
         print(f"[SCHEDULER] Error checking schedules: {e}")
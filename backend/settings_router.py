@@ -3,7 +3,7 @@ Settings router - Firebase version.
 """
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from auth import get_current_user
 import firebase_models as fm
@@ -23,6 +23,7 @@ class SettingsResponse(BaseModel):
     max_items_per_category: int
     target_word_count: int
     theme: str
+    category_weights: Dict[str, float]
 
 
 class UpdateSettingsRequest(BaseModel):
@@ -34,6 +35,7 @@ class UpdateSettingsRequest(BaseModel):
     scheduler_interval_hours: Optional[int] = None
     max_items_per_category: Optional[int] = None
     theme: Optional[str] = None
+    category_weights: Optional[Dict[str, float]] = None  # Category or source -> digest ranking weight
 
 
 # --- Endpoints ---
@@ -52,7 +54,8 @@ def get_settings(current_user: dict = Depends(get_current_user)):
         scheduler_interval_hours=settings.get("scheduler_interval_hours", 12),
         max_items_per_category=settings.get("max_items_per_category", 5),
         target_word_count=settings.get("target_word_count", 500),
-        theme=settings.get("theme", "light")
+        theme=settings.get("theme", "light"),
+        category_weights=settings.get("category_weights", {})
     )
 
 
@@ -84,6 +87,10 @@ def update_settings(
         updates["max_items_per_category"] = request.max_items_per_category
     if request.theme is not None:
         updates["theme"] = request.theme
+    if request.category_weights is not None:
+        if any(not 0 <= w <= 3 for w in request.category_weights.values()):
+            raise HTTPException(status_code=400, detail="Category weights must be between 0 and 3.")
+        updates["category_weights"] = request.category_weights
     
     settings = fm.update_user_settings(current_user["id"], updates)
     
@@ -96,5 +103,6 @@ def update_settings(
         scheduler_interval_hours=settings.get("scheduler_interval_hours", 12),
         max_items_per_category=settings.get("max_items_per_category", 5),
         target_word_count=settings.get("target_word_count", 500),
-        theme=settings.get("theme", "light")
+        theme=settings.get("theme", "light"),
+        category_weights=settings.get("category_weights", {})
     )
@@ -4,6 +4,7 @@ import dateutil.parser
 import datetime
 import html as html_module
 import os
+import json
 
 # API URL - uses environment variable in Docker, localhost for local dev
 API_URL = os.getenv("API_URL", "http://localhost:8000")
@@ -673,6 +674,17 @@ def fetch_news(categories=None):
         st.error(f"Error connecting to backend: {e}")
         return []
 
+def fetch_article_content(article_id):
+    """Fetch an article's full content on demand (scraped lazily by the backend)."""
+    try:
+        response = requests.get(f"{API_URL}/articles/{article_id}/content", timeout=30)
+        if response.status_code == 200:
+            return response.json().get("content")
+        return None
+    except Exception as e:
+        print(f"Error fetching article content: {e}")
+        return None
+
 def simplify_article(text):
     try:
         response = requests.post(f"{API_URL}/simplify", json={"text": text})
@@ -683,6 +695,36 @@ def simplify_article(text):
     except Exception as e:
         return f"Error connecting to backend: {e}"
 
+def stream_combined_summary(payload, placeholder):
+    """
+    Request an AI summary from /summarize-combined/stream, rendering the text
+    into placeholder as it arrives. Returns the full summary, or None on error.
+    """
+    parts = []
+    event = None
+    try:
+        with requests.post(f"{API_URL}/summarize-combined/stream", json=payload, stream=True, timeout=120) as response:
+            if response.status_code != 200:
+                placeholder.error(f"Failed: {response.text}")
+                return None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "delta":
+                        parts.append(data.get("text", ""))
+                        placeholder.markdown("".join(parts) + " ▌")
+                    elif event == "done":
+                        placeholder.markdown(data.get("summary", ""))
+                        return data.get("summary", "")
+                    elif event == "error":
+                        placeholder.error(f"Failed: {data.get('detail')}")
+                        return None
+    except Exception as e:
+        placeholder.error(f"Error: {e}")
+    return None
+
 def fetch_digest():
     """Fetch the generated news digest from the API."""
     try:
@@ -1167,13 +1209,19 @@ with tab1:
                 try:
                     response = requests.post(
                         f"{API_URL}/summarize-combined",
-                        json={"text": combined_text, "article_count": len(st.session_state.news_data)},
+                        json={
+                            "text": combined_text,
+                            "article_count": len(st.session_state.news_data),
+                            "article_ids": [a['id'] for a in st.session_state.news_data if a.get('id')],
+                            "structured": True
+                        },
                         timeout=120
                     )
                     if response.status_code == 200:
                         summary = response.json().get('summary', '')
                         st.session_state['digest'] = {
                             'digest': summary,
+                            'structured': response.json().get('digest'),
                             'article_count': len(st.session_state.news_data),
                             'sources': list(set(a.get('source', '') for a in st.session_state.news_data)),
                             'generated_at': str(datetime.datetime.now().isoformat())
@@ -1188,7 +1236,8 @@ with tab1:
                     try:
                         response = requests.post(
                             f"{API_URL}/summary/pdf",
-                            json={"text": st.session_state['digest']['digest']},
+                            json={"text": st.session_state['digest']['digest'],
+                                  "digest": st.session_state['digest'].get('structured')},
                             timeout=30
                         )
                         if response.status_code == 200:
@@ -1202,7 +1251,8 @@ with tab1:
                     try:
                         response = requests.post(
                             f"{API_URL}/summary/audio",
-                            json={"text": st.session_state['digest']['digest']},
+                            json={"text": st.session_state['digest']['digest'],
+                                  "digest": st.session_state['digest'].get('structured')},
                             timeout=60
                         )
                         if response.status_code == 200:
@@ -1265,28 +1315,29 @@ with tab1:
             </div>
             """, unsafe_allow_html=True)
         with digest_col2:
-            if st.button("🤖 Generate", key="generate_digest_tab1", use_container_width=True):
-                with st.spinner("AI is summarizing your news..."):
-                    try:
-                        response = requests.post(
-                            f"{API_URL}/summarize-combined",
-                            json={"text": combined_text, "article_count": len(st.session_state.news_data)},
-                            timeout=120
-                        )
-                        if response.status_code == 200:
-                            summary = response.json().get('summary', '')
-                            st.session_state['digest'] = {
-                                'digest': summary,
-                                'article_count': len(st.session_state.news_data),
-                                'sources': list(set(a.get('source', '') for a in st.session_state.news_data)),
-                                'generated_at': str(datetime.datetime.now().isoformat())
-                            }
-                            st.success("✅ Done!")
-                            st.rerun()
-                        else:
-                            st.error(f"Failed: {response.text}")
-                    except Exception as e:
-                        st.error(f"Error: {e}")
+            generate_clicked = st.button("🤖 Generate", key="generate_digest_tab1", use_container_width=True)
+        
+        if generate_clicked:
+            # Stream the summary in as it is generated
+            summary_placeholder = st.empty()
+            summary_placeholder.info("AI is summarizing your news...")
+            summary = stream_combined_summary(
+                {
+                    "text": combined_text,
+                    "article_count": len(st.session_state.news_data),
+                    "article_ids": [a['id'] for a in st.session_state.news_data if a.get('id')]
+                },
+                summary_placeholder
+            )
+            if summary:
+                st.session_state['digest'] = {
+                    'digest': summary,
+                    'article_count': len(st.session_state.news_data),
+                    'sources': list(set(a.get('source', '') for a in st.session_state.news_data)),
+                    'generated_at': str(datetime.datetime.now().isoformat())
+                }
+                st.success("✅ Done!")
+                st.rerun()
     else:
         st.info("📡 Fetch news articles first using the filters above, then generate your AI digest.")
     
@@ -1471,8 +1522,18 @@ with tab1:
                         display_summary = clean_summary[:500] + "..." if len(clean_summary) > 500 else clean_summary
                         st.markdown(display_summary)
                     
+                    if not clean_content and article.get('id'):
+                        # Content is scraped lazily - load it only when asked for
+                        if st.button("📄 Load full content", key=f"load_content_{article['id']}_{idx}"):
+                            loaded = fetch_article_content(article['id'])
+                            if loaded:
+                                article['content'] = loaded
+                                clean_content = loaded
+                            else:
+                                st.caption("Full content unavailable for this article.")
+                    
                     if clean_content:
-                        with st.expander("📄 Full Content"):
+                        with st.expander("📄 Full Content", expanded=bool(article.get('id') and not raw_content)):
                             st.text(clean_content[:2000])
                     
                     if link: